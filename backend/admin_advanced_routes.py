@@ -5,11 +5,16 @@ Handles: System monitoring, Audit logs, Data privacy, Red flags, Incidents, Scho
 from fastapi import APIRouter, HTTPException, Depends, Header
 from typing import Optional, List
 from datetime import datetime, timezone, timedelta
+from loaders import EntityLoaders, get_loaders
+from status_counts import count_by_status
+import status_counts
+import asyncio
 import uuid
 import logging
 import os
 import jwt
 import psutil
+import db_indexes
 
 router = APIRouter()
 db = None
@@ -112,6 +117,24 @@ async def get_system_uptime(current_user: dict = Depends(verify_admin_token)):
     except Exception as e:
         raise HTTPException(status_code=500, detail="Failed to get uptime stats")
 
+@router.get("/admin/system/index-report")
+async def get_index_report(current_user: dict = Depends(verify_admin_token)):
+    """Explain the canonical query of each route and report any collection scans"""
+    try:
+        results = await db_indexes.explain_canonical_queries()
+        collscans = [r for r in results if r.get("collscan")]
+        
+        return {
+            "queries": results,
+            "total": len(results),
+            "collscan_count": len(collscans),
+            "collscans": [r["route"] for r in collscans],
+            "checked_at": datetime.now(timezone.utc).isoformat()
+        }
+    except Exception as e:
+        logger.error(f"Error building index report: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to build index report")
+
 # ==================== AUDIT LOGS ====================
 
 @router.get("/admin/audit/logs")
@@ -332,7 +355,8 @@ RED_FLAG_CATEGORIES = [
 async def get_red_flags(
     status: Optional[str] = None,
     severity: Optional[str] = None,
-    current_user: dict = Depends(verify_admin_token)
+    current_user: dict = Depends(verify_admin_token),
+    loaders: EntityLoaders = Depends(get_loaders)
 ):
     """Get all red flags"""
     try:
@@ -345,27 +369,25 @@ async def get_red_flags(
         flags = await db.red_flags.find(query, {"_id": 0}).sort("created_at", -1).to_list(500)
         
         # Enrich with child/observer info
-        for flag in flags:
+        children, observers = await asyncio.gather(
+            loaders.load_many("children", [f.get("child_id") for f in flags], {"_id": 0, "name": 1}),
+            loaders.load_many("observers", [f.get("observer_id") for f in flags], {"_id": 0, "name": 1})
+        )
+        for flag, child, observer in zip(flags, children, observers):
             if flag.get("child_id"):
-                child = await db.children.find_one({"id": flag["child_id"]}, {"_id": 0, "name": 1})
                 flag["child_name"] = child.get("name") if child else "Unknown"
             if flag.get("observer_id"):
-                observer = await db.observers.find_one({"id": flag["observer_id"]}, {"_id": 0, "name": 1})
                 flag["observer_name"] = observer.get("name") if observer else "Unknown"
         
         # Status counts
-        status_counts = {
-            "pending": await db.red_flags.count_documents({"status": "pending"}),
-            "reviewing": await db.red_flags.count_documents({"status": "reviewing"}),
-            "escalated": await db.red_flags.count_documents({"status": "escalated"}),
-            "resolved": await db.red_flags.count_documents({"status": "resolved"}),
-            "referred": await db.red_flags.count_documents({"status": "referred"})
-        }
+        counts = await count_by_status(
+            "red_flags", {}, ["pending", "reviewing", "escalated", "resolved", "referred"], scope="all"
+        )
         
         return {
             "flags": flags,
             "total": len(flags),
-            "status_counts": status_counts,
+            "status_counts": counts,
             "categories": RED_FLAG_CATEGORIES
         }
     except Exception as e:
@@ -400,6 +422,7 @@ async def create_red_flag(
         }
         
         await db.red_flags.insert_one(flag)
+        status_counts.invalidate("red_flags")
         
         return {"success": True, "flag_id": flag["id"]}
     except Exception as e:
@@ -454,6 +477,7 @@ async def update_red_flag(
             )
         
         await db.red_flags.update_one({"id": flag_id}, {"$set": update_data})
+        status_counts.invalidate("red_flags")
         
         return {"success": True}
     except HTTPException:
@@ -476,17 +500,14 @@ async def get_incidents(
         
         incidents = await db.incidents.find(query, {"_id": 0}).sort("created_at", -1).to_list(500)
         
-        status_counts = {
-            "open": await db.incidents.count_documents({"status": "open"}),
-            "investigating": await db.incidents.count_documents({"status": "investigating"}),
-            "resolved": await db.incidents.count_documents({"status": "resolved"}),
-            "closed": await db.incidents.count_documents({"status": "closed"})
-        }
+        counts = await count_by_status(
+            "incidents", {}, ["open", "investigating", "resolved", "closed"], scope="all"
+        )
         
         return {
             "incidents": incidents,
             "total": len(incidents),
-            "status_counts": status_counts
+            "status_counts": counts
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail="Failed to get incidents")
@@ -525,6 +546,7 @@ async def create_incident(
         }
         
         await db.incidents.insert_one(incident)
+        status_counts.invalidate("incidents")
         
         return {"success": True, "incident": {"id": incident["id"], "number": incident["incident_number"]}}
     except Exception as e:
@@ -551,6 +573,7 @@ async def update_incident(
             update_data["external_referral"] = external_referral
         
         await db.incidents.update_one({"id": incident_id}, {"$set": update_data})
+        status_counts.invalidate("incidents")
         
         if timeline_entry:
             await db.incidents.update_one(
@@ -4,8 +4,21 @@ Handles: Student Enrollment, User Management, Analytics, Support, AI Settings, B
 """
 from fastapi import APIRouter, HTTPException, Depends, Header
 from typing import Optional, List
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timezone
 from passlib.context import CryptContext
+from date_ranges import parse_datetime, resolve_timezone, today_range, range_filter
+from loaders import EntityLoaders, get_loaders
+from status_counts import count_by_status
+from pagination import paginate
+import school_scope
+import rollups
+import job_queue
+import email_outbox
+import report_cache
+import llm_gateway
+import behavioral_profiles
+import status_counts
+import asyncio
 import uuid
 import logging
 import os
@@ -41,9 +54,14 @@ def verify_admin_token(authorization: Optional[str] = Header(None)):
 # ==================== DASHBOARD STATS ====================
 
 @router.get("/admin/dashboard/stats")
-async def get_dashboard_stats(current_user: dict = Depends(verify_admin_token)):
-    """Get overview stats for admin dashboard"""
+async def get_dashboard_stats(tz: Optional[str] = None, current_user: dict = Depends(verify_admin_token)):
+    """Get overview stats for admin dashboard ("today" follows the optional IANA time zone)"""
     try:
+        try:
+            resolve_timezone(tz)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
         # Count all entities
         total_students = await db.children.count_documents({})
         active_students = await db.children.count_documents({"status": "active"})
@@ -53,9 +71,8 @@ async def get_dashboard_stats(current_user: dict = Depends(verify_admin_token)):
         
         # Session stats
         total_sessions = await db.session_logs.count_documents({})
-        today = datetime.now(timezone.utc).date().isoformat()
         sessions_today = await db.session_logs.count_documents({
-            "created_at": {"$regex": f"^{today}"}
+            "created_at": range_filter(*today_range(tz))
         })
         
         # Support tickets
@@ -95,6 +112,8 @@ async def get_dashboard_stats(current_user: dict = Depends(verify_admin_token)):
                 "total": total_revenue
             }
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting dashboard stats: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to load stats")
@@ -158,6 +177,7 @@ async def enroll_student(
         }
         
         await db.children.insert_one(student)
+        school_scope.invalidate_school(school)
         
         # Create enrollment record
         enrollment = {
@@ -168,9 +188,10 @@ async def enroll_student(
             "parent_email": parent_email,
             "school": school,
             "enrolled_by": current_user.get("sub", "admin"),
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         }
         await db.enrollments.insert_one(enrollment)
+        await rollups.record_enrollment(enrollment)
         
         return {
             "success": True,
@@ -192,9 +213,12 @@ async def enroll_student(
 async def get_all_students(
     status: Optional[str] = None,
     school: Optional[str] = None,
-    current_user: dict = Depends(verify_admin_token)
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(verify_admin_token),
+    loaders: EntityLoaders = Depends(get_loaders)
 ):
-    """Get all students with filters"""
+    """Get students with filters (cursor-paginated, newest first)"""
     try:
         query = {}
         if status:
@@ -202,35 +226,37 @@ async def get_all_students(
         if school:
             query["school"] = school
         
-        students = await db.children.find(query, {"_id": 0}).sort("created_at", -1).to_list(1000)
+        page = await paginate("children", query, "created_at", -1, limit, cursor)
+        students = page["items"]
         
-        # Enrich with related data
+        # Enrich with related data - one batched query per collection
+        await asyncio.gather(
+            loaders.load_many("parents", [pid for s in students for pid in s.get("parent_ids", [])]),
+            loaders.load_many("principals", [s.get("principal_id") for s in students]),
+            loaders.load_many("observers", [s.get("observer_id") for s in students])
+        )
         for student in students:
             # Get parent info
             if student.get("parent_ids"):
-                parents = await db.parents.find(
-                    {"id": {"$in": student["parent_ids"]}},
-                    {"_id": 0, "hashed_password": 0}
-                ).to_list(10)
-                student["parents"] = parents
+                parents = await loaders.load_many("parents", student["parent_ids"])
+                student["parents"] = [p for p in parents if p]
             
             # Get principal info
             if student.get("principal_id"):
-                principal = await db.principals.find_one(
-                    {"id": student["principal_id"]},
-                    {"_id": 0, "hashed_password": 0}
-                )
-                student["principal"] = principal
+                student["principal"] = await loaders.load("principals", student["principal_id"])
             
             # Get observer info
             if student.get("observer_id"):
-                observer = await db.observers.find_one(
-                    {"id": student["observer_id"]},
-                    {"_id": 0, "hashed_password": 0}
-                )
-                student["observer"] = observer
+                student["observer"] = await loaders.load("observers", student["observer_id"])
         
-        return {"students": students, "total": len(students)}
+        return {
+            "students": students,
+            "total": await db.children.count_documents(query),
+            "next_cursor": page["next_cursor"],
+            "limit": page["limit"]
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting students: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to load students")
@@ -263,6 +289,7 @@ async def update_student(
             {"id": student_id},
             {"$set": update_data}
         )
+        school_scope.invalidate_all()
         
         if result.modified_count == 0:
             raise HTTPException(status_code=404, detail="Student not found")
@@ -296,6 +323,7 @@ async def assign_student_to_principal(
                 "updated_at": datetime.now(timezone.utc).isoformat()
             }}
         )
+        school_scope.invalidate_all()
         
         if result.modified_count == 0:
             raise HTTPException(status_code=404, detail="Student not found")
@@ -461,6 +489,8 @@ async def toggle_user_status(
             {"id": user_id},
             {"$set": {"is_active": is_active}}
         )
+        if user_type == "principal":
+            school_scope.invalidate_principal(user_id)
         
         if result.modified_count == 0:
             raise HTTPException(status_code=404, detail="User not found")
@@ -478,46 +508,35 @@ async def get_analytics_overview(
     days: int = 30,
     current_user: dict = Depends(verify_admin_token)
 ):
-    """Get analytics overview"""
+    """Get analytics overview for the last `days` days (read from daily rollups)"""
     try:
-        end_date = datetime.now(timezone.utc)
-        start_date = end_date - timedelta(days=days)
-        
-        # Session trends
-        sessions = await db.session_logs.find({}, {"_id": 0, "created_at": 1}).to_list(10000)
-        
-        # Group by date
-        session_by_date = {}
-        for session in sessions:
-            date = session.get("created_at", "")[:10]
-            session_by_date[date] = session_by_date.get(date, 0) + 1
-        
-        # Enrollment trends
-        enrollments = await db.enrollments.find({}, {"_id": 0, "created_at": 1}).to_list(10000)
-        enrollment_by_date = {}
-        for enrollment in enrollments:
-            date = enrollment.get("created_at", "")[:10]
-            enrollment_by_date[date] = enrollment_by_date.get(date, 0) + 1
-        
-        # Get schools breakdown
-        schools = await db.children.distinct("school")
-        school_stats = []
-        for school in schools:
-            if school:
-                count = await db.children.count_documents({"school": school})
-                school_stats.append({"school": school, "students": count})
+        days = max(1, min(days, 366))
+        rows, school_rows = await asyncio.gather(
+            rollups.get_rows("all", days, key="all"),
+            db.children.aggregate([
+                {"$match": {"school": {"$nin": [None, ""]}}},
+                {"$group": {"_id": "$school", "students": {"$sum": 1}}},
+                {"$sort": {"_id": 1}}
+            ]).to_list(None)
+        )
+        
+        session_by_date = {r["day"]: r["sessions"] for r in rows if r.get("sessions")}
+        enrollment_by_date = {r["day"]: r["enrollments"] for r in rows if r.get("enrollments")}
+        totals = rollups.merge(rows)
         
         return {
             "period_days": days,
             "sessions": {
                 "by_date": session_by_date,
-                "total": len(sessions)
+                "total": totals["sessions"],
+                "completed": totals["completed_sessions"]
             },
             "enrollments": {
                 "by_date": enrollment_by_date,
-                "total": len(enrollments)
+                "total": totals["enrollments"]
             },
-            "schools": school_stats
+            "moods": totals["moods"],
+            "schools": [{"school": r["_id"], "students": r["students"]} for r in school_rows]
         }
     except Exception as e:
         logger.error(f"Error getting analytics: {str(e)}")
@@ -526,33 +545,40 @@ async def get_analytics_overview(
 @router.get("/admin/analytics/sessions")
 async def get_session_analytics(
     days: int = 30,
-    current_user: dict = Depends(verify_admin_token)
+    current_user: dict = Depends(verify_admin_token),
+    loaders: EntityLoaders = Depends(get_loaders)
 ):
-    """Get detailed session analytics"""
+    """Get detailed session analytics for the last `days` days (read from daily rollups)"""
     try:
-        # Get all sessions with observer info
-        sessions = await db.session_logs.find({}, {"_id": 0}).to_list(10000)
+        days = max(1, min(days, 366))
+        rows = await rollups.get_rows("observer", days)
+        
+        by_observer = {}
+        for row in rows:
+            by_observer.setdefault(row["key"], []).append(row)
         
         # Observer performance
         observer_stats = {}
-        for session in sessions:
-            obs_id = session.get("observer_id", "unknown")
-            if obs_id not in observer_stats:
-                observer_stats[obs_id] = {"sessions": 0, "moods": {}}
-            observer_stats[obs_id]["sessions"] += 1
-            mood = session.get("mood", "neutral")
-            observer_stats[obs_id]["moods"][mood] = observer_stats[obs_id]["moods"].get(mood, 0) + 1
+        for obs_id, obs_rows in by_observer.items():
+            totals = rollups.merge(obs_rows)
+            observer_stats[obs_id] = {
+                "sessions": totals["sessions"],
+                "completed_sessions": totals["completed_sessions"],
+                "moods": totals["session_moods"]
+            }
         
         # Get observer names
-        for obs_id in observer_stats:
-            observer = await db.observers.find_one({"id": obs_id}, {"_id": 0, "name": 1})
+        observers = await loaders.load_many("observers", list(observer_stats), {"_id": 0, "name": 1})
+        for obs_id, observer in zip(list(observer_stats), observers):
             observer_stats[obs_id]["name"] = observer.get("name", "Unknown") if observer else "Unknown"
         
         return {
-            "total_sessions": len(sessions),
+            "period_days": days,
+            "total_sessions": sum(s["sessions"] for s in observer_stats.values()),
             "observer_performance": observer_stats
         }
     except Exception as e:
+        logger.error(f"Error getting session analytics: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to load session analytics")
 
 # ==================== SUPPORT TICKET MANAGEMENT ====================
@@ -561,9 +587,11 @@ async def get_session_analytics(
 async def get_all_support_tickets(
     status: Optional[str] = None,
     priority: Optional[str] = None,
+    limit: int = 50,
+    cursor: Optional[str] = None,
     current_user: dict = Depends(verify_admin_token)
 ):
-    """Get all support tickets for admin management"""
+    """Get support tickets for admin management (cursor-paginated, newest first)"""
     try:
         query = {}
         if status:
@@ -571,21 +599,23 @@ async def get_all_support_tickets(
         if priority:
             query["priority"] = priority
         
-        tickets = await db.support_tickets.find(query, {"_id": 0}).sort("created_at", -1).to_list(1000)
+        page = await paginate("support_tickets", query, "created_at", -1, limit, cursor)
+        tickets = page["items"]
         
         # Count by status
-        status_counts = {
-            "open": await db.support_tickets.count_documents({"status": "open"}),
-            "in_progress": await db.support_tickets.count_documents({"status": "in_progress"}),
-            "resolved": await db.support_tickets.count_documents({"status": "resolved"}),
-            "closed": await db.support_tickets.count_documents({"status": "closed"})
-        }
+        counts = await count_by_status(
+            "support_tickets", {}, ["open", "in_progress", "resolved", "closed"], scope="all"
+        )
         
         return {
             "tickets": tickets,
-            "total": len(tickets),
-            "status_counts": status_counts
+            "total": await db.support_tickets.count_documents(query),
+            "status_counts": counts,
+            "next_cursor": page["next_cursor"],
+            "limit": page["limit"]
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail="Failed to load tickets")
 
@@ -612,6 +642,7 @@ async def update_ticket(
             {"id": ticket_id},
             {"$set": update_data}
         )
+        status_counts.invalidate("support_tickets")
         
         if result.modified_count == 0:
             raise HTTPException(status_code=404, detail="Ticket not found")
@@ -649,6 +680,7 @@ async def admin_reply_ticket(
                 }
             }
         )
+        status_counts.invalidate("support_tickets")
         
         return {"success": True, "reply": reply}
     except Exception as e:
@@ -729,6 +761,84 @@ async def get_ai_reports(
     except Exception as e:
         raise HTTPException(status_code=500, detail="Failed to load reports")
 
+@router.get("/admin/ai/jobs")
+async def get_ai_job_stats(
+    current_user: dict = Depends(verify_admin_token)
+):
+    """Background AI job queue: counts by status and the most recent failures"""
+    try:
+        counts, failed = await asyncio.gather(
+            job_queue.stats(),
+            db.ai_jobs.find({"status": "failed"}, {"_id": 0}).sort("updated_at", -1).limit(20).to_list(20)
+        )
+        return {"status_counts": counts, "recent_failures": failed}
+    except Exception as e:
+        logger.error(f"Error getting AI job stats: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to load AI jobs")
+
+@router.get("/admin/email-outbox")
+async def get_email_outbox_stats(
+    current_user: dict = Depends(verify_admin_token)
+):
+    """Outbound email queue: counts by status and the most recent dead letters"""
+    try:
+        counts, dead = await asyncio.gather(
+            email_outbox.stats(),
+            db.email_outbox.find({"status": "dead"}, {"_id": 0, "html": 0}).sort("updated_at", -1).limit(20).to_list(20)
+        )
+        return {"status_counts": counts, "dead_letters": dead}
+    except Exception as e:
+        logger.error(f"Error getting email outbox stats: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to load email outbox")
+
+@router.post("/admin/email-outbox/{email_id}/retry")
+async def retry_dead_email(
+    email_id: str,
+    current_user: dict = Depends(verify_admin_token)
+):
+    """Queue a dead-lettered email for delivery again"""
+    try:
+        if not await email_outbox.requeue(email_id):
+            raise HTTPException(status_code=404, detail="Dead email not found")
+        return {"success": True}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error retrying email {email_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to retry email")
+
+@router.get("/admin/ai/report-cache")
+async def get_report_cache_stats(
+    days: int = 30,
+    current_user: dict = Depends(verify_admin_token)
+):
+    """AI report cache effectiveness per report kind (hits, misses, estimated tokens saved)"""
+    try:
+        return {"period_days": days, "kinds": await report_cache.get_stats(days)}
+    except Exception as e:
+        logger.error(f"Error getting report cache stats: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to load report cache stats")
+
+@router.get("/admin/ai/llm-gateway")
+async def get_llm_gateway_metrics(
+    current_user: dict = Depends(verify_admin_token)
+):
+    """LLM gateway pools (queue depth, in flight, wait times, rejections) and budget usage"""
+    return llm_gateway.metrics()
+
+@router.post("/admin/ai/behavioral-profiles/rebuild")
+async def rebuild_behavioral_profiles(
+    child_id: Optional[str] = None,
+    current_user: dict = Depends(verify_admin_token)
+):
+    """Queue a rebuild of behavioral profiles from session logs (one child, or all)"""
+    try:
+        queued = await behavioral_profiles.enqueue_rebuild(child_id)
+        return {"success": True, "queued": queued}
+    except Exception as e:
+        logger.error(f"Error queueing behavioral profile rebuild: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to queue profile rebuild")
+
 # ==================== BILLING MANAGEMENT ====================
 
 @router.get("/admin/billing/subscriptions")
@@ -887,7 +997,8 @@ async def get_activity_log(
             })
         
         # Sort by timestamp
-        activities.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
+        oldest = datetime.min.replace(tzinfo=timezone.utc)
+        activities.sort(key=lambda x: parse_datetime(x.get("timestamp")) or oldest, reverse=True)
         
         return {"activities": activities[:limit]}
     except Exception as e:
@@ -1027,6 +1138,7 @@ async def update_principal_pay_rate(
                 "rate_updated_by": current_user.get('sub', 'admin')
             }}
         )
+        school_scope.invalidate_principal(principal_id)
         
         return {"success": True, "message": f"Principal rate updated to {consultation_rate}"}
     except HTTPException:
@@ -1042,9 +1154,12 @@ async def get_all_payments(
     month: str = None,
     recipient_type: str = None,
     status: str = None,
-    current_user: dict = Depends(verify_admin_token)
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(verify_admin_token),
+    loaders: EntityLoaders = Depends(get_loaders)
 ):
-    """Get all payments with filtering"""
+    """Get payments with filtering (cursor-paginated, newest first)"""
     try:
         query = {}
         if month:
@@ -1054,27 +1169,38 @@ async def get_all_payments(
         if status:
             query["status"] = status
         
-        payments = await db.payments.find(query, {"_id": 0}).sort("created_at", -1).to_list(1000)
+        page = await paginate("payments", query, "created_at", -1, limit, cursor)
+        payments = page["items"]
         
         # Enrich with recipient info
-        for payment in payments:
-            if payment.get('recipient_type') == 'observer':
-                recipient = await db.observers.find_one({"id": payment.get('recipient_id')}, {"_id": 0, "hashed_password": 0})
-            elif payment.get('recipient_type') == 'principal':
-                recipient = await db.principals.find_one({"id": payment.get('recipient_id')}, {"_id": 0, "hashed_password": 0})
-            else:
-                recipient = None
+        contact = {"_id": 0, "name": 1, "email": 1}
+        observers, principals = await asyncio.gather(
+            loaders.load_many("observers", [p.get('recipient_id') if p.get('recipient_type') == 'observer' else None for p in payments], contact),
+            loaders.load_many("principals", [p.get('recipient_id') if p.get('recipient_type') == 'principal' else None for p in payments], contact)
+        )
+        for payment, observer, principal in zip(payments, observers, principals):
+            recipient = observer or principal
             payment['recipient'] = {"name": recipient.get('name'), "email": recipient.get('email')} if recipient else None
         
-        # Summary
-        summary = {
-            "total_payments": len(payments),
-            "total_amount": sum([p.get('amount', 0) for p in payments]),
-            "completed": sum([p.get('amount', 0) for p in payments if p.get('status') == 'completed']),
-            "pending": sum([p.get('amount', 0) for p in payments if p.get('status') == 'pending'])
-        }
+        # Summary over every matching payment, not just this page
+        summary = {"total_payments": 0, "total_amount": 0, "completed": 0, "pending": 0}
+        async for row in db.payments.aggregate([
+            {"$match": query},
+            {"$group": {"_id": "$status", "count": {"$sum": 1}, "amount": {"$sum": "$amount"}}}
+        ]):
+            summary["total_payments"] += row["count"]
+            summary["total_amount"] += row["amount"]
+            if row["_id"] in ("completed", "pending"):
+                summary[row["_id"]] = row["amount"]
         
-        return {"payments": payments, "summary": summary}
+        return {
+            "payments": payments,
+            "summary": summary,
+            "next_cursor": page["next_cursor"],
+            "limit": page["limit"]
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Get payments error: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to load payments")
@@ -4,6 +4,8 @@ import os
 import jwt
 from datetime import datetime, timedelta
 from passlib.context import CryptContext
+from loaders import EntityLoaders, get_loaders
+from pagination import paginate
 from models import (
     AdminLogin, HeroContent, FounderContent, WhatIsSanjaya,
     WhatWeOffer, HowItWorks, TrustSafety, ContactInfo,
@@ -319,10 +321,15 @@ async def update_get_started_content(content: GetStartedContent, payload: dict =
 
 # Inquiries Management
 @router.get("/inquiries")
-async def get_all_inquiries(payload: dict = Depends(verify_token)):
-    """Get all form inquiries for admin view"""
-    inquiries = await db.inquiries.find({}, {"_id": 0}).sort("created_at", -1).to_list(1000)
-    return {"inquiries": inquiries, "total": len(inquiries)}
+async def get_all_inquiries(limit: int = 50, cursor: Optional[str] = None, payload: dict = Depends(verify_token)):
+    """Get form inquiries for admin view (cursor-paginated, newest first)"""
+    page = await paginate("inquiries", {}, "created_at", -1, limit, cursor)
+    return {
+        "inquiries": page["items"],
+        "total": await db.inquiries.count_documents({}),
+        "next_cursor": page["next_cursor"],
+        "limit": page["limit"]
+    }
 
 @router.put("/inquiries/{inquiry_id}")
 async def update_inquiry_status(inquiry_id: str, status: str, notes: str = "", payload: dict = Depends(verify_token)):
@@ -341,19 +348,16 @@ async def update_inquiry_status(inquiry_id: str, status: str, notes: str = "", p
 # ==================== GUARDIAN MANAGEMENT ====================
 
 @router.get("/children")
-async def get_all_children(current_user: dict = Depends(verify_token)):
+async def get_all_children(current_user: dict = Depends(verify_token), loaders: EntityLoaders = Depends(get_loaders)):
     """Get all children with their guardians"""
     try:
         children = await db.children.find({}, {"_id": 0}).to_list(1000)
         
-        # For each child, get guardian details
+        # Guardian details for every child in one batched query
+        await loaders.load_many("parents", [pid for c in children for pid in c.get('parent_ids', [])])
         for child in children:
-            guardians = []
-            for parent_id in child.get('parent_ids', []):
-                parent = await db.parents.find_one({"id": parent_id}, {"_id": 0, "hashed_password": 0})
-                if parent:
-                    guardians.append(parent)
-            child['guardians'] = guardians
+            guardians = await loaders.load_many("parents", child.get('parent_ids', []))
+            child['guardians'] = [g for g in guardians if g]
         
         return {"children": children}
     except Exception as e:
@@ -3,9 +3,11 @@ AI Report Generation Routes - Generate insights from session logs
 """
 from fastapi import APIRouter, HTTPException
 from datetime import datetime, timezone, timedelta
+import report_cache
+import llm_stream
+import llm_gateway
+import prompt_context
 import logging
-import uuid
-from emergentintegrations.llm.chat import LlmChat, UserMessage
 
 router = APIRouter()
 db = None
@@ -24,66 +26,91 @@ def verify_observer_token(token: str):
     from observer_routes import verify_observer_token as verify
     return verify(token)
 
-@router.post("/observer/generate-report/{child_id}")
-async def generate_child_report(child_id: str, token: str, days: int = 30):
-    """Generate AI-powered report for a child using session data"""
-    try:
-        user = verify_observer_token(token)
-        observer_id = user['id']
-        
-        # Verify access
-        child = await db.children.find_one({
-            "id": child_id,
-            "observer_id": observer_id
-        }, {"_id": 0})
-        
-        if not child:
-            raise HTTPException(status_code=404, detail="Child not found or access denied")
-        
-        # Collect data for report
-        cutoff_date = (datetime.now(timezone.utc) - timedelta(days=days)).isoformat()
-        
-        # Get mood entries
-        mood_entries = await db.mood_entries.find(
-            {"child_id": child_id, "created_at": {"$gte": cutoff_date}},
-            {"_id": 0}
-        ).sort("logged_date", -1).to_list(100)
-        
-        # Get goals
-        goals = await db.goals.find(
-            {"child_id": child_id},
-            {"_id": 0}
-        ).to_list(50)
-        
-        # Get progress notes
-        progress_notes = await db.progress_notes.find(
-            {"child_id": child_id, "date": {"$gte": cutoff_date}},
-            {"_id": 0}
-        ).sort("date", -1).to_list(50)
-        
-        # Get appointments
-        appointments = await db.appointments.find(
-            {"child_id": child_id, "scheduled_date": {"$gte": cutoff_date}},
-            {"_id": 0}
-        ).sort("scheduled_date", -1).to_list(50)
-        
-        # Prepare data summary for AI
-        mood_summary = {}
-        for entry in mood_entries:
-            mood = entry.get('mood', 'neutral')
-            mood_summary[mood] = mood_summary.get(mood, 0) + 1
-        
-        goals_summary = {
-            'total': len(goals),
-            'active': len([g for g in goals if g.get('status') == 'active']),
-            'completed': len([g for g in goals if g.get('status') == 'completed']),
-            'avg_progress': sum([g.get('progress', 0) for g in goals]) / len(goals) if goals else 0
-        }
-        
-        sessions_count = len([a for a in appointments if a.get('status') == 'completed'])
-        
-        # Create prompt for AI
-        prompt = f"""Generate a comprehensive emotional support report for {child['name']}, a {child['age']}-year-old child in {child['grade']}.
+CHILD_REPORT_SYSTEM_MESSAGE = "You are an expert child psychologist and emotional support specialist. Generate comprehensive, empathetic, and actionable reports for children's emotional development."
+
+async def _get_report_child(child_id: str, token: str):
+    user = verify_observer_token(token)
+    
+    # Verify access
+    child = await db.children.find_one({
+        "id": child_id,
+        "observer_id": user['id']
+    }, {"_id": 0})
+    
+    if not child:
+        raise HTTPException(status_code=404, detail="Child not found or access denied")
+    return user['id'], child
+
+async def _prepare_child_report(child: dict, days: int) -> dict:
+    """Collect the report data and build the prompt"""
+    child_id = child['id']
+    
+    # Collect data for report
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    cutoff_date = cutoff.isoformat()
+    
+    # Get mood entries
+    mood_entries = await db.mood_entries.find(
+        {"child_id": child_id, "created_at": {"$gte": cutoff}},
+        {"_id": 0}
+    ).sort("logged_date", -1).to_list(100)
+    
+    # Get goals
+    goals = await db.goals.find(
+        {"child_id": child_id},
+        {"_id": 0}
+    ).to_list(50)
+    
+    # Get progress notes
+    progress_notes = await db.progress_notes.find(
+        {"child_id": child_id, "date": {"$gte": cutoff_date}},
+        {"_id": 0}
+    ).sort("date", -1).to_list(50)
+    
+    # Get appointments
+    appointments = await db.appointments.find(
+        {"child_id": child_id, "scheduled_date": {"$gte": cutoff}},
+        {"_id": 0}
+    ).sort("scheduled_date", -1).to_list(50)
+    
+    # Prepare data summary for AI
+    mood_summary = {}
+    for entry in mood_entries:
+        mood = entry.get('mood', 'neutral')
+        mood_summary[mood] = mood_summary.get(mood, 0) + 1
+    
+    goals_summary = {
+        'total': len(goals),
+        'active': len([g for g in goals if g.get('status') == 'active']),
+        'completed': len([g for g in goals if g.get('status') == 'completed']),
+        'avg_progress': sum([g.get('progress', 0) for g in goals]) / len(goals) if goals else 0
+    }
+    
+    sessions_count = len([a for a in appointments if a.get('status') == 'completed'])
+    
+    # Pack the free-text data into the context budget, most important first
+    context, context_stats = prompt_context.build_context([
+        prompt_context.section(
+            "goals",
+            [f"{goal['title']} ({goal['progress']}% complete) - {goal.get('description', '')}"
+             for goal in goals if goal.get('status') == 'active'],
+            priority=1, item_tokens=80, deduplicate=False
+        ),
+        prompt_context.section(
+            "mood_entries",
+            [f"{entry['logged_date']}: {entry['mood_emoji']} {entry['mood']} - {entry.get('notes') or 'No notes'}"
+             for entry in mood_entries],
+            priority=2, item_tokens=60
+        ),
+        prompt_context.section(
+            "progress_notes",
+            [f"{note.get('date', 'N/A')}: {note.get('note', 'No note')}" for note in progress_notes],
+            priority=3, item_tokens=100
+        ),
+    ], prompt_context.REPORT_CONTEXT_TOKENS)
+    
+    # Create prompt for AI
+    prompt = f"""Generate a comprehensive emotional support report for {child['name']}, a {child['age']}-year-old child in {child['grade']}.
 
 **Data Analysis Period:** Last {days} days
 
@@ -108,13 +135,13 @@ async def generate_child_report(child_id: str, token: str, days: int = 30):
 - Average Progress: {goals_summary['avg_progress']:.1f}%
 
 **Recent Mood Entries with Observer Notes:**
-{chr(10).join([f"- {entry['logged_date']}: {entry['mood_emoji']} {entry['mood']} - {entry.get('notes', 'No notes')[:100]}" for entry in mood_entries[:10]])}
+{context['mood_entries']}
 
 **Active Goals:**
-{chr(10).join([f"- {goal['title']} ({goal['progress']}% complete) - {goal['description'][:100]}" for goal in goals if goal.get('status') == 'active'][:5])}
+{context['goals']}
 
 **Recent Progress Notes:**
-{chr(10).join([f"- {note.get('date', 'N/A')}: {note.get('note', 'No note')[:150]}" for note in progress_notes[:5]])}
+{context['progress_notes']}
 
 Please generate a professional report with the following sections:
 
@@ -128,55 +155,89 @@ Please generate a professional report with the following sections:
 
 Make the report professional, empathetic, and actionable. Focus on the child's strengths while identifying growth areas. Use specific examples from the data provided."""
 
+    return {
+        "prompt": prompt,
+        "system": CHILD_REPORT_SYSTEM_MESSAGE,
+        "days": days,
+        "sessions_count": sessions_count,
+        "mood_entries_analyzed": len(mood_entries),
+        "goals_analyzed": len(goals),
+        "mood_summary": mood_summary,
+        "goals_summary": goals_summary,
+        "prompt_context": context_stats
+    }
+
+def _report_cache_inputs(child_id: str, observer_id: str, ctx: dict) -> dict:
+    return {
+        "child_id": child_id,
+        "observer_id": observer_id,
+        "days": ctx["days"],
+        "model": "gpt-4o-mini",
+        "system": ctx["system"],
+        "prompt": ctx["prompt"]
+    }
+
+async def _save_child_report(child_id: str, observer_id: str, ctx: dict, report_content: str) -> dict:
+    """Persist a generated report; returns the API representation"""
+    report = {
+        "id": f"report-{child_id}-{datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')}",
+        "child_id": child_id,
+        "observer_id": observer_id,
+        "report_content": report_content,
+        "data_period_days": ctx["days"],
+        "sessions_analyzed": ctx["sessions_count"],
+        "mood_entries_analyzed": ctx["mood_entries_analyzed"],
+        "goals_analyzed": ctx["goals_analyzed"],
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "metadata": {
+            "mood_summary": ctx["mood_summary"],
+            "goals_summary": ctx["goals_summary"],
+            "sessions_count": ctx["sessions_count"],
+            "prompt_context": ctx["prompt_context"]
+        }
+    }
+    
+    await db.ai_reports.insert_one(report)
+    
+    return {
+        "id": report["id"],
+        "content": report_content,
+        "generated_at": report["generated_at"],
+        "data_period_days": ctx["days"],
+        "sessions_analyzed": ctx["sessions_count"],
+        "mood_entries_analyzed": ctx["mood_entries_analyzed"]
+    }
+
+@router.post("/observer/generate-report/{child_id}")
+async def generate_child_report(child_id: str, token: str, days: int = 30, force: bool = False):
+    """Generate AI-powered report for a child using session data.
+    Unchanged inputs return the cached report unless `force` is set."""
+    try:
+        observer_id, child = await _get_report_child(child_id, token)
+        ctx = await _prepare_child_report(child, days)
+        
         # Generate report using OpenAI via Emergent Integrations
-        try:
-            session_id = str(uuid.uuid4())
-            system_message = "You are an expert child psychologist and emotional support specialist. Generate comprehensive, empathetic, and actionable reports for children's emotional development."
-            
-            chat = LlmChat(
-                api_key=EMERGENT_API_KEY,
-                session_id=session_id,
-                system_message=system_message
-            ).with_model("openai", "gpt-4o-mini")
-            
-            user_msg = UserMessage(text=prompt)
-            report_content = await chat.send_message(user_msg)
-            
-            # Save report to database
-            report = {
-                "id": f"report-{child_id}-{datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')}",
-                "child_id": child_id,
-                "observer_id": observer_id,
-                "report_content": report_content,
-                "data_period_days": days,
-                "sessions_analyzed": sessions_count,
-                "mood_entries_analyzed": len(mood_entries),
-                "goals_analyzed": len(goals),
-                "generated_at": datetime.now(timezone.utc).isoformat(),
-                "metadata": {
-                    "mood_summary": mood_summary,
-                    "goals_summary": goals_summary,
-                    "sessions_count": sessions_count
-                }
-            }
-            
-            await db.ai_reports.insert_one(report)
+        async def generate():
+            try:
+                report_content = await llm_gateway.send_message(
+                    EMERGENT_API_KEY, ctx["system"], ctx["prompt"], llm_gateway.OBSERVER
+                )
+            except HTTPException:
+                raise
+            except Exception as ai_error:
+                logger.error(f"AI generation error: {str(ai_error)}")
+                raise HTTPException(status_code=500, detail=f"AI report generation failed: {str(ai_error)}")
             
-            return {
-                "success": True,
-                "report": {
-                    "id": report["id"],
-                    "content": report_content,
-                    "generated_at": report["generated_at"],
-                    "data_period_days": days,
-                    "sessions_analyzed": sessions_count,
-                    "mood_entries_analyzed": len(mood_entries)
-                }
-            }
-            
-        except Exception as ai_error:
-            logger.error(f"AI generation error: {str(ai_error)}")
-            raise HTTPException(status_code=500, detail=f"AI report generation failed: {str(ai_error)}")
+            return await _save_child_report(child_id, observer_id, ctx, report_content)
+        
+        inputs = _report_cache_inputs(child_id, observer_id, ctx)
+        result, cached = await report_cache.get_or_generate("child_report", inputs, generate, force)
+        
+        return {
+            "success": True,
+            "report": result,
+            "cached": cached
+        }
             
     except HTTPException:
         raise
@@ -184,6 +245,38 @@ Make the report professional, empathetic, and actionable. Focus on the child's s
         logger.error(f"Error generating report: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to generate report")
 
+@router.post("/observer/generate-report/{child_id}/stream")
+async def stream_child_report(child_id: str, token: str, days: int = 30, force: bool = False):
+    """Streaming variant of generate-report (text/event-stream).
+    Emits `token` events as the report is written and `done` with the saved report."""
+    try:
+        observer_id, child = await _get_report_child(child_id, token)
+        ctx = await _prepare_child_report(child, days)
+        inputs = _report_cache_inputs(child_id, observer_id, ctx)
+        
+        cached = None if force else await report_cache.lookup("child_report", inputs)
+        if cached:
+            async def replay():
+                yield cached["content"]
+            async def finish_cached(_):
+                return {"report": cached, "cached": True}
+            return llm_stream.sse_response(llm_stream.stream_events(replay(), finish_cached))
+        
+        async def finish(report_content: str):
+            result = await _save_child_report(child_id, observer_id, ctx, report_content)
+            await report_cache.store("child_report", inputs, result, force)
+            return {"report": result, "cached": False}
+        
+        tokens = llm_stream.stream_completion(
+            EMERGENT_API_KEY, ctx["system"], [{"role": "user", "content": ctx["prompt"]}], llm_gateway.OBSERVER
+        )
+        return llm_stream.sse_response(llm_stream.stream_events(tokens, finish))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error streaming report: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to generate report")
+
 @router.get("/observer/reports/{child_id}")
 async def get_child_reports(child_id: str, token: str):
     """Get all AI-generated reports for a child"""
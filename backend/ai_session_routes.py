@@ -1,16 +1,32 @@
 """
 AI Session Intelligence System
 - Session log management
-- Behavioral tag extraction
+- Behavioral tag extraction (queued on the background job queue, see job_queue.py;
+  routine logs are tagged locally by lexicon_tagger, backlogs are analysed several
+  sessions per LLM call)
 - Trend analysis
 - Parent report generation
 """
 from fastapi import APIRouter, HTTPException
 from datetime import datetime, timezone, timedelta
-from typing import Optional, List
+from typing import Dict, Optional, List
+from date_ranges import parse_datetime, day_range, day_key, format_date
+import rollups
+import job_queue
+import report_cache
+import llm_stream
+import llm_gateway
+import prompt_context
+import behavioral_profiles
+import lexicon_tagger
+import search
+import trends
+from loaders import EntityLoaders
+import asyncio
+import json
 import logging
+import os
 import uuid
-from emergentintegrations.llm.chat import LlmChat, UserMessage
 
 router = APIRouter()
 db = None
@@ -26,6 +42,12 @@ def verify_observer_token(token: str):
     from observer_routes import verify_observer_token as verify
     return verify(token)
 
+SESSION_ANALYSIS_JOB = "session_analysis"
+# Backlog jobs are analysed this many session logs per LLM call (1 disables batching)
+ANALYSIS_BATCH_SIZE = int(os.environ.get('AI_ANALYSIS_BATCH_SIZE', '8'))
+# Completion tokens reserved per session in a batch call
+ANALYSIS_OUTPUT_TOKENS = 300
+
 # ==================== SESSION LOG MANAGEMENT ====================
 
 @router.post("/observer/session-log")
@@ -56,11 +78,15 @@ async def create_session_log(
         if not child:
             raise HTTPException(status_code=404, detail="Child not found or access denied")
         
+        session_day = parse_datetime(session_date)
+        if not session_day:
+            raise HTTPException(status_code=400, detail="Invalid session_date")
+        
         session_log = {
             "id": f"session-{uuid.uuid4().hex[:12]}",
             "child_id": child_id,
             "observer_id": observer_id,
-            "session_date": session_date,
+            "session_date": session_day,
             "duration_minutes": duration_minutes,
             "session_notes": session_notes,
             "mood_observed": mood_observed,
@@ -71,23 +97,27 @@ async def create_session_log(
             "positive_observations": positive_observations,
             "behavioral_tags": [],  # Will be filled by AI
             "ai_processed": False,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "ai_status": "queued",
+            "created_at": datetime.now(timezone.utc)
         }
         
         await db.session_logs.insert_one(session_log)
+        await rollups.record_session(session_log, child.get('school'))
+        await search.index_session_log(session_log)
         
-        # Trigger AI analysis in background
+        # AI analysis runs on the job queue; the sweep re-enqueues it if this fails
         try:
-            await analyze_session_log(session_log["id"], token)
+            await job_queue.enqueue(SESSION_ANALYSIS_JOB, session_log["id"])
         except Exception as e:
-            logger.warning(f"AI analysis deferred: {str(e)}")
+            logger.warning(f"AI analysis enqueue deferred: {str(e)}")
         
         return {
             "success": True,
             "session_log": {
                 "id": session_log["id"],
                 "session_date": session_date,
-                "mood_observed": mood_observed
+                "mood_observed": mood_observed,
+                "ai_status": "queued"
             }
         }
     except HTTPException:
@@ -124,50 +154,117 @@ async def get_session_logs(child_id: str, token: str, limit: int = 30):
 
 # ==================== AI BEHAVIORAL TAG EXTRACTION ====================
 
-@router.post("/observer/analyze-session/{session_id}")
-async def analyze_session_log(session_id: str, token: str):
-    """AI analysis of a session log to extract behavioral tags"""
-    try:
-        user = verify_observer_token(token)
-        
-        session_log = await db.session_logs.find_one({
-            "id": session_id,
-            "observer_id": user['id']
-        }, {"_id": 0})
-        
-        if not session_log:
-            raise HTTPException(status_code=404, detail="Session log not found")
-        
-        # Get child info
-        child = await db.children.find_one({"id": session_log['child_id']}, {"_id": 0})
-        
-        # Create prompt for behavioral tag extraction
-        prompt = f"""Analyze this session log and extract behavioral tags, patterns, and insights.
+ANALYSIS_SYSTEM_MESSAGE = "You are an expert child psychologist analyzing session logs. Extract behavioral tags and patterns. Always respond in valid JSON format."
 
-**Child:** {child['name']}, Age {child['age']}, {child['grade']}
-**Session Date:** {session_log['session_date']}
+ANALYSIS_INSTRUCTIONS = """1. **Behavioral Tags** (list 3-7 tags like: "shows_empathy", "anxiety_indicators", "social_confidence", "creative_expression", "emotional_regulation", "peer_relationships", "family_attachment", "academic_stress", "self_esteem_building", "communication_growth")
+2. **Emotional State Summary** (1-2 sentences)
+3. **Key Patterns Noticed** (2-3 bullet points)
+4. **Recommended Focus Areas** (1-2 suggestions for next session)"""
+
+def _session_details(session_log: dict, child: dict):
+    """Prompt block describing one session; returns (text, prompt context stats)"""
+    # Long free-text fields share one token budget; the notes themselves come first
+    context, context_stats = prompt_context.build_context([
+        prompt_context.section(name, [session_log.get(name) or ""], priority, empty="Not specified", bullet="", deduplicate=False)
+        for priority, name in enumerate(["session_notes", "concerns_noted", "positive_observations", "topics_discussed"])
+    ], prompt_context.ANALYSIS_CONTEXT_TOKENS)
+    
+    details = f"""**Child:** {child['name']}, Age {child['age']}, {child['grade']}
+**Session Date:** {format_date(session_log['session_date'])}
 **Duration:** {session_log['duration_minutes']} minutes
 **Mood Observed:** {session_log['mood_observed']}
 **Energy Level:** {session_log['energy_level']}
 **Engagement:** {session_log['engagement_level']}
 
 **Session Notes:**
-{session_log['session_notes']}
+{context['session_notes']}
 
 **Topics Discussed:**
-{session_log.get('topics_discussed', 'Not specified')}
+{context['topics_discussed']}
 
 **Positive Observations:**
-{session_log.get('positive_observations', 'Not specified')}
+{context['positive_observations']}
 
 **Concerns Noted:**
-{session_log.get('concerns_noted', 'Not specified')}
+{context['concerns_noted']}"""
+    return details, context_stats
+
+def _parse_analysis(response: str) -> dict:
+    try:
+        # Try to extract JSON from response
+        json_start = response.find('{')
+        json_end = response.rfind('}') + 1
+        if json_start != -1 and json_end > json_start:
+            return json.loads(response[json_start:json_end])
+        return {
+            "behavioral_tags": ["session_completed"],
+            "emotional_summary": "Session recorded successfully",
+            "patterns": [],
+            "focus_areas": []
+        }
+    except json.JSONDecodeError:
+        return {
+            "behavioral_tags": ["session_completed"],
+            "emotional_summary": response[:200],
+            "patterns": [],
+            "focus_areas": []
+        }
+
+def _valid_analysis(analysis) -> bool:
+    """Result has the shape run_session_analysis stores"""
+    if not isinstance(analysis, dict) or not isinstance(analysis.get("emotional_summary"), str):
+        return False
+    tags = analysis.get("behavioral_tags")
+    if not isinstance(tags, list) or not tags or not all(isinstance(t, str) and t for t in tags):
+        return False
+    return all(
+        isinstance(analysis.get(field), list) and all(isinstance(item, str) for item in analysis[field])
+        for field in ("patterns", "focus_areas")
+    )
+
+async def _save_analysis(session_log: dict, analysis: dict, context_stats: dict):
+    # Update session log with AI analysis
+    await db.session_logs.update_one(
+        {"id": session_log['id']},
+        {"$set": {
+            "behavioral_tags": analysis.get("behavioral_tags", []),
+            "ai_analysis": analysis,
+            "ai_processed": True,
+            "ai_status": "done",
+            "ai_error": None,
+            "ai_prompt_context": context_stats,
+            "ai_processed_at": datetime.now(timezone.utc).isoformat()
+        }}
+    )
+    
+    # Update child's behavioral profile
+    await behavioral_profiles.record_tags(
+        session_log['child_id'], analysis.get("behavioral_tags", []), session_log.get('session_date')
+    )
+
+async def run_session_analysis(session_log: dict, priority: str = llm_gateway.OBSERVER) -> dict:
+    """Extract behavioral tags for a session log and fold them into the child's profile.
+    LLM errors propagate so the job queue can retry."""
+    session_id = session_log['id']
+    await db.session_logs.update_one({"id": session_id}, {"$set": {"ai_status": "processing"}})
+    
+    # Routine logs are tagged in-process without an LLM call
+    analysis = lexicon_tagger.analyze(session_log)
+    if analysis:
+        await _save_analysis(session_log, analysis, None)
+        return analysis
+    
+    # Get child info
+    child = await db.children.find_one({"id": session_log['child_id']}, {"_id": 0})
+    details, context_stats = _session_details(session_log, child)
+    
+    # Create prompt for behavioral tag extraction
+    prompt = f"""Analyze this session log and extract behavioral tags, patterns, and insights.
+
+{details}
 
 Please provide:
-1. **Behavioral Tags** (list 3-7 tags like: "shows_empathy", "anxiety_indicators", "social_confidence", "creative_expression", "emotional_regulation", "peer_relationships", "family_attachment", "academic_stress", "self_esteem_building", "communication_growth")
-2. **Emotional State Summary** (1-2 sentences)
-3. **Key Patterns Noticed** (2-3 bullet points)
-4. **Recommended Focus Areas** (1-2 suggestions for next session)
+{ANALYSIS_INSTRUCTIONS}
 
 Format your response as JSON:
 {{
@@ -177,50 +274,158 @@ Format your response as JSON:
   "focus_areas": ["area1", "area2"]
 }}"""
 
-        chat = LlmChat(
-            api_key=EMERGENT_API_KEY,
-            session_id=str(uuid.uuid4()),
-            system_message="You are an expert child psychologist analyzing session logs. Extract behavioral tags and patterns. Always respond in valid JSON format."
-        ).with_model("openai", "gpt-4o-mini")
-        
-        response = await chat.send_message(UserMessage(text=prompt))
+    response = await llm_gateway.send_message(EMERGENT_API_KEY, ANALYSIS_SYSTEM_MESSAGE, prompt, priority)
+    
+    analysis = _parse_analysis(response)
+    await _save_analysis(session_log, analysis, context_stats)
+    return analysis
+
+async def run_batch_session_analysis(session_logs: List[dict], priority: str = llm_gateway.BATCH) -> Dict[str, Optional[str]]:
+    """Analyse several session logs with one LLM call. Returns an error message (or
+    None) per session id; sessions whose result is missing or malformed get
+    job_queue.RUN_SINGLY so the queue retries them with single-session calls, each on
+    its own time budget. A failure of the batch call itself propagates."""
+    if not session_logs:
+        return {}
+    await db.session_logs.update_many(
+        {"id": {"$in": [log['id'] for log in session_logs]}},
+        {"$set": {"ai_status": "processing"}}
+    )
+    
+    errors, pending = {}, []
+    for log in session_logs:
+        analysis = lexicon_tagger.analyze(log)
+        if analysis:
+            await _save_analysis(log, analysis, None)
+            errors[log['id']] = None
+        else:
+            pending.append(log)
+    session_logs = pending
+    
+    children = await EntityLoaders(db).load_many("children", [log['child_id'] for log in session_logs])
+    blocks, stats = [], {}
+    for log, child in zip(session_logs, children):
+        if not child:
+            errors[log['id']] = "Child not found"
+            continue
+        details, stats[log['id']] = _session_details(log, child)
+        blocks.append(f"### Session {log['id']}\n{details}")
+    session_logs = [log for log in session_logs if log['id'] in stats]
+    if not session_logs:
+        return errors
+    
+    sessions_text = "\n\n".join(blocks)
+    prompt = f"""Analyze each of the following {len(session_logs)} session logs independently and extract behavioral tags, patterns, and insights.
+
+{sessions_text}
+
+For every session please provide:
+{ANALYSIS_INSTRUCTIONS}
+
+Format your response as a JSON array with exactly one object per session, using the session id from its heading:
+[
+  {{
+    "session_id": "...",
+    "behavioral_tags": ["tag1", "tag2", ...],
+    "emotional_summary": "...",
+    "patterns": ["pattern1", "pattern2", ...],
+    "focus_areas": ["area1", "area2"]
+  }}
+]"""
+
+    response = await llm_gateway.send_message(
+        EMERGENT_API_KEY, ANALYSIS_SYSTEM_MESSAGE, prompt, priority,
+        output_tokens=ANALYSIS_OUTPUT_TOKENS * len(session_logs)
+    )
+    
+    results = {}
+    try:
+        json_start = response.find('[')
+        json_end = response.rfind(']') + 1
+        if json_start != -1 and json_end > json_start:
+            for item in json.loads(response[json_start:json_end]):
+                if isinstance(item, dict) and item.get("session_id"):
+                    results[str(item.pop("session_id"))] = item
+    except json.JSONDecodeError:
+        logger.warning(f"Unparseable batch analysis response for {len(session_logs)} sessions")
+    
+    fallback = []
+    for log in session_logs:
+        analysis = results.get(log['id'])
+        if _valid_analysis(analysis):
+            await _save_analysis(log, analysis, stats[log['id']])
+            errors[log['id']] = None
+        else:
+            fallback.append(log)
+    
+    if fallback:
+        logger.info(f"Batch analysis: {len(session_logs) - len(fallback)} ok, {len(fallback)} falling back to single calls")
+    for log in fallback:
+        errors[log['id']] = job_queue.RUN_SINGLY
+    return errors
+
+async def process_session_analysis_job(session_id: str):
+    """Job queue handler - skips logs that are gone or were analysed meanwhile"""
+    session_log = await db.session_logs.find_one({"id": session_id}, {"_id": 0})
+    if not session_log or session_log.get("ai_processed"):
+        return
+    await run_session_analysis(session_log, llm_gateway.BATCH)
+
+async def process_session_analysis_batch(session_ids: List[str]) -> Dict[str, Optional[str]]:
+    """Batch job handler - packs the pending logs into one analysis call"""
+    session_logs = await db.session_logs.find(
+        {"id": {"$in": session_ids}, "ai_processed": {"$ne": True}},
+        {"_id": 0}
+    ).to_list(len(session_ids))
+    errors = {session_id: None for session_id in session_ids}
+    if len(session_logs) == 1:
+        await run_session_analysis(session_logs[0], llm_gateway.BATCH)
+    elif session_logs:
+        errors.update(await run_batch_session_analysis(session_logs))
+    return errors
+
+async def mark_session_analysis_failed(session_id: str, error: str):
+    await db.session_logs.update_one(
+        {"id": session_id},
+        {"$set": {"ai_status": "failed", "ai_error": error[:500]}}
+    )
+
+async def sweep_unanalyzed_sessions() -> int:
+    """Catch-up: enqueue session logs still waiting for analysis (failed ones need a manual retry)"""
+    await db.session_logs.update_many(
+        {"ai_processed": False, "ai_status": {"$exists": False}},
+        {"$set": {"ai_status": "queued"}}
+    )
+    queued = 0
+    async for log in db.session_logs.find({"ai_processed": False, "ai_status": {"$in": ["queued", "processing"]}}, {"_id": 0, "id": 1}):
+        job = await job_queue.enqueue(SESSION_ANALYSIS_JOB, log["id"])
+        queued += job["attempts"] == 0
+    return queued
+
+job_queue.register(
+    SESSION_ANALYSIS_JOB,
+    process_session_analysis_job,
+    on_failed=mark_session_analysis_failed,
+    batch_handler=process_session_analysis_batch,
+    batch_size=ANALYSIS_BATCH_SIZE
+)
+job_queue.add_sweep(sweep_unanalyzed_sessions)
+
+@router.post("/observer/analyze-session/{session_id}")
+async def analyze_session_log(session_id: str, token: str):
+    """AI analysis of a session log to extract behavioral tags (runs inline)"""
+    try:
+        user = verify_observer_token(token)
         
-        # Parse AI response
-        import json
-        try:
-            # Try to extract JSON from response
-            json_start = response.find('{')
-            json_end = response.rfind('}') + 1
-            if json_start != -1 and json_end > json_start:
-                analysis = json.loads(response[json_start:json_end])
-            else:
-                analysis = {
-                    "behavioral_tags": ["session_completed"],
-                    "emotional_summary": "Session recorded successfully",
-                    "patterns": [],
-                    "focus_areas": []
-                }
-        except json.JSONDecodeError:
-            analysis = {
-                "behavioral_tags": ["session_completed"],
-                "emotional_summary": response[:200],
-                "patterns": [],
-                "focus_areas": []
-            }
+        session_log = await db.session_logs.find_one({
+            "id": session_id,
+            "observer_id": user['id']
+        }, {"_id": 0})
         
-        # Update session log with AI analysis
-        await db.session_logs.update_one(
-            {"id": session_id},
-            {"$set": {
-                "behavioral_tags": analysis.get("behavioral_tags", []),
-                "ai_analysis": analysis,
-                "ai_processed": True,
-                "ai_processed_at": datetime.now(timezone.utc).isoformat()
-            }}
-        )
+        if not session_log:
+            raise HTTPException(status_code=404, detail="Session log not found")
         
-        # Update child's behavioral profile
-        await update_child_behavioral_profile(session_log['child_id'], analysis.get("behavioral_tags", []))
+        analysis = await run_session_analysis(session_log)
         
         return {
             "success": True,
@@ -232,46 +437,41 @@ Format your response as JSON:
         logger.error(f"Error analyzing session: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to analyze session")
 
-async def update_child_behavioral_profile(child_id: str, new_tags: List[str]):
-    """Update child's aggregated behavioral profile"""
+@router.get("/observer/analyze-session/{session_id}/status")
+async def get_session_analysis_status(session_id: str, token: str):
+    """Background analysis state of a session log"""
     try:
-        profile = await db.behavioral_profiles.find_one({"child_id": child_id})
-        
-        if not profile:
-            profile = {
-                "child_id": child_id,
-                "tag_frequency": {},
-                "recent_tags": [],
-                "trend_data": [],
-                "last_updated": datetime.now(timezone.utc).isoformat()
-            }
+        user = verify_observer_token(token)
         
-        # Update tag frequency
-        tag_freq = profile.get("tag_frequency", {})
-        for tag in new_tags:
-            tag_freq[tag] = tag_freq.get(tag, 0) + 1
-        
-        # Keep recent tags (last 50)
-        recent_tags = profile.get("recent_tags", [])
-        for tag in new_tags:
-            recent_tags.insert(0, {
-                "tag": tag,
-                "date": datetime.now(timezone.utc).isoformat()
-            })
-        recent_tags = recent_tags[:50]
-        
-        # Update profile
-        await db.behavioral_profiles.update_one(
-            {"child_id": child_id},
-            {"$set": {
-                "tag_frequency": tag_freq,
-                "recent_tags": recent_tags,
-                "last_updated": datetime.now(timezone.utc).isoformat()
-            }},
-            upsert=True
-        )
+        session_log = await db.session_logs.find_one({
+            "id": session_id,
+            "observer_id": user['id']
+        }, {"_id": 0, "ai_processed": 1, "ai_status": 1, "ai_error": 1, "ai_processed_at": 1, "ai_analysis": 1})
+        
+        if not session_log:
+            raise HTTPException(status_code=404, detail="Session log not found")
+        
+        job = await job_queue.get_job(SESSION_ANALYSIS_JOB, session_id)
+        
+        return {
+            "session_id": session_id,
+            "ai_processed": session_log.get("ai_processed", False),
+            "ai_status": session_log.get("ai_status") or ("done" if session_log.get("ai_processed") else "pending"),
+            "ai_error": session_log.get("ai_error"),
+            "ai_processed_at": session_log.get("ai_processed_at"),
+            "analysis": session_log.get("ai_analysis"),
+            "job": {
+                "status": job["status"],
+                "attempts": job["attempts"],
+                "next_attempt_at": job["run_after"] if job["status"] == "queued" else None,
+                "last_error": job.get("last_error")
+            } if job else None
+        }
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error updating behavioral profile: {str(e)}")
+        logger.error(f"Error getting analysis status: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to load analysis status")
 
 # ==================== TREND ANALYSIS ====================
 
@@ -289,16 +489,19 @@ async def get_behavioral_trends(child_id: str, token: str, days: int = 30):
         if not child:
             raise HTTPException(status_code=404, detail="Child not found or access denied")
         
-        cutoff_date = (datetime.now(timezone.utc) - timedelta(days=days)).isoformat()
+        cutoff_day, _ = day_range((datetime.now(timezone.utc) - timedelta(days=days)).date())
         
         # Get session logs for period
         session_logs = await db.session_logs.find(
-            {"child_id": child_id, "session_date": {"$gte": cutoff_date[:10]}},
+            {"child_id": child_id, "session_date": {"$gte": cutoff_day}},
             {"_id": 0}
         ).sort("session_date", 1).to_list(100)
         
-        # Get behavioral profile
-        profile = await db.behavioral_profiles.find_one({"child_id": child_id}, {"_id": 0})
+        # Get behavioral profile and the per-day tag histogram
+        profile, daily_tags = await asyncio.gather(
+            db.behavioral_profiles.find_one({"child_id": child_id}, {"_id": 0}),
+            behavioral_profiles.get_tag_histogram(child_id, days)
+        )
         
         # Analyze trends
         mood_trend = []
@@ -307,7 +510,7 @@ async def get_behavioral_trends(child_id: str, token: str, days: int = 30):
         all_tags = []
         
         for log in session_logs:
-            date = log.get('session_date', '')
+            date = day_key(log.get('session_date'))
             mood_trend.append({"date": date, "value": log.get('mood_observed', 'neutral')})
             energy_trend.append({"date": date, "value": log.get('energy_level', 'medium')})
             engagement_trend.append({"date": date, "value": log.get('engagement_level', 'moderate')})
@@ -338,6 +541,7 @@ async def get_behavioral_trends(child_id: str, token: str, days: int = 30):
             },
             "mood_distribution": mood_distribution,
             "top_behavioral_tags": [{"tag": t[0], "count": t[1]} for t in top_tags],
+            "daily_tags": daily_tags,
             "behavioral_profile": profile
         }
     except HTTPException:
@@ -346,24 +550,46 @@ async def get_behavioral_trends(child_id: str, token: str, days: int = 30):
         logger.error(f"Error fetching trends: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to fetch trends")
 
+@router.get("/observer/trends")
+async def get_cohort_trends(token: str, child_ids: Optional[str] = None, days: int = 30, window: int = 7):
+    """Mood, energy, engagement and tag trends for several children in one call
+    (comma-separated child_ids; default: all of the observer's children)"""
+    try:
+        user = verify_observer_token(token)
+
+        children = await db.children.find(
+            {"observer_id": user['id']},
+            {"_id": 0, "id": 1, "name": 1}
+        ).to_list(None)
+        names = {c['id']: c.get('name') for c in children}
+
+        if child_ids:
+            requested = [cid.strip() for cid in child_ids.split(",") if cid.strip()]
+            denied = [cid for cid in requested if cid not in names]
+            if denied:
+                raise HTTPException(status_code=404, detail=f"Child not found or access denied: {', '.join(denied)}")
+        else:
+            requested = list(names)
+
+        result = await trends.get_trends(requested, days, window)
+        for child_id, child_trends in result["children"].items():
+            child_trends["child_name"] = names.get(child_id)
+
+        return result
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching cohort trends: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to fetch trends")
+
 # ==================== PARENT REPORT GENERATION ====================
 
-@router.post("/observer/generate-parent-report/{child_id}")
-async def generate_parent_report(
-    child_id: str, 
-    token: str, 
-    report_type: str = "weekly",  # daily, weekly, fortnightly, monthly, custom
-    days: int = 7
-):
-    """Generate AI report for parents based on session logs
+PARENT_REPORT_SYSTEM_MESSAGE = "You are a caring child development specialist writing reports for parents. Be warm, supportive, and use simple language. Focus on strengths while gently addressing growth areas."
+
+async def _prepare_parent_report(child: dict, report_type: str, days: int) -> dict:
+    """Collect session logs, moods and goals for a parent report and build the prompt"""
+    child_id = child['id']
     
-    Report Types:
-    - daily: Last 1 day
-    - weekly: Last 7 days
-    - fortnightly: Last 14 days
-    - monthly: Last 30 days
-    - custom: Specify days parameter
-    """
     # Map report types to days
     report_days_map = {
         "daily": 1,
@@ -385,70 +611,75 @@ async def generate_parent_report(
     }
     report_label = report_type_labels.get(report_type, f"{actual_days}-Day Report")
     
-    try:
-        user = verify_observer_token(token)
-        observer_id = user['id']
-        
-        child = await db.children.find_one({
-            "id": child_id,
-            "observer_id": observer_id
-        }, {"_id": 0})
-        
-        if not child:
-            raise HTTPException(status_code=404, detail="Child not found or access denied")
-        
-        cutoff_date = (datetime.now(timezone.utc) - timedelta(days=actual_days)).isoformat()
-        
-        # Gather all data
-        session_logs = await db.session_logs.find(
-            {"child_id": child_id, "session_date": {"$gte": cutoff_date[:10]}},
-            {"_id": 0}
-        ).sort("session_date", -1).to_list(100)
-        
-        mood_entries = await db.mood_entries.find(
-            {"child_id": child_id, "created_at": {"$gte": cutoff_date}},
-            {"_id": 0}
-        ).to_list(100)
-        
-        goals = await db.goals.find(
-            {"child_id": child_id},
-            {"_id": 0}
-        ).to_list(50)
-        
-        profile = await db.behavioral_profiles.find_one({"child_id": child_id}, {"_id": 0})
-        
-        # Compile behavioral tags
-        all_tags = []
-        session_summaries = []
-        for log in session_logs:
-            all_tags.extend(log.get('behavioral_tags', []))
-            session_summaries.append(f"- {log['session_date']}: {log.get('mood_observed', 'neutral')} mood, {log.get('engagement_level', 'moderate')} engagement. Notes: {log.get('session_notes', '')[:150]}")
-        
-        tag_freq = {}
-        for tag in all_tags:
-            tag_freq[tag] = tag_freq.get(tag, 0) + 1
-        top_tags = sorted(tag_freq.items(), key=lambda x: x[1], reverse=True)[:8]
-        
-        # Mood analysis
-        mood_counts = {}
-        for log in session_logs:
-            m = log.get('mood_observed', 'neutral')
-            mood_counts[m] = mood_counts.get(m, 0) + 1
-        
-        # Goals summary
-        active_goals = [g for g in goals if g.get('status') == 'active']
-        completed_goals = [g for g in goals if g.get('status') == 'completed']
-        
-        # Create context-aware prompt based on report type
-        report_context = {
-            "daily": "Focus on today's session highlights and immediate observations. Keep it brief and actionable.",
-            "weekly": "Summarize the week's patterns and provide a balanced view of progress and areas for attention.",
-            "fortnightly": "Analyze two weeks of observations to identify emerging trends and consistent patterns.",
-            "monthly": "Provide comprehensive analysis of the month's journey with detailed trend insights.",
-            "custom": f"Analyze the past {actual_days} days of observations."
-        }
-        
-        prompt = f"""Generate a {report_label} for {child['name']}.
+    cutoff = datetime.now(timezone.utc) - timedelta(days=actual_days)
+    cutoff_day, _ = day_range(cutoff.date())
+    
+    # Gather all data
+    session_logs = await db.session_logs.find(
+        {"child_id": child_id, "session_date": {"$gte": cutoff_day}},
+        {"_id": 0}
+    ).sort("session_date", -1).to_list(100)
+    
+    mood_entries = await db.mood_entries.find(
+        {"child_id": child_id, "created_at": {"$gte": cutoff}},
+        {"_id": 0}
+    ).to_list(100)
+    
+    goals = await db.goals.find(
+        {"child_id": child_id},
+        {"_id": 0}
+    ).to_list(50)
+    
+    profile = await db.behavioral_profiles.find_one({"child_id": child_id}, {"_id": 0})
+    
+    # Compile behavioral tags
+    all_tags = []
+    session_summaries = []
+    for log in session_logs:
+        all_tags.extend(log.get('behavioral_tags', []))
+        session_summaries.append(f"{format_date(log['session_date'])}: {log.get('mood_observed', 'neutral')} mood, {log.get('engagement_level', 'moderate')} engagement. Notes: {log.get('session_notes', '')}")
+    
+    tag_freq = {}
+    for tag in all_tags:
+        tag_freq[tag] = tag_freq.get(tag, 0) + 1
+    top_tags = sorted(tag_freq.items(), key=lambda x: x[1], reverse=True)[:8]
+    
+    # Mood analysis
+    mood_counts = {}
+    for log in session_logs:
+        m = log.get('mood_observed', 'neutral')
+        mood_counts[m] = mood_counts.get(m, 0) + 1
+    
+    # Goals summary
+    active_goals = [g for g in goals if g.get('status') == 'active']
+    completed_goals = [g for g in goals if g.get('status') == 'completed']
+    
+    # Pack session free text into the context budget, most recent first
+    context, context_stats = prompt_context.build_context([
+        prompt_context.section(
+            "session_highlights", session_summaries, priority=1, item_tokens=80,
+            empty="- No sessions recorded in this period"
+        ),
+        prompt_context.section(
+            "concerns", [log.get('concerns_noted') for log in session_logs], priority=2, item_tokens=60,
+            empty="- No concerns noted"
+        ),
+        prompt_context.section(
+            "positive_observations", [log.get('positive_observations') for log in session_logs], priority=3, item_tokens=60,
+            empty="- No specific positive observations recorded"
+        ),
+    ], prompt_context.REPORT_CONTEXT_TOKENS)
+    
+    # Create context-aware prompt based on report type
+    report_context = {
+        "daily": "Focus on today's session highlights and immediate observations. Keep it brief and actionable.",
+        "weekly": "Summarize the week's patterns and provide a balanced view of progress and areas for attention.",
+        "fortnightly": "Analyze two weeks of observations to identify emerging trends and consistent patterns.",
+        "monthly": "Provide comprehensive analysis of the month's journey with detailed trend insights.",
+        "custom": f"Analyze the past {actual_days} days of observations."
+    }
+    
+    prompt = f"""Generate a {report_label} for {child['name']}.
 
 **REPORT TYPE:** {report_label}
 **CONTEXT:** {report_context.get(report_type, report_context['custom'])}
@@ -469,7 +700,7 @@ async def generate_parent_report(
 {chr(10).join([f"- {tag}: observed {count} times" for tag, count in top_tags]) if top_tags else '- No patterns identified yet'}
 
 **SESSION HIGHLIGHTS:**
-{chr(10).join(session_summaries[:8]) if session_summaries else '- No sessions recorded in this period'}
+{context['session_highlights']}
 
 **GOALS STATUS:**
 - Active Goals: {len(active_goals)}
@@ -477,10 +708,10 @@ async def generate_parent_report(
 - Active Goal Details: {', '.join([f"{g['title']} ({g['progress']}%)" for g in active_goals[:5]]) if active_goals else 'None'}
 
 **POSITIVE OBSERVATIONS:**
-{chr(10).join([f"- {log.get('positive_observations', '')[:100]}" for log in session_logs[:5] if log.get('positive_observations')]) or '- No specific positive observations recorded'}
+{context['positive_observations']}
 
 **CONCERNS NOTED:**
-{chr(10).join([f"- {log.get('concerns_noted', '')[:100]}" for log in session_logs[:5] if log.get('concerns_noted')]) or '- No concerns noted'}
+{context['concerns']}
 
 {"Generate a brief daily update report with:" if report_type == "daily" else "Generate a comprehensive parent report with:"}
 
@@ -501,46 +732,109 @@ async def generate_parent_report(
 8. **Looking Ahead** (Brief note on focus for next period)'''}
 
 Write in a warm, supportive tone. {"Keep it concise for a daily update." if report_type == "daily" else "Be specific with examples where possible."} Make parents feel like partners in their child's journey."""
+    
+    return {
+        "prompt": prompt,
+        "system": PARENT_REPORT_SYSTEM_MESSAGE,
+        "report_type": report_type,
+        "report_label": report_label,
+        "days": actual_days,
+        "sessions_analyzed": len(session_logs),
+        "top_tags": [{"tag": t[0], "count": t[1]} for t in top_tags],
+        "mood_distribution": mood_counts,
+        "prompt_context": context_stats
+    }
 
-        chat = LlmChat(
-            api_key=EMERGENT_API_KEY,
-            session_id=str(uuid.uuid4()),
-            system_message="You are a caring child development specialist writing reports for parents. Be warm, supportive, and use simple language. Focus on strengths while gently addressing growth areas."
-        ).with_model("openai", "gpt-4o-mini")
-        
-        report_content = await chat.send_message(UserMessage(text=prompt))
+def _parent_report_cache_inputs(child_id: str, observer_id: str, ctx: dict) -> dict:
+    return {
+        "child_id": child_id,
+        "observer_id": observer_id,
+        "report_type": ctx["report_type"],
+        "days": ctx["days"],
+        "model": "gpt-4o-mini",
+        "system": ctx["system"],
+        "prompt": ctx["prompt"]
+    }
+
+async def _save_parent_report(child_id: str, observer_id: str, ctx: dict, report_content: str) -> dict:
+    """Persist a generated parent report; returns the API representation"""
+    report = {
+        "id": f"parent-report-{uuid.uuid4().hex[:12]}",
+        "child_id": child_id,
+        "observer_id": observer_id,
+        "report_type": ctx["report_type"],
+        "report_type_label": ctx["report_label"],
+        "report_content": report_content,
+        "data_period_days": ctx["days"],
+        "sessions_analyzed": ctx["sessions_analyzed"],
+        "behavioral_tags_summary": ctx["top_tags"],
+        "mood_distribution": ctx["mood_distribution"],
+        "prompt_context": ctx["prompt_context"],
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "shared_with_parents": False
+    }
+    
+    await db.parent_reports.insert_one(report)
+    
+    return {
+        "id": report["id"],
+        "report_type": ctx["report_type"],
+        "report_type_label": ctx["report_label"],
+        "content": report_content,
+        "generated_at": report["generated_at"],
+        "data_period_days": ctx["days"],
+        "sessions_analyzed": ctx["sessions_analyzed"],
+        "top_tags": ctx["top_tags"],
+        "mood_distribution": ctx["mood_distribution"]
+    }
+
+async def _get_report_child(child_id: str, token: str):
+    user = verify_observer_token(token)
+    
+    child = await db.children.find_one({
+        "id": child_id,
+        "observer_id": user['id']
+    }, {"_id": 0})
+    
+    if not child:
+        raise HTTPException(status_code=404, detail="Child not found or access denied")
+    return user['id'], child
+
+@router.post("/observer/generate-parent-report/{child_id}")
+async def generate_parent_report(
+    child_id: str, 
+    token: str, 
+    report_type: str = "weekly",  # daily, weekly, fortnightly, monthly, custom
+    days: int = 7,
+    force: bool = False
+):
+    """Generate AI report for parents based on session logs.
+    Unchanged inputs return the cached report unless `force` is set.
+    
+    Report Types:
+    - daily: Last 1 day
+    - weekly: Last 7 days
+    - fortnightly: Last 14 days
+    - monthly: Last 30 days
+    - custom: Specify days parameter
+    """
+    try:
+        observer_id, child = await _get_report_child(child_id, token)
+        ctx = await _prepare_parent_report(child, report_type, days)
         
-        # Save report
-        report = {
-            "id": f"parent-report-{uuid.uuid4().hex[:12]}",
-            "child_id": child_id,
-            "observer_id": observer_id,
-            "report_type": report_type,
-            "report_type_label": report_label,
-            "report_content": report_content,
-            "data_period_days": actual_days,
-            "sessions_analyzed": len(session_logs),
-            "behavioral_tags_summary": [{"tag": t[0], "count": t[1]} for t in top_tags],
-            "mood_distribution": mood_counts,
-            "generated_at": datetime.now(timezone.utc).isoformat(),
-            "shared_with_parents": False
-        }
+        async def generate():
+            report_content = await llm_gateway.send_message(
+                EMERGENT_API_KEY, ctx["system"], ctx["prompt"], llm_gateway.OBSERVER
+            )
+            return await _save_parent_report(child_id, observer_id, ctx, report_content)
         
-        await db.parent_reports.insert_one(report)
+        inputs = _parent_report_cache_inputs(child_id, observer_id, ctx)
+        result, cached = await report_cache.get_or_generate("parent_report", inputs, generate, force)
         
         return {
             "success": True,
-            "report": {
-                "id": report["id"],
-                "report_type": report_type,
-                "report_type_label": report_label,
-                "content": report_content,
-                "generated_at": report["generated_at"],
-                "data_period_days": actual_days,
-                "sessions_analyzed": len(session_logs),
-                "top_tags": [{"tag": t[0], "count": t[1]} for t in top_tags],
-                "mood_distribution": mood_counts
-            }
+            "report": result,
+            "cached": cached
         }
     except HTTPException:
         raise
@@ -548,6 +842,44 @@ Write in a warm, supportive tone. {"Keep it concise for a daily update." if repo
         logger.error(f"Error generating parent report: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to generate report")
 
+@router.post("/observer/generate-parent-report/{child_id}/stream")
+async def stream_parent_report(
+    child_id: str,
+    token: str,
+    report_type: str = "weekly",
+    days: int = 7,
+    force: bool = False
+):
+    """Streaming variant of generate-parent-report (text/event-stream).
+    Emits `token` events as the report is written and `done` with the saved report."""
+    try:
+        observer_id, child = await _get_report_child(child_id, token)
+        ctx = await _prepare_parent_report(child, report_type, days)
+        inputs = _parent_report_cache_inputs(child_id, observer_id, ctx)
+        
+        cached = None if force else await report_cache.lookup("parent_report", inputs)
+        if cached:
+            async def replay():
+                yield cached["content"]
+            async def finish_cached(_):
+                return {"report": cached, "cached": True}
+            return llm_stream.sse_response(llm_stream.stream_events(replay(), finish_cached))
+        
+        async def finish(report_content: str):
+            result = await _save_parent_report(child_id, observer_id, ctx, report_content)
+            await report_cache.store("parent_report", inputs, result, force)
+            return {"report": result, "cached": False}
+        
+        tokens = llm_stream.stream_completion(
+            EMERGENT_API_KEY, ctx["system"], [{"role": "user", "content": ctx["prompt"]}], llm_gateway.OBSERVER
+        )
+        return llm_stream.sse_response(llm_stream.stream_events(tokens, finish))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error streaming parent report: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to generate report")
+
 @router.get("/observer/parent-reports/{child_id}")
 async def get_parent_reports(child_id: str, token: str):
     """Get all parent reports for a child"""
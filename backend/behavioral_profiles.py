@@ -0,0 +1,176 @@
+"""
+Behavioral Profiles - Per-child aggregate of AI behavioral tags
+- record_tags() folds one analysed session into db.behavioral_profiles with a single
+  atomic update: $inc on tag_frequency.<tag> and a capped $push onto recent_tags,
+  so concurrent analyses of the same child never lose increments
+- Optional per-day tag histogram in db.behavioral_tag_days (one row per child and
+  session day) for trend queries without scanning session_logs
+- rebuild_child() recomputes a profile and its histogram from session_logs (repair);
+  available as a background job and as `python behavioral_profiles.py [--child ID]`
+"""
+from motor.motor_asyncio import AsyncIOMotorClient
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+from date_ranges import day_key, parse_datetime
+from rollups import window_start
+import argparse
+import asyncio
+import job_queue
+import logging
+import os
+
+db = None
+logger = logging.getLogger(__name__)
+
+COLLECTION = "behavioral_profiles"
+HISTOGRAM_COLLECTION = "behavioral_tag_days"
+RECENT_TAGS_LIMIT = 50
+TAG_HISTOGRAM = os.environ.get('BEHAVIOR_TAG_HISTOGRAM', 'true').lower() == 'true'
+REBUILD_JOB = "behavioral_profile_rebuild"
+
+def set_database(database):
+    """Set the database instance from main server"""
+    global db
+    db = database
+
+def _tag_key(tag) -> str:
+    """Tags become sub-document keys - keep them valid field names"""
+    return str(tag).strip().replace(".", "_").replace("$", "_") or "unknown"
+
+def _recent_entries(tags: List[str], date: str) -> List[dict]:
+    # Newest first; within one session the last tag ends up on top, as before
+    return [{"tag": tag, "date": date} for tag in reversed(tags)]
+
+async def record_tags(child_id: str, tags: List[str], session_date=None):
+    """Fold one session's tags into the child's profile (and its day in the histogram)"""
+    tags = [tag for tag in tags if tag]
+    if not tags:
+        return
+    now = datetime.now(timezone.utc)
+    inc: Dict[str, int] = {}
+    for tag in tags:
+        inc[f"tag_frequency.{_tag_key(tag)}"] = inc.get(f"tag_frequency.{_tag_key(tag)}", 0) + 1
+    try:
+        writes = [db[COLLECTION].update_one(
+            {"child_id": child_id},
+            {
+                "$inc": inc,
+                "$push": {"recent_tags": {
+                    "$each": _recent_entries(tags, now.isoformat()),
+                    "$position": 0,
+                    "$slice": RECENT_TAGS_LIMIT
+                }},
+                "$set": {"last_updated": now.isoformat()},
+                "$setOnInsert": {"trend_data": []}
+            },
+            upsert=True
+        )]
+        day = day_key(session_date or now)
+        if TAG_HISTOGRAM and day:
+            day_inc = {"sessions": 1}
+            for key, count in inc.items():
+                day_inc[key.replace("tag_frequency.", "tags.", 1)] = count
+            writes.append(db[HISTOGRAM_COLLECTION].update_one(
+                {"child_id": child_id, "day": day},
+                {"$inc": day_inc},
+                upsert=True
+            ))
+        await asyncio.gather(*writes)
+    except Exception as e:
+        logger.error(f"Error updating behavioral profile: {str(e)}")
+
+async def get_tag_histogram(child_id: str, days: int = 30) -> List[dict]:
+    """Per-day tag counts for the last `days` days, oldest first"""
+    rows = await db[HISTOGRAM_COLLECTION].find(
+        {"child_id": child_id, "day": {"$gte": window_start(days)}},
+        {"_id": 0, "day": 1, "sessions": 1, "tags": 1}
+    ).sort("day", 1).to_list(days + 1)
+    return [{"date": row["day"], "sessions": row.get("sessions", 0), "tags": row.get("tags", {})} for row in rows]
+
+# ==================== REBUILD ====================
+
+async def rebuild_child(child_id: str) -> dict:
+    """Recompute a child's tag frequencies, recent tags and histogram from session_logs.
+    Analyses finishing while this runs may be overwritten - re-run to repair."""
+    logs = await db.session_logs.find(
+        {"child_id": child_id, "behavioral_tags.0": {"$exists": True}},
+        {"_id": 0, "behavioral_tags": 1, "session_date": 1, "ai_processed_at": 1}
+    ).to_list(None)
+    # Stored dates mix datetimes and ISO strings; compare them as datetimes
+    oldest = datetime.min.replace(tzinfo=timezone.utc)
+    logs.sort(
+        key=lambda log: parse_datetime(log.get("ai_processed_at")) or parse_datetime(log.get("session_date")) or oldest,
+        reverse=True
+    )
+
+    tag_frequency: Dict[str, int] = {}
+    recent_tags: List[dict] = []
+    histogram: Dict[str, dict] = {}
+    for log in logs:
+        tags = [tag for tag in log["behavioral_tags"] if tag]
+        for tag in tags:
+            tag_frequency[_tag_key(tag)] = tag_frequency.get(_tag_key(tag), 0) + 1
+        if len(recent_tags) < RECENT_TAGS_LIMIT:
+            date = log.get("ai_processed_at") or log.get("session_date")
+            recent_tags.extend(_recent_entries(tags, date.isoformat() if isinstance(date, datetime) else date))
+        day = day_key(log.get("session_date"))
+        if TAG_HISTOGRAM and day:
+            row = histogram.setdefault(day, {"child_id": child_id, "day": day, "sessions": 0, "tags": {}})
+            row["sessions"] += 1
+            for tag in tags:
+                row["tags"][_tag_key(tag)] = row["tags"].get(_tag_key(tag), 0) + 1
+
+    await db[COLLECTION].update_one(
+        {"child_id": child_id},
+        {
+            "$set": {
+                "tag_frequency": tag_frequency,
+                "recent_tags": recent_tags[:RECENT_TAGS_LIMIT],
+                "last_updated": datetime.now(timezone.utc).isoformat()
+            },
+            "$setOnInsert": {"trend_data": []}
+        },
+        # Don't create profiles for children without analysed sessions
+        upsert=bool(logs)
+    )
+    if TAG_HISTOGRAM:
+        await db[HISTOGRAM_COLLECTION].delete_many({"child_id": child_id})
+        if histogram:
+            await db[HISTOGRAM_COLLECTION].insert_many(list(histogram.values()))
+    return {"child_id": child_id, "sessions": len(logs), "tags": len(tag_frequency), "days": len(histogram)}
+
+async def _child_ids(child_id: Optional[str] = None) -> List[str]:
+    if child_id:
+        return [child_id]
+    return [c for c in await db.session_logs.distinct("child_id") if c]
+
+async def enqueue_rebuild(child_id: Optional[str] = None) -> int:
+    """Queue rebuild jobs for one child, or for every child with session logs"""
+    child_ids = await _child_ids(child_id)
+    for cid in child_ids:
+        await job_queue.enqueue(REBUILD_JOB, cid, requeue=True)
+    return len(child_ids)
+
+async def _rebuild_job(child_id: str):
+    await rebuild_child(child_id)
+
+job_queue.register(REBUILD_JOB, _rebuild_job)
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--child", default=None, help="only rebuild this child's profile")
+    args = parser.parse_args()
+
+    load_dotenv()
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], tz_aware=True)
+    set_database(client[os.environ['DB_NAME']])
+
+    for child_id in await _child_ids(args.child):
+        result = await rebuild_child(child_id)
+        print(f"✓ {child_id}: {result['sessions']} sessions, {result['tags']} tags, {result['days']} days")
+
+    client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,101 @@
+"""
+Benchmark - session analysis backlog throughput on the offline stub LLM backend
+
+Seeds a throwaway database (<DB_NAME>_bench) with N unanalysed session logs and
+drains them through the job queue for each batch size, with LLM_BACKEND=stub so no
+live API is called. Stub latency/failures follow the LLM_STUB_* settings.
+
+    python benchmark_ai_pipeline.py [--sessions 200] [--workers 2] 1 4 8 16
+"""
+import os
+
+# Must be set before the AI modules read their configuration
+os.environ["LLM_BACKEND"] = "stub"
+os.environ.setdefault("LLM_REQUESTS_PER_MINUTE", "100000")
+os.environ.setdefault("LLM_TOKENS_PER_MINUTE", "100000000")
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from datetime import datetime, timedelta, timezone
+from dotenv import load_dotenv
+import argparse
+import asyncio
+import time
+
+import ai_session_routes
+import job_queue
+import llm_backends
+import loaders
+import status_counts
+
+async def seed(db, session_count):
+    await db.client.drop_database(db.name)
+    now = datetime.now(timezone.utc)
+    children = [{"id": f"child-{c}", "name": f"Child {c}", "age": 8, "grade": "Grade 3"} for c in range(20)]
+    sessions = [{
+        "id": f"sess-{s}",
+        "child_id": f"child-{s % 20}",
+        "observer_id": "obs-bench",
+        "session_date": (now - timedelta(days=s % 30)).date().isoformat(),
+        "duration_minutes": 5,
+        "mood_observed": "happy",
+        "energy_level": "moderate",
+        "engagement_level": "high",
+        "session_notes": "Talked about school and friends. " * 10,
+        "topics_discussed": "school, friends",
+        "positive_observations": "Shared openly",
+        "concerns_noted": "",
+        "ai_processed": False,
+        "created_at": now
+    } for s in range(session_count)]
+    await db.children.insert_many(children)
+    await db.session_logs.insert_many(sessions)
+    await db.ai_jobs.create_index([("type", 1), ("ref_id", 1)], unique=True)
+
+async def drain(db, session_count, batch_size, workers):
+    job_queue.register(
+        ai_session_routes.SESSION_ANALYSIS_JOB,
+        ai_session_routes.process_session_analysis_job,
+        on_failed=ai_session_routes.mark_session_analysis_failed,
+        batch_handler=ai_session_routes.process_session_analysis_batch,
+        batch_size=batch_size
+    )
+    backend = llm_backends.get_backend()
+    calls_before = backend.calls
+    await ai_session_routes.sweep_unanalyzed_sessions()
+    start = time.perf_counter()
+    job_queue.start(workers)
+    while True:
+        counts = await job_queue.stats(ai_session_routes.SESSION_ANALYSIS_JOB)
+        if counts.get("done", 0) + counts.get("failed", 0) >= session_count:
+            break
+        await asyncio.sleep(0.2)
+    elapsed = time.perf_counter() - start
+    await job_queue.stop()
+    return elapsed, backend.calls - calls_before, counts.get("failed", 0)
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("batch_sizes", nargs="*", type=int, default=[1, 4, 8, 16])
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=job_queue.WORKERS)
+    args = parser.parse_args()
+
+    load_dotenv()
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], tz_aware=True)
+    db = client[f"{os.environ['DB_NAME']}_bench"]
+    for module in (ai_session_routes, job_queue, loaders, status_counts):
+        module.set_database(db)
+    job_queue.POLL_SECONDS = 0.1
+    job_queue.BACKOFF_SECONDS = 0.5
+
+    print(f"{'batch':>6} {'seconds':>9} {'sessions/s':>11} {'llm calls':>10} {'failed':>7}")
+    for batch_size in args.batch_sizes:
+        await seed(db, args.sessions)
+        elapsed, calls, failed = await drain(db, args.sessions, batch_size, args.workers)
+        print(f"{batch_size:>6} {elapsed:>9.1f} {args.sessions / elapsed:>11.1f} {calls:>10} {failed:>7}")
+
+    await client.drop_database(db.name)
+    client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
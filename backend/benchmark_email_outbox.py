@@ -0,0 +1,78 @@
+"""
+Benchmark - email outbox throughput on the offline file-sink backend
+
+Seeds a throwaway database (<DB_NAME>_bench) with N queued emails and drains them
+through the outbox dispatchers for each batch size, with EMAIL_BACKEND=file so
+nothing is delivered. Sink latency/failures follow the EMAIL_SINK_* settings and
+provider calls are rate limited with --rate (requests per second, 0 = unlimited).
+
+    python benchmark_email_outbox.py [--emails 1000] [--workers 2] [--rate 0] 1 10 50 100
+"""
+import os
+
+# Must be set before the email modules read their configuration
+os.environ["EMAIL_BACKEND"] = "file"
+os.environ.setdefault("EMAIL_SINK_PATH", os.devnull)
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from dotenv import load_dotenv
+import argparse
+import asyncio
+import time
+
+import email_backends
+import email_outbox
+import status_counts
+
+async def seed(db, email_count):
+    await db.client.drop_database(db.name)
+    await db.email_outbox.create_index([("status", 1), ("run_after", 1)])
+    await asyncio.gather(*[
+        email_outbox.enqueue(f"parent-{i}@example.com", f"Benchmark email {i}", "<p>Hello from the benchmark</p>" * 20)
+        for i in range(email_count)
+    ])
+
+async def drain(email_count, batch_size, workers, rate):
+    backend = email_backends.get_backend()
+    backend.batch_size = batch_size
+    backend.rate_per_second = rate
+    email_outbox._limiters.clear()
+    calls_before = backend.calls
+    start = time.perf_counter()
+    email_outbox.start(workers)
+    while True:
+        counts = await email_outbox.stats()
+        if counts.get("sent", 0) + counts.get("dead", 0) >= email_count:
+            break
+        await asyncio.sleep(0.1)
+    elapsed = time.perf_counter() - start
+    await email_outbox.stop()
+    return elapsed, backend.calls - calls_before, counts.get("dead", 0)
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("batch_sizes", nargs="*", type=int, default=[1, 10, 50, 100])
+    parser.add_argument("--emails", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=email_outbox.WORKERS)
+    parser.add_argument("--rate", type=float, default=0, help="provider requests per second (0 = unlimited)")
+    args = parser.parse_args()
+
+    load_dotenv()
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], tz_aware=True)
+    db = client[f"{os.environ['DB_NAME']}_bench"]
+    for module in (email_outbox, status_counts):
+        module.set_database(db)
+    email_outbox.POLL_SECONDS = 0.1
+    email_outbox.BACKOFF_SECONDS = 0.2
+
+    print(f"{'batch':>6} {'seconds':>9} {'emails/s':>9} {'calls':>7} {'dead':>5}")
+    for batch_size in args.batch_sizes:
+        await seed(db, args.emails)
+        elapsed, calls, dead = await drain(args.emails, batch_size, args.workers, args.rate)
+        print(f"{batch_size:>6} {elapsed:>9.2f} {args.emails / elapsed:>9.1f} {calls:>7} {dead:>5}")
+
+    await client.drop_database(db.name)
+    client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
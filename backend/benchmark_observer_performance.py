@@ -0,0 +1,104 @@
+"""
+Benchmark - /principal/observer-performance: per-observer loop vs grouped aggregation
+
+Seeds a throwaway database (<DB_NAME>_bench) with a school of N observers and
+times the legacy 3xN round-trip loop against aggregate_observer_metrics().
+
+    python benchmark_observer_performance.py [--sessions 40] [--runs 5] 5 10 25 50 100
+"""
+from motor.motor_asyncio import AsyncIOMotorClient
+from datetime import datetime, timedelta, timezone
+from dotenv import load_dotenv
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+
+import principal_routes
+
+async def seed(db, observer_count, sessions_per_observer):
+    await db.client.drop_database(db.name)
+    now = datetime.now(timezone.utc)
+    children, sessions, red_flags, incidents = [], [], [], []
+    for o in range(observer_count):
+        obs_id = f"obs-{o}"
+        for c in range(4):
+            children.append({"id": f"child-{o}-{c}", "school": "Bench School", "observer_id": obs_id, "status": "active"})
+        for s in range(sessions_per_observer):
+            sessions.append({
+                "id": f"sess-{o}-{s}",
+                "observer_id": obs_id,
+                "child_id": f"child-{o}-{s % 4}",
+                "rating": random.choice([0, 3, 4, 5]),
+                "session_notes": "x" * 500,
+                "created_at": now - timedelta(days=random.randint(0, 60))
+            })
+        red_flags += [{"id": f"rf-{o}-{i}", "observer_id": obs_id} for i in range(random.randint(0, 3))]
+        incidents += [{"id": f"inc-{o}-{i}", "created_by": obs_id} for i in range(random.randint(0, 2))]
+    await db.children.insert_many(children)
+    await db.session_logs.insert_many(sessions)
+    if red_flags:
+        await db.red_flags.insert_many(red_flags)
+    if incidents:
+        await db.incidents.insert_many(incidents)
+    await db.session_logs.create_index([("observer_id", 1), ("created_at", -1)])
+    await db.red_flags.create_index("observer_id")
+    await db.incidents.create_index("created_by")
+    return [f"obs-{o}" for o in range(observer_count)], [c["id"] for c in children]
+
+async def legacy(db, observer_ids, child_ids, since):
+    """The original implementation: three round-trips and full session documents per observer"""
+    metrics = {}
+    for obs_id in observer_ids:
+        sessions = await db.session_logs.find(
+            {"observer_id": obs_id, "child_id": {"$in": child_ids}}, {"_id": 0}
+        ).to_list(1000)
+        recent = [s for s in sessions if s.get("created_at") and s["created_at"] > since]
+        ratings = [s.get("rating", 0) for s in sessions if s.get("rating")]
+        metrics[obs_id] = {
+            "total_sessions": len(sessions),
+            "recent_sessions": len(recent),
+            "average_rating": round(sum(ratings) / len(ratings), 1) if ratings else 0,
+            "red_flags": await db.red_flags.count_documents({"observer_id": obs_id}),
+            "escalations": await db.incidents.count_documents({"created_by": obs_id})
+        }
+    return metrics
+
+async def timed(fn, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = await fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), result
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("observers", nargs="*", type=int, default=[5, 10, 25, 50, 100])
+    parser.add_argument("--sessions", type=int, default=40, help="sessions per observer")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    load_dotenv()
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], tz_aware=True)
+    db = client[f"{os.environ['DB_NAME']}_bench"]
+    principal_routes.set_database(db)
+    since = datetime.now(timezone.utc) - timedelta(days=30)
+
+    print(f"{'observers':>10} {'legacy ms':>12} {'aggregate ms':>14} {'speedup':>9}")
+    for count in args.observers:
+        observer_ids, child_ids = await seed(db, count, args.sessions)
+        legacy_ms, expected = await timed(lambda: legacy(db, observer_ids, child_ids, since), args.runs)
+        agg_ms, actual = await timed(
+            lambda: principal_routes.aggregate_observer_metrics(observer_ids, child_ids, since), args.runs
+        )
+        assert expected == actual, "aggregation diverges from the legacy metrics"
+        print(f"{count:>10} {legacy_ms:>12.1f} {agg_ms:>14.1f} {legacy_ms / agg_ms:>8.1f}x")
+
+    await client.drop_database(db.name)
+    client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
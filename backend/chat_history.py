@@ -0,0 +1,59 @@
+"""
+Chat History - Append-only, capped storage for public chat sessions
+- One atomic $push/$each/$slice per turn: no read-modify-write, constant I/O per
+  turn and no lost messages when turns on one session race
+- Only the last CHAT_HISTORY_LIMIT messages are kept per session; the last
+  CHAT_CONTEXT_MESSAGES of them are sent back to the model with each new turn
+- Sessions idle for CHAT_SESSION_TTL_DAYS are removed by a TTL index on updated_at
+"""
+from datetime import datetime, timezone
+from typing import List
+import os
+
+db = None
+
+CHAT_HISTORY_LIMIT = int(os.environ.get('CHAT_HISTORY_LIMIT', '50'))
+CHAT_SESSION_TTL_DAYS = int(os.environ.get('CHAT_SESSION_TTL_DAYS', '30'))
+CHAT_CONTEXT_MESSAGES = int(os.environ.get('CHAT_CONTEXT_MESSAGES', '20'))
+
+def set_database(database):
+    """Set the database instance from main server"""
+    global db
+    db = database
+
+async def append_exchange(session_id: str, user_text: str, response: str):
+    """Append a user/assistant exchange to the session (created on first use)"""
+    now = datetime.now(timezone.utc)
+    await db.chat_sessions.update_one(
+        {"session_id": session_id},
+        {
+            "$push": {"messages": {
+                "$each": [
+                    {"role": "user", "content": user_text, "timestamp": now.isoformat()},
+                    {"role": "assistant", "content": response, "timestamp": now.isoformat()}
+                ],
+                "$slice": -CHAT_HISTORY_LIMIT
+            }},
+            "$set": {"updated_at": now},
+            "$setOnInsert": {"session_id": session_id, "created_at": now}
+        },
+        upsert=True
+    )
+
+async def get_history(session_id: str, limit: int = CHAT_CONTEXT_MESSAGES) -> List[dict]:
+    """Last `limit` messages of a session as {"role", "content"} dicts, oldest first"""
+    if limit <= 0:
+        return []
+    session = await db.chat_sessions.find_one(
+        {"session_id": session_id},
+        {"_id": 0, "messages": {"$slice": -limit}}
+    )
+    messages = session.get("messages", []) if session else []
+    return [{"role": m["role"], "content": m["content"]} for m in messages]
+
+def with_history(history: List[dict], message: str) -> str:
+    """Single-prompt form of a new turn for completion APIs that take no message list"""
+    if not history:
+        return message
+    lines = [f"{'User' if m['role'] == 'user' else 'Assistant'}: {m['content']}" for m in history]
+    return "Conversation so far:\n" + "\n".join(lines) + f"\n\nUser: {message}"
@@ -0,0 +1,83 @@
+"""
+Date Ranges - Shared helpers for indexed date-range queries
+- Parse legacy ISO strings / user-supplied dates into BSON datetimes
+- Build [start, end) bounds for "today", "this month", "last N days"
+- Time-zone aware day/month bucketing keys
+"""
+from datetime import datetime, date, time, timedelta, timezone
+from typing import Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+def resolve_timezone(tz: Optional[str] = None):
+    """Resolve an IANA time-zone name (None / "UTC" -> UTC)"""
+    if not tz or tz.upper() == "UTC":
+        return timezone.utc
+    try:
+        return ZoneInfo(tz)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Unknown timezone: {tz}")
+
+def parse_datetime(value) -> Optional[datetime]:
+    """Coerce a stored or user-supplied value into an aware UTC datetime.
+    Accepts datetimes, dates, "YYYY-MM-DD" and ISO-8601 strings; returns None if unparseable."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+    if isinstance(value, date):
+        return datetime.combine(value, time.min, tzinfo=timezone.utc)
+    if isinstance(value, str):
+        try:
+            parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+        except ValueError:
+            return None
+        return parsed.replace(tzinfo=timezone.utc) if parsed.tzinfo is None else parsed.astimezone(timezone.utc)
+    return None
+
+def range_filter(start: datetime, end: datetime) -> dict:
+    """Mongo filter for start <= field < end"""
+    return {"$gte": start, "$lt": end}
+
+def day_range(day: Optional[date] = None, tz: Optional[str] = None) -> Tuple[datetime, datetime]:
+    """UTC bounds of a calendar day in the given time zone (default: today)"""
+    zone = resolve_timezone(tz)
+    if day is None:
+        day = datetime.now(zone).date()
+    start = datetime.combine(day, time.min, tzinfo=zone)
+    end = datetime.combine(day + timedelta(days=1), time.min, tzinfo=zone)
+    return start.astimezone(timezone.utc), end.astimezone(timezone.utc)
+
+def today_range(tz: Optional[str] = None) -> Tuple[datetime, datetime]:
+    return day_range(None, tz)
+
+def month_range(month: Optional[str] = None, tz: Optional[str] = None) -> Tuple[datetime, datetime]:
+    """UTC bounds of a calendar month ("YYYY-MM", default: current month)"""
+    zone = resolve_timezone(tz)
+    if month:
+        year, mon = (int(part) for part in month.split("-")[:2])
+    else:
+        now = datetime.now(zone)
+        year, mon = now.year, now.month
+    start = datetime(year, mon, 1, tzinfo=zone)
+    end = datetime(year + 1, 1, 1, tzinfo=zone) if mon == 12 else datetime(year, mon + 1, 1, tzinfo=zone)
+    return start.astimezone(timezone.utc), end.astimezone(timezone.utc)
+
+def last_days_range(days: int, tz: Optional[str] = None) -> Tuple[datetime, datetime]:
+    """Rolling window covering the last N days up to now"""
+    end = datetime.now(timezone.utc)
+    return end - timedelta(days=days), end
+
+def day_key(value, tz: Optional[str] = None) -> str:
+    """"YYYY-MM-DD" bucket of a stored value in the given time zone"""
+    parsed = parse_datetime(value)
+    return parsed.astimezone(resolve_timezone(tz)).date().isoformat() if parsed else ""
+
+def month_key(value, tz: Optional[str] = None) -> str:
+    """"YYYY-MM" bucket of a stored value in the given time zone"""
+    parsed = parse_datetime(value)
+    return parsed.astimezone(resolve_timezone(tz)).strftime("%Y-%m") if parsed else ""
+
+def format_date(value) -> str:
+    """Human-readable date for prompts and emails"""
+    parsed = parse_datetime(value)
+    return parsed.date().isoformat() if parsed else str(value or "")
@@ -0,0 +1,117 @@
+"""
+Datetime Migration - Convert legacy ISO-string timestamps to native BSON datetimes
+- Streams each collection in _id order and rewrites in bulk_write batches
+- Resumable: the last converted _id per collection is checkpointed in db.migrations
+- Idempotent: only documents whose fields are still strings are touched
+
+Run standalone with `python datetime_migration.py`; the server also runs it in the
+background at startup so freshly seeded string data converges on its own.
+"""
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+from date_ranges import parse_datetime
+import asyncio
+import logging
+import os
+
+db = None
+logger = logging.getLogger(__name__)
+
+MIGRATION_ID = "datetime_fields_v1"
+BATCH_SIZE = 500
+
+# Fields that are range-queried or bucketed by date and must be BSON datetimes
+DATETIME_FIELDS = {
+    "session_logs": ["created_at", "session_date"],
+    "readiness_checks": ["created_at"],
+    "mood_entries": ["created_at"],
+    "consultations": ["created_at", "scheduled_date", "completed_at"],
+    "appointments": ["scheduled_date"],
+    "enrollments": ["created_at"],
+}
+
+def set_database(database):
+    """Set the database instance from main server"""
+    global db
+    db = database
+
+async def _get_checkpoint(collection):
+    doc = await db.migrations.find_one({"id": MIGRATION_ID, "collection": collection})
+    return doc.get("last_id") if doc else None
+
+async def _save_checkpoint(collection, last_id, converted, skipped):
+    await db.migrations.update_one(
+        {"id": MIGRATION_ID, "collection": collection},
+        {
+            "$set": {"last_id": last_id, "updated_at": datetime.now(timezone.utc)},
+            "$inc": {"converted": converted, "skipped": skipped}
+        },
+        upsert=True
+    )
+
+async def migrate_collection(collection, fields, batch_size=BATCH_SIZE):
+    """Convert string values of `fields` in one collection, resuming from the checkpoint"""
+    query = {"$or": [{field: {"$type": "string"}} for field in fields]}
+    last_id = await _get_checkpoint(collection)
+    if last_id is not None:
+        query = {"$and": [query, {"_id": {"$gt": last_id}}]}
+
+    projection = {field: 1 for field in fields}
+    cursor = db[collection].find(query, projection).sort("_id", 1).batch_size(batch_size)
+
+    ops, converted, skipped = [], 0, 0
+    async for doc in cursor:
+        update = {}
+        for field in fields:
+            value = doc.get(field)
+            if isinstance(value, str):
+                parsed = parse_datetime(value)
+                if parsed:
+                    update[field] = parsed
+                else:
+                    skipped += 1
+        if update:
+            ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": update}))
+        last_id = doc["_id"]
+
+        if len(ops) >= batch_size:
+            await db[collection].bulk_write(ops, ordered=False)
+            converted += len(ops)
+            await _save_checkpoint(collection, last_id, len(ops), skipped)
+            ops, skipped = [], 0
+
+    if ops or skipped:
+        if ops:
+            await db[collection].bulk_write(ops, ordered=False)
+            converted += len(ops)
+        await _save_checkpoint(collection, last_id, len(ops), skipped)
+
+    return converted
+
+async def migrate_all(batch_size=BATCH_SIZE):
+    """Run the migration over every registered collection"""
+    results = {}
+    for collection, fields in DATETIME_FIELDS.items():
+        try:
+            results[collection] = await migrate_collection(collection, fields, batch_size)
+        except Exception as e:
+            logger.error(f"Datetime migration failed for {collection}: {str(e)}")
+            results[collection] = None
+    logger.info(f"Datetime migration converted: {results}")
+    return results
+
+async def main():
+    load_dotenv()
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], tz_aware=True)
+    set_database(client[os.environ['DB_NAME']])
+
+    results = await migrate_all()
+    for collection, converted in results.items():
+        print(f"✓ {collection}: {converted if converted is not None else 'failed'} documents converted")
+
+    client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,342 @@
+"""
+Database Indexes - Declarative index registry for every Mongo collection
+- Indexes each router relies on, applied at startup
+- Explain-based verification of the canonical query of each route
+"""
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from pymongo.errors import OperationFailure
+from datetime import datetime
+from report_cache import REPORT_CACHE_TTL_DAYS
+from chat_history import CHAT_SESSION_TTL_DAYS
+from search import SEARCH_FIELDS, TEXT_WEIGHTS
+from email_outbox import RETENTION_DAYS as EMAIL_RETENTION_DAYS
+import logging
+
+db = None
+logger = logging.getLogger(__name__)
+
+def set_database(database):
+    """Set the database instance from main server"""
+    global db
+    db = database
+
+def _unique_id():
+    return IndexModel([("id", ASCENDING)], unique=True, name="id_unique")
+
+# ==================== INDEX REGISTRY ====================
+
+INDEXES = {
+    # People
+    "children": [
+        _unique_id(),
+        IndexModel([("school", ASCENDING), ("status", ASCENDING)]),
+        IndexModel([("observer_id", ASCENDING), ("status", ASCENDING)]),
+        IndexModel([("parent_ids", ASCENDING)]),  # multikey
+        IndexModel([("principal_id", ASCENDING)]),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("school", ASCENDING), ("name", ASCENDING), ("id", ASCENDING)]),
+    ],
+    "observers": [
+        _unique_id(),
+        IndexModel([("email", ASCENDING)]),
+        IndexModel([("school", ASCENDING)]),
+    ],
+    "principals": [
+        _unique_id(),
+        IndexModel([("email", ASCENDING)]),
+        IndexModel([("school", ASCENDING)]),
+    ],
+    "parents": [
+        _unique_id(),
+        IndexModel([("email", ASCENDING)]),
+    ],
+    # Sessions & observations
+    "session_logs": [
+        _unique_id(),
+        IndexModel([("child_id", ASCENDING), ("session_date", DESCENDING)]),
+        IndexModel([("observer_id", ASCENDING), ("created_at", DESCENDING)]),
+        IndexModel([("child_id", ASCENDING), ("created_at", DESCENDING)]),
+        IndexModel([("created_at", DESCENDING)]),
+        IndexModel([("ai_processed", ASCENDING), ("ai_status", ASCENDING)]),
+    ],
+    "session_recordings": [
+        _unique_id(),
+        IndexModel([("child_id", ASCENDING), ("created_at", DESCENDING)]),
+        IndexModel([("observer_id", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+    "daily_reports": [
+        _unique_id(),
+        IndexModel([("child_id", ASCENDING), ("created_at", DESCENDING)]),
+        IndexModel([("observer_id", ASCENDING), ("report_date", DESCENDING)]),
+    ],
+    "readiness_checks": [
+        _unique_id(),
+        IndexModel([("observer_id", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+    "self_reflections": [
+        IndexModel([("observer_id", ASCENDING), ("reflection_date", DESCENDING)]),
+    ],
+    "appointments": [
+        IndexModel([("child_id", ASCENDING), ("scheduled_date", DESCENDING)]),
+    ],
+    "mood_entries": [
+        IndexModel([("child_id", ASCENDING), ("logged_date", DESCENDING)]),
+        IndexModel([("child_id", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+    "goals": [
+        _unique_id(),
+        IndexModel([("child_id", ASCENDING), ("status", ASCENDING)]),
+        IndexModel([("observer_id", ASCENDING)]),
+    ],
+    "progress_notes": [
+        IndexModel([("child_id", ASCENDING), ("date", DESCENDING)]),
+    ],
+    "behavioral_profiles": [
+        IndexModel([("child_id", ASCENDING)], unique=True),
+    ],
+    "behavioral_tag_days": [
+        IndexModel([("child_id", ASCENDING), ("day", ASCENDING)], unique=True),
+    ],
+    # Reports
+    "ai_reports": [
+        IndexModel([("child_id", ASCENDING), ("generated_at", DESCENDING)]),
+        IndexModel([("observer_id", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+    "parent_reports": [
+        _unique_id(),
+        IndexModel([("child_id", ASCENDING), ("generated_at", DESCENDING)]),
+    ],
+    # Principal supervision
+    "consultations": [
+        _unique_id(),
+        IndexModel([("principal_id", ASCENDING), ("status", ASCENDING)]),
+        IndexModel([("principal_id", ASCENDING), ("scheduled_date", DESCENDING)]),
+        IndexModel([("principal_id", ASCENDING), ("completed_at", DESCENDING)]),
+    ],
+    "consultation_requests": [
+        _unique_id(),
+        IndexModel([("school", ASCENDING), ("status", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+    "assignment_logs": [
+        IndexModel([("student_id", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+    # Safety
+    "red_flags": [
+        _unique_id(),
+        IndexModel([("observer_id", ASCENDING)]),
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+    "incidents": [
+        _unique_id(),
+        IndexModel([("created_by", ASCENDING)]),
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+    "escalations": [
+        _unique_id(),
+        IndexModel([("observer_id", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+    "audit_logs": [
+        IndexModel([("timestamp", DESCENDING)]),
+        IndexModel([("action_type", ASCENDING), ("timestamp", DESCENDING)]),
+    ],
+    # Admin & billing
+    "enrollments": [
+        IndexModel([("created_at", DESCENDING)]),
+    ],
+    "support_tickets": [
+        _unique_id(),
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+    "inquiries": [
+        _unique_id(),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)]),
+    ],
+    "payments": [
+        _unique_id(),
+        IndexModel([("recipient_id", ASCENDING), ("month", ASCENDING)]),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)]),
+    ],
+    "subscriptions": [
+        IndexModel([("child_id", ASCENDING), ("status", ASCENDING)]),
+    ],
+    # Communication
+    "chat_sessions": [
+        IndexModel([("session_id", ASCENDING)], unique=True),
+        IndexModel([("updated_at", ASCENDING)], expireAfterSeconds=CHAT_SESSION_TTL_DAYS * 86400),
+    ],
+    "conversations": [
+        _unique_id(),
+        IndexModel([("parent_id", ASCENDING), ("last_message_at", DESCENDING)]),
+    ],
+    "messages": [
+        IndexModel([("conversation_id", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)]),
+    ],
+    "forum_posts": [
+        _unique_id(),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("category", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)]),
+    ],
+    "forum_comments": [
+        IndexModel([("post_id", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)]),
+    ],
+    "event_wishes": [
+        IndexModel([("child_id", ASCENDING), ("created_at", DESCENDING)]),
+        IndexModel([("sender_id", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+    # Integrations
+    "google_credentials": [
+        IndexModel([("service", ASCENDING)], unique=True),
+    ],
+    "email_templates": [
+        _unique_id(),
+    ],
+    "gmail_messages": [
+        _unique_id(),
+        IndexModel([("labels", ASCENDING), ("received_at", DESCENDING), ("id", DESCENDING)]),  # multikey
+        IndexModel([("from_address", ASCENDING), ("received_at", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("received_at", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("subject", TEXT), ("snippet", TEXT), ("from", TEXT)],
+                   weights={"subject": 3, "from": 2, "snippet": 1}, name="gmail_text"),
+    ],
+    "gmail_sync_state": [
+        IndexModel([("service", ASCENDING)], unique=True),
+    ],
+    # Analytics
+    "daily_rollups": [
+        IndexModel([("scope", ASCENDING), ("key", ASCENDING), ("day", ASCENDING)], unique=True),
+        IndexModel([("scope", ASCENDING), ("day", ASCENDING)]),
+    ],
+    # AI report cache
+    "report_cache": [
+        IndexModel([("key", ASCENDING)], unique=True),
+        IndexModel([("created_at", ASCENDING)], expireAfterSeconds=REPORT_CACHE_TTL_DAYS * 86400),
+    ],
+    "report_cache_stats": [
+        IndexModel([("day", ASCENDING), ("kind", ASCENDING)], unique=True),
+    ],
+    # Full-text search
+    "search_docs": [
+        _unique_id(),
+        IndexModel([(field, TEXT) for field in SEARCH_FIELDS], weights=TEXT_WEIGHTS,
+                   default_language="english", name="search_text"),
+        IndexModel([("child_id", ASCENDING)]),
+    ],
+    # Background jobs
+    "ai_jobs": [
+        _unique_id(),
+        IndexModel([("type", ASCENDING), ("ref_id", ASCENDING)], unique=True),
+        IndexModel([("status", ASCENDING), ("run_after", ASCENDING)]),
+    ],
+    "email_outbox": [
+        _unique_id(),
+        IndexModel([("key", ASCENDING)], unique=True, sparse=True),
+        IndexModel([("status", ASCENDING), ("run_after", ASCENDING)]),
+        IndexModel([("sent_at", ASCENDING)], expireAfterSeconds=EMAIL_RETENTION_DAYS * 86400),
+    ],
+    # Maintenance
+    "migrations": [
+        IndexModel([("id", ASCENDING), ("collection", ASCENDING)], unique=True),
+    ],
+}
+
+async def ensure_indexes():
+    """Create every registered index. Failures are logged per collection so one
+    bad collection (e.g. duplicate ids blocking a unique index) does not stop startup."""
+    created = {}
+    for collection, models in INDEXES.items():
+        try:
+            created[collection] = await db[collection].create_indexes(models)
+        except OperationFailure as e:
+            logger.error(f"Index creation failed for {collection}: {str(e)}")
+            created[collection] = []
+    logger.info(f"Indexes ensured for {len(created)} collections")
+    return created
+
+# ==================== VERIFICATION ====================
+
+# Canonical query of each hot route: (route, collection, filter, sort).
+# Values are placeholders - only the shape matters to the query planner.
+CANONICAL_QUERIES = [
+    ("GET /principal/dashboard", "principals", {"id": "x"}, None),
+    ("GET /principal/students", "children", {"school": "x"}, [("name", 1), ("id", 1)]),
+    ("GET /principal/dashboard (appointments)", "appointments", {"child_id": {"$in": ["x"]}}, [("scheduled_date", -1)]),
+    ("GET /principal/trends", "session_logs", {"child_id": {"$in": ["x"]}, "session_date": {"$gte": datetime(2000, 1, 1)}}, None),
+    ("GET /principal/observer-performance", "session_logs", {"observer_id": "x", "child_id": {"$in": ["x"]}}, None),
+    ("GET /principal/consultations", "consultations", {"principal_id": "x"}, [("scheduled_date", -1)]),
+    ("GET /principal/consultation-requests", "consultation_requests", {"school": "x", "status": "pending"}, [("created_at", -1)]),
+    ("GET /principal/session-recordings", "session_recordings", {"child_id": {"$in": ["x"]}}, [("created_at", -1)]),
+    ("GET /principal/daily-reports", "daily_reports", {"observer_id": "x"}, [("report_date", -1)]),
+    ("GET /principal/my-earnings", "consultations", {"principal_id": "x", "status": "completed"}, [("completed_at", -1)]),
+    ("GET /observer/dashboard", "observers", {"id": "x"}, None),
+    ("GET /observer/children", "children", {"observer_id": "x"}, None),
+    ("GET /observer/child/{id}", "children", {"id": "x", "observer_id": "x"}, None),
+    ("GET /observer/sessions", "session_logs", {"observer_id": "x"}, [("created_at", -1)]),
+    ("GET /observer/session-logs/{child_id}", "session_logs", {"child_id": "x"}, [("session_date", -1)]),
+    ("GET /observer/trends/{child_id}", "session_logs", {"child_id": "x", "session_date": {"$gte": datetime(2000, 1, 1)}}, [("session_date", 1)]),
+    ("GET /observer/trends", "session_logs", {"child_id": {"$in": ["x"]}, "session_date": {"$gte": datetime(2000, 1, 1)}}, None),
+    ("GET /observer/readiness-checks", "readiness_checks", {"observer_id": "x"}, [("created_at", -1)]),
+    ("GET /observer/escalations", "escalations", {"observer_id": "x"}, [("created_at", -1)]),
+    ("GET /observer/parent-reports/{child_id}", "parent_reports", {"child_id": "x"}, [("generated_at", -1)]),
+    ("GET /observer/reports/{child_id}", "ai_reports", {"child_id": "x"}, [("generated_at", -1)]),
+    ("GET /parent/dashboard", "children", {"parent_ids": "x"}, None),
+    ("GET /parent/child/{id}/mood-trends", "mood_entries", {"child_id": "x"}, [("logged_date", -1)]),
+    ("GET /parent/messages/{conversation_id}", "messages", {"conversation_id": "x"}, [("created_at", 1)]),
+    ("GET /parent/conversations", "conversations", {"parent_id": "x"}, [("last_message_at", -1)]),
+    ("GET /admin/students", "children", {}, [("created_at", -1)]),
+    ("GET /admin/safety/red-flags", "red_flags", {"status": "x"}, [("created_at", -1)]),
+    ("GET /admin/incidents", "incidents", {"status": "x"}, [("created_at", -1)]),
+    ("GET /admin/support/tickets", "support_tickets", {"status": "x"}, [("created_at", -1)]),
+    ("GET /admin/inquiries", "inquiries", {}, [("created_at", -1)]),
+    ("GET /admin/payments", "payments", {}, [("created_at", -1)]),
+    ("GET /admin/analytics/overview", "daily_rollups", {"scope": "all", "key": "all", "day": {"$gte": "x"}}, [("day", 1)]),
+    ("GET /admin/analytics/sessions", "daily_rollups", {"scope": "observer", "day": {"$gte": "x"}}, [("day", 1)]),
+    ("GET /observer/analyze-session/{id}/status", "ai_jobs", {"type": "x", "ref_id": "x"}, None),
+    ("job_queue.claim", "ai_jobs", {"status": "queued", "run_after": {"$lte": datetime(2000, 1, 1)}}, [("run_after", 1)]),
+    ("email_outbox.claim", "email_outbox", {"status": "queued", "run_after": {"$lte": datetime(2000, 1, 1)}}, [("run_after", 1)]),
+    ("POST /observer/generate-report/{child_id} (cache)", "report_cache", {"key": "x"}, None),
+    ("POST /chat", "chat_sessions", {"session_id": "x"}, None),
+    ("GET /google/gmail/inbox", "gmail_messages", {"labels": "x"}, [("received_at", -1), ("id", -1)]),
+    ("GET /google/gmail/inbox (sender)", "gmail_messages", {"labels": "x", "from_address": "x"}, [("received_at", -1), ("id", -1)]),
+    ("GET /observer/search", "search_docs", {"$text": {"$search": "x"}, "child_id": {"$in": ["x"]}}, None),
+]
+
+def _plan_stages(plan):
+    """Yield every stage name in a (possibly nested) winning plan"""
+    if not isinstance(plan, dict):
+        return
+    if "stage" in plan:
+        yield plan["stage"]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            yield from _plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from _plan_stages(child)
+
+async def explain_canonical_queries():
+    """Run explain() on each canonical query and report which still COLLSCAN"""
+    results = []
+    for route, collection, query_filter, sort in CANONICAL_QUERIES:
+        find_cmd = {"find": collection, "filter": query_filter}
+        if sort:
+            find_cmd["sort"] = dict(sort)
+        try:
+            explain = await db.command({"explain": find_cmd, "verbosity": "queryPlanner"})
+            winning_plan = explain.get("queryPlanner", {}).get("winningPlan", {})
+            stages = list(_plan_stages(winning_plan))
+            results.append({
+                "route": route,
+                "collection": collection,
+                "stages": stages,
+                "collscan": "COLLSCAN" in stages
+            })
+        except Exception as e:
+            results.append({
+                "route": route,
+                "collection": collection,
+                "stages": [],
+                "collscan": None,
+                "error": str(e)
+            })
+    return results
@@ -6,6 +6,8 @@ from fastapi import APIRouter, HTTPException
 from jose import JWTError, jwt
 from datetime import datetime, timedelta, timezone
 from typing import List, Optional
+from date_ranges import parse_datetime, month_range, day_range
+import status_counts
 import logging
 import uuid
 
@@ -76,16 +78,19 @@ async def get_earnings_summary(token: str):
             
             total_sessions = len(sessions) + len(appointments)
             
+            session_times = [parse_datetime(s.get('created_at')) for s in sessions]
+            appointment_times = [parse_datetime(a.get('scheduled_date')) for a in appointments]
+            
             # Sessions this month
-            sessions_this_month = len([s for s in sessions if s.get('created_at', '').startswith(current_month)])
-            appointments_this_month = len([a for a in appointments if a.get('scheduled_date', '').startswith(current_month)])
+            month_start, month_end = month_range(current_month)
+            sessions_this_month = len([t for t in session_times if t and month_start <= t < month_end])
+            appointments_this_month = len([t for t in appointment_times if t and month_start <= t < month_end])
             monthly_sessions = sessions_this_month + appointments_this_month
             
             # Sessions this week
-            sessions_this_week = len([s for s in sessions 
-                if s.get('created_at', '')[:10] >= current_week_start.isoformat()])
-            appointments_this_week = len([a for a in appointments 
-                if a.get('scheduled_date', '')[:10] >= current_week_start.isoformat()])
+            week_start, _ = day_range(current_week_start)
+            sessions_this_week = len([t for t in session_times if t and t >= week_start])
+            appointments_this_week = len([t for t in appointment_times if t and t >= week_start])
             weekly_sessions = sessions_this_week + appointments_this_week
             
             # Calculate earnings
@@ -276,6 +281,7 @@ async def create_support_ticket(
         }
         
         await db.support_tickets.insert_one(ticket)
+        status_counts.invalidate("support_tickets")
         
         return {
             "success": True,
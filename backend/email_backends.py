@@ -0,0 +1,160 @@
+"""
+Email Backends - Delivery providers behind the email outbox
+- "resend": Resend API; batches go through the batch endpoint (up to 100 per call)
+- "log": logs instead of sending (the default while no Resend key is configured)
+- "file": appends messages as JSON lines to a local file - offline stand-in for
+  throughput benchmarks, with configurable latency and failure rate
+- "smtp": plain SMTP, e.g. a local sink (`python -m aiosmtpd -n -l localhost:1025`)
+- Selected with EMAIL_BACKEND; each backend declares its batch size and request rate
+
+Every backend's send() takes a list of messages ({"from", "to", "subject", "html"})
+and returns one {"id"} or {"error"} per message in order; raising fails the batch.
+"""
+from email.message import EmailMessage
+from typing import Dict, List
+import asyncio
+import json
+import logging
+import os
+import random
+import smtplib
+import uuid
+
+logger = logging.getLogger(__name__)
+
+RESEND_PLACEHOLDER_KEY = 're_placeholder_get_real_key_from_resend'
+
+SINK_PATH = os.environ.get('EMAIL_SINK_PATH', '/tmp/email_outbox.jsonl')
+SINK_LATENCY_MS = float(os.environ.get('EMAIL_SINK_LATENCY_MS', '50'))
+SINK_FAILURE_RATE = float(os.environ.get('EMAIL_SINK_FAILURE_RATE', '0'))
+SINK_BATCH_SIZE = int(os.environ.get('EMAIL_SINK_BATCH_SIZE', '100'))
+
+SMTP_HOST = os.environ.get('EMAIL_SMTP_HOST', 'localhost')
+SMTP_PORT = int(os.environ.get('EMAIL_SMTP_PORT', '1025'))
+SMTP_USER = os.environ.get('EMAIL_SMTP_USER', '')
+SMTP_PASSWORD = os.environ.get('EMAIL_SMTP_PASSWORD', '')
+SMTP_STARTTLS = os.environ.get('EMAIL_SMTP_STARTTLS', 'false').lower() == 'true'
+
+class ResendBackend:
+    name = "resend"
+    # Resend's batch endpoint limit and default API rate limit
+    batch_size = 100
+    rate_per_second = 2.0
+
+    def __init__(self):
+        import resend
+        resend.api_key = os.environ.get('RESEND_API_KEY', '')
+        self._resend = resend
+
+    def _send(self, messages: List[dict]) -> List[dict]:
+        if len(messages) == 1:
+            response = self._resend.Emails.send(messages[0])
+            return [{"id": response.get("id")}]
+        response = self._resend.Batch.send(messages)
+        sent = response.get("data") or []
+        if len(sent) != len(messages):
+            raise RuntimeError(f"Resend batch returned {len(sent)} results for {len(messages)} emails")
+        return [{"id": item.get("id")} for item in sent]
+
+    async def send(self, messages: List[dict]) -> List[dict]:
+        return await asyncio.to_thread(self._send, messages)
+
+class LogBackend:
+    name = "log"
+    batch_size = 100
+    rate_per_second = 0.0
+
+    async def send(self, messages: List[dict]) -> List[dict]:
+        for message in messages:
+            logger.info(f"[EMAIL MOCK] To: {', '.join(message['to'])}, Subject: {message['subject']}")
+        return [{"id": f"mock-{uuid.uuid4().hex[:12]}"} for _ in messages]
+
+class FileSinkBackend:
+    """Offline stand-in: one call per batch, seeded latency and per-message failures"""
+    name = "file"
+    rate_per_second = 0.0
+
+    def __init__(self, path: str = SINK_PATH, latency_ms: float = SINK_LATENCY_MS,
+                 failure_rate: float = SINK_FAILURE_RATE, batch_size: int = SINK_BATCH_SIZE, seed: int = 0):
+        self.path = path
+        self.latency_ms = latency_ms
+        self.failure_rate = failure_rate
+        self.batch_size = max(batch_size, 1)
+        self._random = random.Random(seed)
+        self.calls = 0
+
+    def _append(self, lines: List[str]):
+        with open(self.path, "a", encoding="utf-8") as sink:
+            sink.writelines(lines)
+
+    async def send(self, messages: List[dict]) -> List[dict]:
+        self.calls += 1
+        await asyncio.sleep(self.latency_ms / 1000)
+        results, lines = [], []
+        for message in messages:
+            if self._random.random() < self.failure_rate:
+                results.append({"error": "Email sink: simulated failure"})
+                continue
+            email_id = f"sink-{uuid.uuid4().hex[:12]}"
+            results.append({"id": email_id})
+            lines.append(json.dumps({"id": email_id, **message}) + "\n")
+        if lines:
+            await asyncio.to_thread(self._append, lines)
+        return results
+
+class SmtpBackend:
+    """One SMTP connection per batch; each message succeeds or fails on its own"""
+    name = "smtp"
+    batch_size = 50
+    rate_per_second = 0.0
+
+    def _send(self, messages: List[dict]) -> List[dict]:
+        results = []
+        with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=30) as smtp:
+            if SMTP_STARTTLS:
+                smtp.starttls()
+            if SMTP_USER:
+                smtp.login(SMTP_USER, SMTP_PASSWORD)
+            for message in messages:
+                mail = EmailMessage()
+                mail["From"] = message["from"]
+                mail["To"] = ", ".join(message["to"])
+                mail["Subject"] = message["subject"]
+                mail["Message-ID"] = f"<{uuid.uuid4().hex}@{SMTP_HOST}>"
+                mail.set_content(message["html"], subtype="html")
+                try:
+                    smtp.send_message(mail)
+                    results.append({"id": mail["Message-ID"]})
+                except smtplib.SMTPException as e:
+                    results.append({"error": str(e)})
+        return results
+
+    async def send(self, messages: List[dict]) -> List[dict]:
+        return await asyncio.to_thread(self._send, messages)
+
+BACKENDS = {"resend": ResendBackend, "log": LogBackend, "file": FileSinkBackend, "smtp": SmtpBackend}
+_backends: Dict[str, object] = {}
+
+def resend_configured() -> bool:
+    key = os.environ.get('RESEND_API_KEY', '')
+    return bool(key) and key != RESEND_PLACEHOLDER_KEY
+
+def backend_name() -> str:
+    """EMAIL_BACKEND, else Resend when a key is configured. Read on first use rather
+    than at import - server.py loads .env after the routers are imported."""
+    return os.environ.get('EMAIL_BACKEND') or ("resend" if resend_configured() else "log")
+
+def get_backend(name: str = None):
+    """The configured backend instance, created once per process"""
+    name = name or backend_name()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown email backend: {name}")
+    if name not in _backends:
+        backend = BACKENDS[name]()
+        # Overrides the backend's own request rate (requests per second, 0 = unlimited)
+        if os.environ.get('EMAIL_RATE_PER_SECOND'):
+            backend.rate_per_second = float(os.environ['EMAIL_RATE_PER_SECOND'])
+        _backends[name] = backend
+        if name == "log":
+            logger.warning("Email backend 'log' in use - emails will be logged only")
+    return _backends[name]
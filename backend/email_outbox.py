@@ -0,0 +1,260 @@
+"""
+Email Outbox - Durable outbound email with a dispatcher worker pool
+- enqueue() writes the email to db.email_outbox before the request returns, so a
+  restart never loses it (optionally idempotent per `key`)
+- Dispatchers claim due emails with an atomic find_one_and_update and hold a lease;
+  emails leased by a dead process are claimed again once the lease expires
+- Up to the backend's batch size is sent per provider call (see email_backends); a
+  provider call that raises is split in halves and retried, so one bad email only
+  fails itself, all within the lease
+- Provider calls are rate limited per backend (token bucket, per process)
+- Failures retry with exponential backoff up to EMAIL_MAX_ATTEMPTS, then park as
+  "dead" (dead letters) until requeued by an admin
+- Sent emails expire after EMAIL_OUTBOX_RETENTION_DAYS (TTL index on sent_at)
+"""
+from pymongo import ReturnDocument
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from status_counts import count_by_status
+import email_backends
+import asyncio
+import logging
+import os
+import time
+import uuid
+
+db = None
+logger = logging.getLogger(__name__)
+
+COLLECTION = "email_outbox"
+DEFAULT_SENDER = 'onboarding@resend.dev'
+WORKERS = int(os.environ.get('EMAIL_WORKERS', '2'))
+MAX_ATTEMPTS = int(os.environ.get('EMAIL_MAX_ATTEMPTS', '6'))
+LEASE_SECONDS = float(os.environ.get('EMAIL_LEASE_SECONDS', '120'))
+POLL_SECONDS = float(os.environ.get('EMAIL_POLL_SECONDS', '2'))
+BACKOFF_SECONDS = float(os.environ.get('EMAIL_BACKOFF_SECONDS', '30'))
+MAX_BACKOFF_SECONDS = float(os.environ.get('EMAIL_MAX_BACKOFF_SECONDS', '3600'))
+RETENTION_DAYS = int(os.environ.get('EMAIL_OUTBOX_RETENTION_DAYS', '30'))
+
+EMAIL_STATUSES = ["queued", "sending", "sent", "dead"]
+
+_workers: List[asyncio.Task] = []
+_wakeup: Optional[asyncio.Event] = None
+_worker_prefix = uuid.uuid4().hex[:8]
+
+def set_database(database):
+    """Set the database instance from main server"""
+    global db
+    db = database
+
+def backoff(attempts: int) -> float:
+    """Seconds to wait before retry number `attempts` (1-based)"""
+    return min(BACKOFF_SECONDS * (2 ** max(attempts - 1, 0)), MAX_BACKOFF_SECONDS)
+
+class RateLimiter:
+    """Token bucket: at most `rate` acquisitions per second, bursts up to `burst`"""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst or max(rate, 1.0)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+# backend name -> limiter
+_limiters: Dict[str, RateLimiter] = {}
+
+def _limiter(backend) -> RateLimiter:
+    if backend.name not in _limiters:
+        _limiters[backend.name] = RateLimiter(backend.rate_per_second)
+    return _limiters[backend.name]
+
+# ==================== PRODUCERS ====================
+
+async def enqueue(to: str, subject: str, html: str, sender: Optional[str] = None,
+                  key: Optional[str] = None) -> dict:
+    """Queue an email for delivery. With `key`, enqueueing the same key again is a no-op."""
+    now = datetime.now(timezone.utc)
+    email = {
+        "id": str(uuid.uuid4()),
+        "from": sender or os.environ.get('SENDER_EMAIL', DEFAULT_SENDER),
+        "to": [to],
+        "subject": subject,
+        "html": html,
+        "status": "queued",
+        "attempts": 0,
+        "run_after": now,
+        "lease_until": None,
+        "last_error": None,
+        "provider_id": None,
+        "created_at": now,
+        "updated_at": now
+    }
+    if key:
+        email["key"] = key
+        email = await db[COLLECTION].find_one_and_update(
+            {"key": key},
+            {"$setOnInsert": email},
+            upsert=True,
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
+    else:
+        await db[COLLECTION].insert_one(email)
+        email.pop("_id", None)
+    if _wakeup:
+        _wakeup.set()
+    return email
+
+async def requeue(email_id: str) -> bool:
+    """Send a dead email again from scratch"""
+    now = datetime.now(timezone.utc)
+    result = await db[COLLECTION].update_one(
+        {"id": email_id, "status": "dead"},
+        {"$set": {"status": "queued", "attempts": 0, "run_after": now, "updated_at": now}}
+    )
+    if result.modified_count and _wakeup:
+        _wakeup.set()
+    return bool(result.modified_count)
+
+# ==================== DISPATCHERS ====================
+
+async def claim(worker_id: str) -> Optional[dict]:
+    """Atomically lease the next due email (queued, or sending with an expired lease)"""
+    now = datetime.now(timezone.utc)
+    return await db[COLLECTION].find_one_and_update(
+        {"$or": [
+            {"status": "queued", "run_after": {"$lte": now}},
+            {"status": "sending", "lease_until": {"$lt": now}}
+        ]},
+        {
+            "$set": {
+                "status": "sending",
+                "worker_id": worker_id,
+                "lease_until": now + timedelta(seconds=LEASE_SECONDS),
+                "updated_at": now
+            },
+            "$inc": {"attempts": 1}
+        },
+        sort=[("run_after", 1)],
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+
+async def claim_batch(worker_id: str, size: int) -> List[dict]:
+    emails = []
+    while len(emails) < size:
+        email = await claim(worker_id)
+        if not email:
+            break
+        emails.append(email)
+    return emails
+
+async def _settle(email: dict, result: dict) -> str:
+    now = datetime.now(timezone.utc)
+    error = result.get("error")
+    if error is None:
+        update = {"status": "sent", "lease_until": None, "last_error": None,
+                  "provider_id": result.get("id"), "sent_at": now}
+    elif email["attempts"] >= MAX_ATTEMPTS:
+        update = {"status": "dead", "lease_until": None, "last_error": error}
+    else:
+        update = {
+            "status": "queued",
+            "lease_until": None,
+            "last_error": error,
+            "run_after": now + timedelta(seconds=backoff(email["attempts"]))
+        }
+    update["updated_at"] = now
+    # Only the lease holder may settle the email
+    await db[COLLECTION].update_one({"id": email["id"], "worker_id": email["worker_id"]}, {"$set": update})
+    if error:
+        logger.warning(f"Email {email['id']} to {', '.join(email['to'])} attempt {email['attempts']} failed ({update['status']}): {error}")
+    return update["status"]
+
+async def _deliver(backend, messages: List[dict], deadline: float) -> List[dict]:
+    """Provider results for `messages`; a failed call is split in halves until the bad
+    email is isolated. Calls stop at `deadline` (the end of the lease)."""
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        return [{"error": "lease expired before the email was sent"}] * len(messages)
+    await _limiter(backend).acquire()
+    try:
+        results = await asyncio.wait_for(backend.send(messages), timeout=remaining)
+        if len(results) != len(messages):
+            raise RuntimeError(f"{backend.name} returned {len(results)} results for {len(messages)} emails")
+        return results
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        error = str(e) or type(e).__name__
+        # A timeout used up the lease; anything else may be one rejected email
+        if len(messages) == 1 or isinstance(e, asyncio.TimeoutError):
+            return [{"error": error}] * len(messages)
+        logger.warning(f"{backend.name} batch of {len(messages)} emails failed, splitting: {error}")
+        middle = len(messages) // 2
+        return (await _deliver(backend, messages[:middle], deadline)
+                + await _deliver(backend, messages[middle:], deadline))
+
+async def send_batch(emails: List[dict], backend=None) -> Dict[str, str]:
+    """Deliver claimed emails in as few provider calls as possible and settle each;
+    returns status per id"""
+    backend = backend or email_backends.get_backend()
+    messages = [{"from": e["from"], "to": e["to"], "subject": e["subject"], "html": e["html"]} for e in emails]
+    results = await _deliver(backend, messages, time.monotonic() + LEASE_SECONDS)
+    statuses = {}
+    for email, result in zip(emails, results):
+        statuses[email["id"]] = await _settle(email, result)
+    return statuses
+
+async def _worker(worker_id: str):
+    backend = email_backends.get_backend()
+    while True:
+        try:
+            emails = await claim_batch(worker_id, backend.batch_size)
+            if emails:
+                await send_batch(emails, backend)
+                continue
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Email dispatcher {worker_id} error: {str(e)}")
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        _wakeup.clear()
+
+def start(workers: int = WORKERS):
+    """Start the dispatcher pool in the running event loop"""
+    global _wakeup
+    if _workers:
+        return
+    _wakeup = asyncio.Event()
+    for i in range(max(workers, 0)):
+        _workers.append(asyncio.create_task(_worker(f"{_worker_prefix}-mail-{i}")))
+    logger.info(f"Email outbox started with {len(_workers)} dispatchers ({email_backends.get_backend().name} backend)")
+
+async def stop():
+    """Cancel the dispatchers; leased emails are retried by the next process after the lease"""
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+
+async def stats() -> Dict[str, int]:
+    """Email counts by status"""
+    return await count_by_status(COLLECTION, {}, EMAIL_STATUSES)
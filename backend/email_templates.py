@@ -0,0 +1,296 @@
+"""
+Email Templates - Precompiled Jinja2 templates for outgoing email
+- Templates are compiled once per process and reused; a send only pays the render
+- Bodies are auto-escaped, so user-provided fields (names, messages) can't inject
+  markup; subjects are plain text and rendered without escaping
+- Templates are editable, so they run in Jinja's immutable sandbox: no attribute
+  access to internals (__globals__ etc.) and no mutation of the context
+- Editable templates live in db.email_templates (seeded with DEFAULT_TEMPLATES on
+  first use); the built-in inquiry templates are used unless a document with the
+  same id overrides them
+- save_template() invalidates the cache; a TTL bounds staleness across worker
+  processes
+- render(template_id, context) -> (subject, html) is the single entry point
+"""
+from jinja2 import Template, TemplateNotFound
+from jinja2.sandbox import ImmutableSandboxedEnvironment
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+import logging
+import os
+import time
+
+db = None
+logger = logging.getLogger(__name__)
+
+EMAIL_TEMPLATE_TTL = float(os.environ.get('EMAIL_TEMPLATE_TTL_SECONDS', '300'))
+SITE_URL = os.environ.get('PUBLIC_SITE_URL', 'https://sanjaya-admin.preview.emergentagent.com')
+
+_html_env = ImmutableSandboxedEnvironment(autoescape=True)
+_text_env = ImmutableSandboxedEnvironment(autoescape=False)
+
+def set_database(database):
+    """Set the database instance from main server"""
+    global db
+    db = database
+
+# ==================== TEMPLATES ====================
+
+# Seeded into db.email_templates and editable from the admin panel
+DEFAULT_TEMPLATES = [
+    {
+        "id": "welcome",
+        "name": "Welcome Email",
+        "subject": "Welcome to Sanjaya Program",
+        "body_html": """
+        <div style="font-family: 'Nunito', Arial, sans-serif; max-width: 600px; margin: 0 auto;">
+            <div style="background: linear-gradient(135deg, #f97316, #ec4899); padding: 30px; text-align: center; border-radius: 12px 12px 0 0;">
+                <h1 style="color: white; margin: 0;">Welcome to Sanjaya! 🌟</h1>
+            </div>
+            <div style="padding: 30px; background: #fff;">
+                <p>Dear {{name}},</p>
+                <p>We are thrilled to welcome you to the Sanjaya family! Our emotional support program is designed to help children grow, express, and thrive.</p>
+                <p>Here's what you can expect:</p>
+                <ul>
+                    <li>Regular sessions with trained observers</li>
+                    <li>Progress reports and insights</li>
+                    <li>Resources for emotional well-being</li>
+                </ul>
+                <p>If you have any questions, feel free to reach out!</p>
+                <p>Warm regards,<br>The Sanjaya Team</p>
+            </div>
+        </div>
+        """
+    },
+    {
+        "id": "session_reminder",
+        "name": "Session Reminder",
+        "subject": "Upcoming Session Reminder - {{child_name}}",
+        "body_html": """
+        <div style="font-family: 'Nunito', Arial, sans-serif; max-width: 600px; margin: 0 auto;">
+            <div style="background: linear-gradient(135deg, #6366f1, #8b5cf6); padding: 30px; text-align: center; border-radius: 12px 12px 0 0;">
+                <h1 style="color: white; margin: 0;">Session Reminder 📅</h1>
+            </div>
+            <div style="padding: 30px; background: #fff;">
+                <p>Dear {{parent_name}},</p>
+                <p>This is a friendly reminder about {{child_name}}'s upcoming session:</p>
+                <div style="background: #f3f4f6; padding: 20px; border-radius: 8px; margin: 20px 0;">
+                    <p><strong>Date:</strong> {{session_date}}</p>
+                    <p><strong>Time:</strong> {{session_time}}</p>
+                    <p><strong>Observer:</strong> {{observer_name}}</p>
+                </div>
+                <p>Please ensure {{child_name}} is ready for the session.</p>
+                <p>Best regards,<br>The Sanjaya Team</p>
+            </div>
+        </div>
+        """
+    },
+    {
+        "id": "report_ready",
+        "name": "Report Ready",
+        "subject": "New Report Available for {{child_name}}",
+        "body_html": """
+        <div style="font-family: 'Nunito', Arial, sans-serif; max-width: 600px; margin: 0 auto;">
+            <div style="background: linear-gradient(135deg, #10b981, #14b8a6); padding: 30px; text-align: center; border-radius: 12px 12px 0 0;">
+                <h1 style="color: white; margin: 0;">Report Ready! 📊</h1>
+            </div>
+            <div style="padding: 30px; background: #fff;">
+                <p>Dear {{parent_name}},</p>
+                <p>A new {{report_type}} report is now available for {{child_name}}.</p>
+                <p>You can view the report by logging into your parent portal.</p>
+                <div style="text-align: center; margin: 30px 0;">
+                    <a href="{{portal_link}}" style="background: #10b981; color: white; padding: 12px 30px; border-radius: 8px; text-decoration: none;">View Report</a>
+                </div>
+                <p>Best regards,<br>The Sanjaya Team</p>
+            </div>
+        </div>
+        """
+    }
+]
+
+# Sent by the public inquiry form; not seeded, but a db.email_templates document
+# with the same id replaces them
+BUILTIN_TEMPLATES = {
+    "inquiry_admin": {
+        "id": "inquiry_admin",
+        "name": "New Inquiry (Admin)",
+        "subject": "🎉 New Inquiry: {{ parent_name }} for {{ child_name }}",
+        "body_html": """
+        <html>
+        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+            <div style="max-width: 600px; margin: 0 auto; padding: 20px; background-color: #f9f9f9;">
+                <h2 style="color: #f97316; border-bottom: 2px solid #f97316; padding-bottom: 10px;">
+                    🎉 New Inquiry Received!
+                </h2>
+
+                <div style="background: white; padding: 20px; border-radius: 8px; margin: 20px 0;">
+                    <h3 style="color: #4f46e5; margin-top: 0;">Parent Information</h3>
+                    <p><strong>Name:</strong> {{ parent_name }}</p>
+                    <p><strong>Email:</strong> <a href="mailto:{{ email }}">{{ email }}</a></p>
+                    <p><strong>Phone:</strong> <a href="tel:{{ phone }}">{{ phone }}</a></p>
+                </div>
+
+                <div style="background: white; padding: 20px; border-radius: 8px; margin: 20px 0;">
+                    <h3 style="color: #8b5cf6; margin-top: 0;">Child Information</h3>
+                    <p><strong>Name:</strong> {{ child_name }}</p>
+                    <p><strong>Age:</strong> {{ child_age }} years</p>
+                    <p><strong>School:</strong> {{ school_name or 'Not provided' }}</p>
+                </div>
+                {% if message %}
+                <div style="background: white; padding: 20px; border-radius: 8px; margin: 20px 0;">
+                    <h3 style="color: #059669; margin-top: 0;">Parent's Message</h3>
+                    <p style="background: #f3f4f6; padding: 15px; border-radius: 5px; border-left: 4px solid #f97316;">
+                        {{ message }}
+                    </p>
+                </div>
+                {% endif %}
+                <div style="background: #fef3c7; padding: 15px; border-radius: 8px; margin: 20px 0;">
+                    <p style="margin: 0;"><strong>📅 Submitted:</strong> {{ submitted_at }}</p>
+                    <p style="margin: 10px 0 0 0;"><strong>🆔 Inquiry ID:</strong> {{ id }}</p>
+                </div>
+
+                <p style="color: #666; font-size: 14px; margin-top: 30px; padding-top: 20px; border-top: 1px solid #ddd;">
+                    Please respond to this inquiry within 24 hours for best parent experience.
+                </p>
+            </div>
+        </body>
+        </html>
+        """
+    },
+    "inquiry_parent": {
+        "id": "inquiry_parent",
+        "name": "Inquiry Confirmation (Parent)",
+        "subject": "Thank You for Your Interest in Sanjaya",
+        "body_html": """
+        <html>
+        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+            <div style="max-width: 600px; margin: 0 auto; padding: 20px; background-color: #f9f9f9;">
+                <h2 style="color: #f97316; border-bottom: 2px solid #f97316; padding-bottom: 10px;">
+                    Thank You for Your Interest in Sanjaya!
+                </h2>
+
+                <div style="background: white; padding: 20px; border-radius: 8px; margin: 20px 0;">
+                    <p>Dear {{ parent_name }},</p>
+
+                    <p>Thank you for reaching out to us about <strong>{{ child_name }}</strong>. We're excited about the opportunity to support your child's emotional growth journey.</p>
+
+                    <p><strong>What happens next?</strong></p>
+                    <ol style="color: #666;">
+                        <li>Our team will review your inquiry within 24 hours</li>
+                        <li>We'll contact you at <strong>{{ email }}</strong> or <strong>{{ phone }}</strong></li>
+                        <li>We'll schedule a call to discuss how Sanjaya can best support {{ child_name }}</li>
+                    </ol>
+                </div>
+
+                <div style="background: #dbeafe; padding: 15px; border-radius: 8px; margin: 20px 0;">
+                    <p style="margin: 0;"><strong>Your Inquiry Details:</strong></p>
+                    <p style="margin: 10px 0 0 0;">Child: {{ child_name }}, Age {{ child_age }}</p>
+                    {% if school_name %}<p style='margin: 5px 0 0 0;'>School: {{ school_name }}</p>{% endif %}
+                    <p style="margin: 5px 0 0 0;">Inquiry ID: {{ id }}</p>
+                </div>
+
+                <div style="background: white; padding: 20px; border-radius: 8px; margin: 20px 0;">
+                    <p><strong>In the meantime, learn more about Sanjaya:</strong></p>
+                    <ul style="color: #666;">
+                        <li><a href="{{ site_url }}/about" style="color: #f97316;">Why Sanjaya Exists</a></li>
+                        <li><a href="{{ site_url }}/how-it-works" style="color: #f97316;">How It Works</a></li>
+                        <li><a href="{{ site_url }}/faq" style="color: #f97316;">Frequently Asked Questions</a></li>
+                    </ul>
+                </div>
+
+                <p style="color: #666; font-size: 14px; margin-top: 30px; padding-top: 20px; border-top: 1px solid #ddd;">
+                    If you have any immediate questions, feel free to reply to this email or call us.
+                </p>
+
+                <p style="color: #666; font-size: 14px;">
+                    Warm regards,<br>
+                    <strong>The Sanjaya Team</strong>
+                </p>
+            </div>
+        </body>
+        </html>
+        """
+    }
+}
+
+# ==================== CACHE ====================
+
+# (expires_at, {template_id: template doc}) for db.email_templates
+_catalog: Optional[tuple] = None
+# template_id -> (subject source, body source, subject Template, body Template)
+_compiled: Dict[str, tuple] = {}
+
+def compile_template(subject: str, body_html: str) -> Tuple[Template, Template]:
+    """Compile a subject/body pair; raises jinja2.TemplateSyntaxError on bad markup"""
+    return _text_env.from_string(subject), _html_env.from_string(body_html)
+
+async def _seed_defaults():
+    # $setOnInsert so concurrent first requests can't duplicate or clobber edits
+    for template in DEFAULT_TEMPLATES:
+        await db.email_templates.update_one(
+            {"id": template["id"]},
+            {"$setOnInsert": dict(template)},
+            upsert=True
+        )
+
+async def _load_catalog() -> Dict[str, dict]:
+    global _catalog
+    if _catalog and _catalog[0] > time.monotonic():
+        return _catalog[1]
+    templates = await db.email_templates.find({}, {"_id": 0}).to_list(None)
+    if not templates:
+        await _seed_defaults()
+        templates = await db.email_templates.find({}, {"_id": 0}).to_list(None)
+    catalog = {t["id"]: t for t in templates}
+    _catalog = (time.monotonic() + EMAIL_TEMPLATE_TTL, catalog)
+    return catalog
+
+def invalidate(template_id: Optional[str] = None):
+    """Drop cached templates (all of them without an id)"""
+    global _catalog
+    _catalog = None
+    if template_id:
+        _compiled.pop(template_id, None)
+    else:
+        _compiled.clear()
+
+async def list_templates() -> List[dict]:
+    """Editable templates from db.email_templates (seeded on first use)"""
+    return list((await _load_catalog()).values())
+
+async def get_template(template_id: str) -> Optional[dict]:
+    """Template document by id: db.email_templates first, then the built-ins"""
+    catalog = await _load_catalog()
+    return catalog.get(template_id) or BUILTIN_TEMPLATES.get(template_id)
+
+async def _compiled_template(template_id: str) -> Tuple[Template, Template]:
+    template = await get_template(template_id)
+    if not template:
+        raise TemplateNotFound(template_id)
+    cached = _compiled.get(template_id)
+    # Recompile only when the source changed (an edit seen after the TTL in another process)
+    if cached and cached[0] == template["subject"] and cached[1] == template["body_html"]:
+        return cached[2], cached[3]
+    subject, body = compile_template(template["subject"], template["body_html"])
+    _compiled[template_id] = (template["subject"], template["body_html"], subject, body)
+    return subject, body
+
+async def render(template_id: str, context: dict) -> Tuple[str, str]:
+    """Render a template to (subject, html); raises jinja2.TemplateNotFound for unknown ids"""
+    subject, body = await _compiled_template(template_id)
+    values = {"site_url": SITE_URL, **context}
+    return subject.render(values).strip(), body.render(values)
+
+async def save_template(template_id: str, name: str, subject: str, body_html: str) -> dict:
+    """Create or update an editable template; validates it compiles before saving"""
+    compile_template(subject, body_html)
+    template = {
+        "id": template_id,
+        "name": name,
+        "subject": subject,
+        "body_html": body_html,
+        "updated_at": datetime.now(timezone.utc).isoformat()
+    }
+    await db.email_templates.update_one({"id": template_id}, {"$set": template}, upsert=True)
+    invalidate(template_id)
+    return template
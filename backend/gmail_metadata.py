@@ -0,0 +1,105 @@
+"""
+Gmail Metadata - Batched, cached message metadata for the admin inbox
+- Metadata for many messages is fetched with Gmail batch requests (GMAIL_BATCH_SIZE
+  messages.get calls per HTTP round-trip) instead of one request per message
+- Summaries are cached per message id for GMAIL_METADATA_TTL_SECONDS, so refreshing
+  the inbox only fetches ids that are new (or whose labels may have changed)
+- Messages the batch fails for are retried once, then left out
+"""
+from typing import Dict, List
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+GMAIL_BATCH_SIZE = int(os.environ.get('GMAIL_BATCH_SIZE', '50'))
+GMAIL_METADATA_TTL = float(os.environ.get('GMAIL_METADATA_TTL_SECONDS', '60'))
+GMAIL_METADATA_MAX_ENTRIES = int(os.environ.get('GMAIL_METADATA_MAX_ENTRIES', '5000'))
+
+METADATA_HEADERS = ['From', 'To', 'Subject', 'Date']
+
+# message id -> (expires_at, summary)
+_cache: Dict[str, tuple] = {}
+
+def summarize(msg_data: dict) -> dict:
+    """Inbox row for a messages.get response (format=metadata or full)"""
+    headers = {h['name']: h['value'] for h in msg_data.get('payload', {}).get('headers', [])}
+    return {
+        "id": msg_data['id'],
+        "thread_id": msg_data.get('threadId'),
+        "from": headers.get('From', 'Unknown'),
+        "to": headers.get('To', ''),
+        "subject": headers.get('Subject', 'No Subject'),
+        "date": headers.get('Date', ''),
+        "snippet": msg_data.get('snippet', ''),
+        "labels": msg_data.get('labelIds', []),
+        "internal_date": int(msg_data['internalDate']) if msg_data.get('internalDate') else None,
+        "history_id": msg_data.get('historyId')
+    }
+
+async def _fetch_batch(client, ids: List[str]) -> Dict[str, dict]:
+    """messages.get for up to GMAIL_BATCH_SIZE ids in one HTTP request"""
+    found, failed = {}, []
+
+    def on_response(request_id, response, exception):
+        if exception is not None:
+            failed.append((request_id, exception))
+        else:
+            found[request_id] = summarize(response)
+
+    batch = client.service.new_batch_http_request(callback=on_response)
+    messages = client.service.users().messages()
+    for message_id in ids:
+        batch.add(
+            messages.get(userId='me', id=message_id, format='metadata', metadataHeaders=METADATA_HEADERS),
+            request_id=message_id
+        )
+    await client.execute(batch)
+    for message_id, exception in failed:
+        logger.warning(f"Gmail metadata fetch failed for {message_id}: {str(exception)}")
+    return found
+
+async def fetch_metadata(client, ids: List[str], use_cache: bool = True) -> Dict[str, dict]:
+    """Summaries by message id; only ids missing from the cache are fetched"""
+    now = time.monotonic()
+    summaries = {}
+    missing = []
+    for message_id in ids:
+        cached = _cache.get(message_id) if use_cache else None
+        if cached and cached[0] > now:
+            summaries[message_id] = cached[1]
+        elif message_id not in missing:
+            missing.append(message_id)
+
+    # One retry for ids the batch failed on (rate limits, transient errors)
+    for _ in range(2):
+        if not missing:
+            break
+        fetched = {}
+        for start in range(0, len(missing), GMAIL_BATCH_SIZE):
+            fetched.update(await _fetch_batch(client, missing[start:start + GMAIL_BATCH_SIZE]))
+        summaries.update(fetched)
+        missing = [message_id for message_id in missing if message_id not in fetched]
+        remember(fetched.values())
+
+    return summaries
+
+def remember(summaries):
+    """Cache summaries for GMAIL_METADATA_TTL_SECONDS, bounded to GMAIL_METADATA_MAX_ENTRIES"""
+    if len(_cache) > GMAIL_METADATA_MAX_ENTRIES:
+        now = time.monotonic()
+        for message_id in [k for k, v in _cache.items() if v[0] <= now]:
+            del _cache[message_id]
+        if len(_cache) > GMAIL_METADATA_MAX_ENTRIES:
+            _cache.clear()
+    expires_at = time.monotonic() + GMAIL_METADATA_TTL
+    for summary in summaries:
+        _cache[summary["id"]] = (expires_at, summary)
+
+def invalidate(message_id: str = None):
+    """Drop cached metadata (all of it without an id)"""
+    if message_id:
+        _cache.pop(message_id, None)
+    else:
+        _cache.clear()
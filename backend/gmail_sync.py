@@ -0,0 +1,297 @@
+"""
+Gmail Sync - Local mirror of the connected Gmail account in db.gmail_messages
+- The first sync lists GMAIL_SYNC_QUERY (up to GMAIL_SYNC_MAX_MESSAGES) and stores
+  the metadata of every message, fetched in batches (see gmail_metadata)
+- Later syncs replay users.history.list from the stored historyId: new messages are
+  fetched, deleted ones removed and label changes applied; an expired historyId
+  (404) or a reconnected account falls back to a full sync
+- Bodies are fetched on demand by get_message() and kept on the mirrored message
+- A background worker syncs every GMAIL_SYNC_SECONDS; a lease on the sync state
+  keeps several server processes from syncing at once
+- The admin inbox reads the mirror with indexed queries (label, sender, date,
+  text search); routes bypass it with live=true
+"""
+from googleapiclient.errors import HttpError
+from pymongo import DeleteOne, ReturnDocument, UpdateOne
+from datetime import datetime, timedelta, timezone
+from email.utils import parseaddr
+from typing import Dict, Iterable, List, Optional
+from pagination import paginate
+import gmail_metadata
+import google_client
+import asyncio
+import base64
+import logging
+import os
+import uuid
+
+db = None
+logger = logging.getLogger(__name__)
+
+COLLECTION = "gmail_messages"
+STATE_COLLECTION = "gmail_sync_state"
+SYNC_SECONDS = float(os.environ.get('GMAIL_SYNC_SECONDS', '60'))
+SYNC_QUERY = os.environ.get('GMAIL_SYNC_QUERY', 'in:inbox')
+SYNC_MAX_MESSAGES = int(os.environ.get('GMAIL_SYNC_MAX_MESSAGES', '2000'))
+LEASE_SECONDS = float(os.environ.get('GMAIL_SYNC_LEASE_SECONDS', '300'))
+LIST_PAGE_SIZE = 500
+HISTORY_TYPES = ["messageAdded", "messageDeleted", "labelAdded", "labelRemoved"]
+# Drafts change on every keystroke and are not part of the inbox
+SKIP_LABELS = {"DRAFT"}
+
+_worker: Optional[asyncio.Task] = None
+_owner = uuid.uuid4().hex[:8]
+
+def set_database(database):
+    """Set the database instance from main server"""
+    global db
+    db = database
+
+def extract_body(payload: dict) -> str:
+    """HTML body of a message payload (plain text if there is no HTML part)"""
+    found = {}
+
+    def walk(part):
+        data = part.get('body', {}).get('data')
+        mime_type = part.get('mimeType', '')
+        if data and mime_type in ('text/html', 'text/plain') and mime_type not in found:
+            found[mime_type] = base64.urlsafe_b64decode(data).decode('utf-8', errors='replace')
+        for child in part.get('parts', []):
+            walk(child)
+
+    data = payload.get('body', {}).get('data')
+    if data and not payload.get('parts'):
+        return base64.urlsafe_b64decode(data).decode('utf-8', errors='replace')
+    walk(payload)
+    return found.get('text/html') or found.get('text/plain', '')
+
+def _document(summary: dict) -> dict:
+    internal_date = summary.get("internal_date")
+    return {
+        **summary,
+        "from_address": parseaddr(summary.get("from", ""))[1].lower(),
+        "received_at": datetime.fromtimestamp(internal_date / 1000, timezone.utc) if internal_date else None,
+        "synced_at": datetime.now(timezone.utc)
+    }
+
+# ==================== SYNC ====================
+
+async def _store(summaries: Iterable[dict]) -> int:
+    ops = [
+        UpdateOne({"id": s["id"]}, {"$set": _document(s)}, upsert=True)
+        for s in summaries if not SKIP_LABELS.intersection(s.get("labels", []))
+    ]
+    if ops:
+        await db[COLLECTION].bulk_write(ops, ordered=False)
+    return len(ops)
+
+async def _fetch_and_store(client, ids: List[str]) -> int:
+    stored = 0
+    for start in range(0, len(ids), LIST_PAGE_SIZE):
+        summaries = await gmail_metadata.fetch_metadata(client, ids[start:start + LIST_PAGE_SIZE], use_cache=False)
+        stored += await _store(summaries.values())
+    return stored
+
+async def full_sync(client) -> dict:
+    """Mirror SYNC_QUERY from scratch; returns the new sync state fields"""
+    messages = client.service.users().messages()
+    # Take the historyId first so changes made while listing are replayed next time
+    profile = await client.execute(client.service.users().getProfile(userId='me'))
+    ids, page_token = [], None
+    while len(ids) < SYNC_MAX_MESSAGES:
+        response = await client.execute(messages.list(
+            userId='me',
+            q=SYNC_QUERY,
+            maxResults=min(LIST_PAGE_SIZE, SYNC_MAX_MESSAGES - len(ids)),
+            pageToken=page_token
+        ))
+        ids.extend(m['id'] for m in response.get('messages', []))
+        page_token = response.get('nextPageToken')
+        if not page_token:
+            break
+    await db[COLLECTION].delete_many({"id": {"$nin": ids}})
+    stored = await _fetch_and_store(client, ids)
+    logger.info(f"Gmail full sync mirrored {stored} messages")
+    return {
+        "history_id": profile['historyId'],
+        "email": profile.get('emailAddress', ''),
+        "last_full_sync_at": datetime.now(timezone.utc),
+        "added": stored,
+        "deleted": 0
+    }
+
+async def incremental_sync(client, start_history_id: str) -> dict:
+    """Replay history since start_history_id; raises HttpError 404 if it expired"""
+    history = client.service.users().history()
+    added: List[str] = []
+    deleted: List[str] = []
+    labels: Dict[str, List[str]] = {}
+    history_id, page_token = start_history_id, None
+    while True:
+        response = await client.execute(history.list(
+            userId='me',
+            startHistoryId=start_history_id,
+            historyTypes=HISTORY_TYPES,
+            maxResults=LIST_PAGE_SIZE,
+            pageToken=page_token
+        ))
+        for record in response.get('history', []):
+            for item in record.get('messagesAdded', []):
+                added.append(item['message']['id'])
+            for item in record.get('messagesDeleted', []):
+                deleted.append(item['message']['id'])
+            for item in record.get('labelsAdded', []) + record.get('labelsRemoved', []):
+                # The message carries its full label set after the change
+                labels[item['message']['id']] = item['message'].get('labelIds', [])
+        history_id = response.get('historyId', history_id)
+        page_token = response.get('nextPageToken')
+        if not page_token:
+            break
+
+    deleted_set = set(deleted)
+    # A label change can bring an unmirrored message into scope (e.g. moved back to
+    # the inbox) - fetch those like new messages
+    mirrored = set(await db[COLLECTION].distinct("id", {"id": {"$in": list(labels)}})) if labels else set()
+    added.extend(message_id for message_id, label_ids in labels.items()
+                 if message_id not in mirrored and "INBOX" in label_ids)
+    added = [message_id for message_id in dict.fromkeys(added) if message_id not in deleted_set]
+    added_set = set(added)
+    stored = await _fetch_and_store(client, added)
+    ops = [DeleteOne({"id": message_id}) for message_id in deleted_set]
+    ops += [
+        UpdateOne({"id": message_id}, {"$set": {"labels": label_ids, "synced_at": datetime.now(timezone.utc)}})
+        for message_id, label_ids in labels.items()
+        if message_id not in deleted_set and message_id not in added_set
+    ]
+    if ops:
+        await db[COLLECTION].bulk_write(ops, ordered=False)
+    for message_id in deleted_set.union(labels):
+        gmail_metadata.invalidate(message_id)
+    return {"history_id": history_id, "added": stored, "deleted": len(deleted_set)}
+
+async def _acquire_lease() -> Optional[dict]:
+    now = datetime.now(timezone.utc)
+    await db[STATE_COLLECTION].update_one(
+        {"service": "gmail"},
+        {"$setOnInsert": {"service": "gmail", "history_id": None, "lease_until": None}},
+        upsert=True
+    )
+    # Not re-entrant: a manual sync while this process's worker is syncing must wait
+    return await db[STATE_COLLECTION].find_one_and_update(
+        {"service": "gmail", "$or": [
+            {"lease_until": None},
+            {"lease_until": {"$lt": now}}
+        ]},
+        {"$set": {"owner": _owner, "lease_until": now + timedelta(seconds=LEASE_SECONDS)}},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+
+async def sync() -> Optional[dict]:
+    """One sync pass (full or incremental); None if Gmail isn't connected or another
+    process holds the sync lease"""
+    client = await google_client.get_client("gmail")
+    if not client:
+        return None
+    state = await _acquire_lease()
+    if not state:
+        return None
+    update = {"lease_until": None}
+    try:
+        if state.get("history_id") and state.get("connected_at") == client.connected_at:
+            try:
+                result = await incremental_sync(client, state["history_id"])
+            except HttpError as e:
+                if e.resp.status != 404:
+                    raise
+                logger.warning("Gmail historyId expired; running a full sync")
+                result = await full_sync(client)
+        else:
+            result = await full_sync(client)
+        update.update(result)
+        update.update({"connected_at": client.connected_at, "last_sync_at": datetime.now(timezone.utc), "last_error": None})
+        return update
+    except Exception as e:
+        update["last_error"] = str(e)
+        raise
+    finally:
+        await db[STATE_COLLECTION].update_one({"service": "gmail", "owner": _owner}, {"$set": update})
+
+async def _sync_loop():
+    while True:
+        try:
+            await sync()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Gmail sync failed: {str(e)}")
+        await asyncio.sleep(SYNC_SECONDS)
+
+def start():
+    """Start the background sync worker in the running event loop"""
+    global _worker
+    if _worker is None:
+        _worker = asyncio.create_task(_sync_loop())
+
+async def stop():
+    global _worker
+    if _worker:
+        _worker.cancel()
+        await asyncio.gather(_worker, return_exceptions=True)
+        _worker = None
+
+# ==================== READS ====================
+
+async def get_state() -> Optional[dict]:
+    return await db[STATE_COLLECTION].find_one({"service": "gmail"}, {"_id": 0})
+
+async def is_ready() -> bool:
+    """Whether the mirror has completed a sync for the connected account"""
+    client = await google_client.get_client("gmail")
+    state = await get_state()
+    return bool(client and state and state.get("history_id") and state.get("connected_at") == client.connected_at)
+
+def build_query(label: Optional[str] = None, sender: Optional[str] = None, text: Optional[str] = None,
+                after: Optional[datetime] = None, before: Optional[datetime] = None) -> dict:
+    query = {}
+    if label:
+        query["labels"] = label
+    if sender:
+        query["from_address"] = sender.strip().lower()
+    if after or before:
+        query["received_at"] = {}
+        if after:
+            query["received_at"]["$gte"] = after
+        if before:
+            query["received_at"]["$lt"] = before
+    if text:
+        query["$text"] = {"$search": text}
+    return query
+
+async def list_messages(label: Optional[str] = "INBOX", sender: Optional[str] = None, text: Optional[str] = None,
+                        after: Optional[datetime] = None, before: Optional[datetime] = None,
+                        limit: Optional[int] = None, cursor: Optional[str] = None) -> dict:
+    """Newest mirrored messages first (keyset paginated), without bodies"""
+    return await paginate(
+        COLLECTION,
+        build_query(label, sender, text, after, before),
+        sort_key="received_at",
+        limit=limit,
+        cursor=cursor,
+        projection={"_id": 0, "body": 0, "synced_at": 0}
+    )
+
+async def get_message(client, message_id: str) -> dict:
+    """Mirrored message with its body, fetched from Gmail and stored on first read"""
+    message = await db[COLLECTION].find_one({"id": message_id}, {"_id": 0})
+    if message and "body" in message:
+        return message
+    full = await client.execute(client.service.users().messages().get(userId='me', id=message_id, format='full'))
+    message = {
+        **_document(gmail_metadata.summarize(full)),
+        "body": extract_body(full.get('payload', {})),
+        "body_fetched_at": datetime.now(timezone.utc)
+    }
+    if not SKIP_LABELS.intersection(message["labels"]):
+        await db[COLLECTION].update_one({"id": message_id}, {"$set": message}, upsert=True)
+    return message
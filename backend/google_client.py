@@ -0,0 +1,177 @@
+"""
+Google Client - Non-blocking access to the Gmail and Drive APIs
+- googleapiclient is synchronous; every call runs on a dedicated bounded thread pool
+  (GOOGLE_API_WORKERS) so a Google round-trip never blocks the event loop
+- Service objects are built once per connected account from the bundled static
+  discovery documents and reused across requests
+- httplib2 connections are not thread-safe, so each pool thread gets its own
+  authorized Http, passed to every execute()
+- Access tokens are refreshed in the background before they expire (and inline if
+  one is found expiring), and written back to db.google_credentials
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+from googleapiclient.discovery import build
+from google.oauth2.credentials import Credentials
+from google.auth.transport.requests import Request as GoogleRequest
+from google_auth_httplib2 import AuthorizedHttp
+import asyncio
+import functools
+import httplib2
+import logging
+import os
+import threading
+import time
+
+db = None
+logger = logging.getLogger(__name__)
+
+GOOGLE_API_WORKERS = int(os.environ.get('GOOGLE_API_WORKERS', '8'))
+GOOGLE_API_TIMEOUT = float(os.environ.get('GOOGLE_API_TIMEOUT_SECONDS', '30'))
+# Tokens are refreshed once they are this close to expiry
+REFRESH_MARGIN_SECONDS = float(os.environ.get('GOOGLE_TOKEN_REFRESH_MARGIN_SECONDS', '300'))
+REFRESH_CHECK_SECONDS = float(os.environ.get('GOOGLE_TOKEN_REFRESH_CHECK_SECONDS', '60'))
+# Cached clients re-check their credentials document (reconnects in other processes)
+CLIENT_TTL = float(os.environ.get('GOOGLE_CLIENT_TTL_SECONDS', '300'))
+
+# service -> (API name, version)
+SERVICES = {"gmail": ("gmail", "v1"), "drive": ("drive", "v3")}
+
+_executor = ThreadPoolExecutor(max_workers=GOOGLE_API_WORKERS, thread_name_prefix="google-api")
+_refresher: Optional[asyncio.Task] = None
+
+def set_database(database):
+    """Set the database instance from main server"""
+    global db
+    db = database
+
+async def run(fn, *args, **kwargs):
+    """Run a blocking Google call on the Google API thread pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(fn, *args, **kwargs))
+
+def _parse_expiry(value) -> Optional[datetime]:
+    # google-auth compares expiry against naive UTC
+    if not value:
+        return None
+    expiry = value if isinstance(value, datetime) else datetime.fromisoformat(value)
+    if expiry.tzinfo:
+        expiry = expiry.astimezone(timezone.utc).replace(tzinfo=None)
+    return expiry
+
+def credentials_from_doc(creds_doc: dict) -> Credentials:
+    return Credentials(
+        token=creds_doc["access_token"],
+        refresh_token=creds_doc.get("refresh_token"),
+        token_uri=creds_doc["token_uri"],
+        client_id=creds_doc["client_id"],
+        client_secret=creds_doc["client_secret"],
+        scopes=creds_doc.get("scopes", []),
+        expiry=_parse_expiry(creds_doc.get("expiry"))
+    )
+
+class GoogleClient:
+    """A built service plus the credentials behind it, for one connected account"""
+
+    def __init__(self, service_name: str, creds_doc: dict):
+        api, version = SERVICES[service_name]
+        self.service_name = service_name
+        self.connected_at = creds_doc.get("connected_at")
+        self.credentials = credentials_from_doc(creds_doc)
+        self.service = build(api, version, credentials=self.credentials,
+                             static_discovery=True, cache_discovery=False)
+        self.checked_at = time.monotonic()
+        self._refresh_lock = asyncio.Lock()
+        # One authorized connection per pool thread, dropped with the client
+        self._local = threading.local()
+
+    def needs_refresh(self) -> bool:
+        if not self.credentials.refresh_token:
+            return False
+        expiry = self.credentials.expiry
+        if expiry is None:
+            return not self.credentials.token
+        remaining = expiry - datetime.now(timezone.utc).replace(tzinfo=None)
+        return remaining < timedelta(seconds=REFRESH_MARGIN_SECONDS)
+
+    async def refresh(self, force: bool = False):
+        """Refresh the access token (once, however many callers ask) and persist it"""
+        async with self._refresh_lock:
+            if not force and not self.needs_refresh():
+                return
+            await run(self.credentials.refresh, GoogleRequest())
+            await db.google_credentials.update_one(
+                {"service": self.service_name},
+                {"$set": {
+                    "access_token": self.credentials.token,
+                    "expiry": self.credentials.expiry.isoformat() if self.credentials.expiry else None
+                }}
+            )
+            logger.info(f"Refreshed Google {self.service_name} access token")
+
+    def _http(self) -> AuthorizedHttp:
+        http = getattr(self._local, "http", None)
+        if http is None:
+            http = self._local.http = AuthorizedHttp(self.credentials, http=httplib2.Http(timeout=GOOGLE_API_TIMEOUT))
+        return http
+
+    def _execute(self, request, **kwargs):
+        return request.execute(http=self._http(), **kwargs)
+
+    async def execute(self, request, **kwargs):
+        """Execute a googleapiclient request (or batch) off the event loop"""
+        if self.needs_refresh():
+            await self.refresh()
+        return await run(self._execute, request, **kwargs)
+
+# service -> cached client
+_clients: Dict[str, GoogleClient] = {}
+
+async def get_client(service_name: str) -> Optional[GoogleClient]:
+    """Cached client for a connected service; None if it isn't connected"""
+    client = _clients.get(service_name)
+    if client and client.checked_at + CLIENT_TTL > time.monotonic():
+        return client
+    creds_doc = await db.google_credentials.find_one({"service": service_name}, {"_id": 0})
+    if not creds_doc:
+        _clients.pop(service_name, None)
+        return None
+    if client and client.connected_at == creds_doc.get("connected_at"):
+        client.checked_at = time.monotonic()
+        return client
+    client = await run(GoogleClient, service_name, creds_doc)
+    _clients[service_name] = client
+    return client
+
+def invalidate(service_name: str):
+    """Drop a cached client (after the account is reconnected)"""
+    _clients.pop(service_name, None)
+
+# ==================== TOKEN REFRESH ====================
+
+async def _refresh_loop():
+    while True:
+        await asyncio.sleep(REFRESH_CHECK_SECONDS)
+        for client in list(_clients.values()):
+            if not client.needs_refresh():
+                continue
+            try:
+                await client.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Google {client.service_name} token refresh failed: {str(e)}")
+
+def start():
+    """Start the background token refresher in the running event loop"""
+    global _refresher
+    if _refresher is None:
+        _refresher = asyncio.create_task(_refresh_loop())
+
+async def stop():
+    global _refresher
+    if _refresher:
+        _refresher.cancel()
+        await asyncio.gather(_refresher, return_exceptions=True)
+        _refresher = None
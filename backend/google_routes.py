@@ -2,17 +2,22 @@
 Google Integration Routes - Gmail and Google Drive for Admin Panel
 Allows admin to connect Gmail and Google Drive for communications management
 """
-from fastapi import APIRouter, HTTPException, Query, UploadFile, File
+from fastapi import APIRouter, HTTPException, Query, UploadFile, File, Body, Depends
 from fastapi.responses import RedirectResponse, StreamingResponse
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaFileUpload, MediaIoBaseDownload
 from google_auth_oauthlib.flow import Flow
-from google.oauth2.credentials import Credentials
-from google.auth.transport.requests import Request as GoogleRequest
 from datetime import datetime, timezone
 from typing import List, Optional
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from jinja2 import TemplateNotFound, TemplateSyntaxError
+from date_ranges import parse_datetime
+from admin_management_routes import verify_admin_token
+import email_templates
+import gmail_metadata
+import gmail_sync
+import google_client
 import base64
 import os
 import io
@@ -120,12 +125,12 @@ async def gmail_callback(code: str = Query(...), state: str = Query(...)):
             redirect_uri=redirect_uri
         )
         
-        flow.fetch_token(code=code)
+        await google_client.run(flow.fetch_token, code=code)
         credentials = flow.credentials
         
         # Get user email from Gmail
-        gmail_service = build('gmail', 'v1', credentials=credentials)
-        profile = gmail_service.users().getProfile(userId='me').execute()
+        gmail_service = build('gmail', 'v1', credentials=credentials, static_discovery=True)
+        profile = await google_client.run(gmail_service.users().getProfile(userId='me').execute)
         user_email = profile.get('emailAddress', '')
         
         # Store credentials
@@ -146,6 +151,7 @@ async def gmail_callback(code: str = Query(...), state: str = Query(...)):
             upsert=True
         )
         
+        google_client.invalidate("gmail")
         logger.info(f"Gmail connected successfully: {user_email}")
         
         # Redirect to admin dashboard
@@ -171,33 +177,12 @@ async def get_gmail_status():
         logger.error(f"Error checking Gmail status: {str(e)}")
         return {"connected": False, "error": str(e)}
 
-async def get_gmail_service():
-    """Get authenticated Gmail service"""
-    creds_doc = await db.google_credentials.find_one({"service": "gmail"})
-    if not creds_doc:
+async def get_gmail_service() -> google_client.GoogleClient:
+    """Get authenticated Gmail client (cached; calls run off the event loop)"""
+    client = await google_client.get_client("gmail")
+    if not client:
         raise HTTPException(status_code=400, detail="Gmail not connected")
-    
-    creds = Credentials(
-        token=creds_doc["access_token"],
-        refresh_token=creds_doc.get("refresh_token"),
-        token_uri=creds_doc["token_uri"],
-        client_id=creds_doc["client_id"],
-        client_secret=creds_doc["client_secret"],
-        scopes=creds_doc.get("scopes", [])
-    )
-    
-    # Auto-refresh if expired
-    if creds.expired and creds.refresh_token:
-        creds.refresh(GoogleRequest())
-        await db.google_credentials.update_one(
-            {"service": "gmail"},
-            {"$set": {
-                "access_token": creds.token,
-                "expiry": creds.expiry.isoformat() if creds.expiry else None
-            }}
-        )
-    
-    return build('gmail', 'v1', credentials=creds)
+    return client
 
 @router.post("/google/gmail/send")
 async def send_gmail(
@@ -208,7 +193,7 @@ async def send_gmail(
 ):
     """Send email via Gmail"""
     try:
-        service = await get_gmail_service()
+        client = await get_gmail_service()
         
         message = MIMEMultipart('alternative')
         message['to'] = to
@@ -220,10 +205,10 @@ async def send_gmail(
         
         raw = base64.urlsafe_b64encode(message.as_bytes()).decode()
         
-        result = service.users().messages().send(
+        result = await client.execute(client.service.users().messages().send(
             userId='me',
             body={'raw': raw}
-        ).execute()
+        ))
         
         # Log the email
         await db.email_logs.insert_one({
@@ -241,87 +226,108 @@ async def send_gmail(
         raise HTTPException(status_code=500, detail=f"Failed to send email: {str(e)}")
 
 @router.get("/google/gmail/inbox")
-async def get_gmail_inbox(max_results: int = 20, query: str = ""):
-    """Get emails from Gmail inbox"""
+async def get_gmail_inbox(
+    max_results: int = 20,
+    query: str = "",
+    label: Optional[str] = "INBOX",
+    sender: Optional[str] = None,
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+    cursor: Optional[str] = None,
+    live: bool = False
+):
+    """Get emails from the local Gmail mirror (indexed label/sender/date/text filters);
+    `live=true`, or a mirror that hasn't synced yet, queries Gmail directly"""
     try:
-        service = await get_gmail_service()
+        client = await get_gmail_service()
+        
+        if not live and await gmail_sync.is_ready():
+            after_dt, before_dt = parse_datetime(after), parse_datetime(before)
+            if (after and not after_dt) or (before and not before_dt):
+                raise HTTPException(status_code=400, detail="Invalid date filter")
+            page = await gmail_sync.list_messages(
+                label=label, sender=sender, text=query or None,
+                after=after_dt, before=before_dt, limit=max_results, cursor=cursor
+            )
+            return {"emails": page["items"], "total": len(page["items"]), "next_cursor": page["next_cursor"], "source": "mirror"}
         
-        results = service.users().messages().list(
+        results = await client.execute(client.service.users().messages().list(
             userId='me',
             maxResults=max_results,
             q=query if query else "in:inbox"
-        ).execute()
+        ))
         
-        messages = results.get('messages', [])
-        email_list = []
+        # One batched request for the ids not already cached
+        message_ids = [msg['id'] for msg in results.get('messages', [])[:max_results]]
+        summaries = await gmail_metadata.fetch_metadata(client, message_ids)
+        email_list = [summaries[message_id] for message_id in message_ids if message_id in summaries]
         
-        for msg in messages[:max_results]:
-            msg_data = service.users().messages().get(
-                userId='me',
-                id=msg['id'],
-                format='metadata',
-                metadataHeaders=['From', 'Subject', 'Date']
-            ).execute()
-            
-            headers = {h['name']: h['value'] for h in msg_data.get('payload', {}).get('headers', [])}
-            
-            email_list.append({
-                "id": msg['id'],
-                "from": headers.get('From', 'Unknown'),
-                "subject": headers.get('Subject', 'No Subject'),
-                "date": headers.get('Date', ''),
-                "snippet": msg_data.get('snippet', ''),
-                "labels": msg_data.get('labelIds', [])
-            })
-        
-        return {"emails": email_list, "total": len(email_list)}
+        return {"emails": email_list, "total": len(email_list), "source": "live"}
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to fetch inbox: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch inbox: {str(e)}")
 
 @router.get("/google/gmail/message/{message_id}")
-async def get_gmail_message(message_id: str):
-    """Get full email message"""
+async def get_gmail_message(message_id: str, live: bool = False):
+    """Get full email message (body fetched once, then served from the mirror)"""
     try:
-        service = await get_gmail_service()
+        client = await get_gmail_service()
         
-        message = service.users().messages().get(
-            userId='me',
-            id=message_id,
-            format='full'
-        ).execute()
-        
-        headers = {h['name']: h['value'] for h in message.get('payload', {}).get('headers', [])}
-        
-        # Extract body
-        body = ""
-        payload = message.get('payload', {})
-        
-        if 'body' in payload and payload['body'].get('data'):
-            body = base64.urlsafe_b64decode(payload['body']['data']).decode('utf-8')
-        elif 'parts' in payload:
-            for part in payload['parts']:
-                if part.get('mimeType') == 'text/html' and part.get('body', {}).get('data'):
-                    body = base64.urlsafe_b64decode(part['body']['data']).decode('utf-8')
-                    break
-                elif part.get('mimeType') == 'text/plain' and part.get('body', {}).get('data'):
-                    body = base64.urlsafe_b64decode(part['body']['data']).decode('utf-8')
+        if live:
+            message = await client.execute(client.service.users().messages().get(
+                userId='me',
+                id=message_id,
+                format='full'
+            ))
+            message = {**gmail_metadata.summarize(message), "body": gmail_sync.extract_body(message.get('payload', {}))}
+        else:
+            message = await gmail_sync.get_message(client, message_id)
         
         return {
             "id": message_id,
-            "from": headers.get('From', ''),
-            "to": headers.get('To', ''),
-            "subject": headers.get('Subject', ''),
-            "date": headers.get('Date', ''),
-            "body": body,
-            "labels": message.get('labelIds', [])
+            "from": message["from"],
+            "to": message["to"],
+            "subject": message["subject"],
+            "date": message["date"],
+            "body": message["body"],
+            "labels": message["labels"]
         }
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to get message: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to get message: {str(e)}")
 
+@router.get("/google/gmail/sync")
+async def get_gmail_sync_status():
+    """State of the local Gmail mirror"""
+    try:
+        state = await gmail_sync.get_state() or {}
+        state.pop("owner", None)
+        return {"ready": await gmail_sync.is_ready(), **state}
+    except Exception as e:
+        logger.error(f"Failed to get Gmail sync status: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to get Gmail sync status: {str(e)}")
+
+@router.post("/google/gmail/sync")
+async def run_gmail_sync():
+    """Sync the local Gmail mirror now (full on first run, incremental after)"""
+    try:
+        await get_gmail_service()
+        result = await gmail_sync.sync()
+        if result is None:
+            raise HTTPException(status_code=409, detail="A Gmail sync is already running")
+        return {"success": True, "added": result["added"], "deleted": result["deleted"], "history_id": result["history_id"]}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Gmail sync failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Gmail sync failed: {str(e)}")
+
 # ==================== GOOGLE DRIVE INTEGRATION ====================
 
 @router.get("/google/drive/connect")
@@ -385,7 +391,7 @@ async def drive_callback(code: str = Query(...), state: str = Query(...)):
             redirect_uri=redirect_uri
         )
         
-        flow.fetch_token(code=code)
+        await google_client.run(flow.fetch_token, code=code)
         credentials = flow.credentials
         
         # Get user info
@@ -409,6 +415,7 @@ async def drive_callback(code: str = Query(...), state: str = Query(...)):
             upsert=True
         )
         
+        google_client.invalidate("drive")
         logger.info("Google Drive connected successfully")
         return RedirectResponse(url=f"{FRONTEND_URL}/admin/dashboard?drive_connected=true")
     
@@ -430,46 +437,26 @@ async def get_drive_status():
     except Exception as e:
         return {"connected": False, "error": str(e)}
 
-async def get_drive_service():
-    """Get authenticated Drive service"""
-    creds_doc = await db.google_credentials.find_one({"service": "drive"})
-    if not creds_doc:
+async def get_drive_service() -> google_client.GoogleClient:
+    """Get authenticated Drive client (cached; calls run off the event loop)"""
+    client = await google_client.get_client("drive")
+    if not client:
         raise HTTPException(status_code=400, detail="Google Drive not connected")
-    
-    creds = Credentials(
-        token=creds_doc["access_token"],
-        refresh_token=creds_doc.get("refresh_token"),
-        token_uri=creds_doc["token_uri"],
-        client_id=creds_doc["client_id"],
-        client_secret=creds_doc["client_secret"],
-        scopes=creds_doc.get("scopes", [])
-    )
-    
-    if creds.expired and creds.refresh_token:
-        creds.refresh(GoogleRequest())
-        await db.google_credentials.update_one(
-            {"service": "drive"},
-            {"$set": {
-                "access_token": creds.token,
-                "expiry": creds.expiry.isoformat() if creds.expiry else None
-            }}
-        )
-    
-    return build('drive', 'v3', credentials=creds)
+    return client
 
 @router.get("/google/drive/files")
 async def list_drive_files(folder_id: str = "root", page_size: int = 20):
     """List files in Google Drive"""
     try:
-        service = await get_drive_service()
+        client = await get_drive_service()
         
         query = f"'{folder_id}' in parents and trashed = false"
         
-        results = service.files().list(
+        results = await client.execute(client.service.files().list(
             q=query,
             pageSize=page_size,
             fields="files(id, name, mimeType, size, createdTime, modifiedTime, webViewLink, iconLink, parents)"
-        ).execute()
+        ))
         
         files = results.get('files', [])
         
@@ -487,7 +474,7 @@ async def list_drive_files(folder_id: str = "root", page_size: int = 20):
 async def create_drive_folder(name: str, parent_id: str = "root"):
     """Create folder in Google Drive"""
     try:
-        service = await get_drive_service()
+        client = await get_drive_service()
         
         file_metadata = {
             'name': name,
@@ -495,10 +482,10 @@ async def create_drive_folder(name: str, parent_id: str = "root"):
             'parents': [parent_id]
         }
         
-        folder = service.files().create(
+        folder = await client.execute(client.service.files().create(
             body=file_metadata,
             fields='id, name, webViewLink'
-        ).execute()
+        ))
         
         return {"success": True, "folder": folder}
     
@@ -514,7 +501,7 @@ async def upload_to_drive(
 ):
     """Upload file to Google Drive"""
     try:
-        service = await get_drive_service()
+        client = await get_drive_service()
         
         # Save to temp file
         with tempfile.NamedTemporaryFile(delete=False) as tmp:
@@ -535,11 +522,11 @@ async def upload_to_drive(
                 resumable=True
             )
             
-            uploaded = service.files().create(
+            uploaded = await client.execute(client.service.files().create(
                 body=file_metadata,
                 media_body=media,
                 fields='id, name, webViewLink, size'
-            ).execute()
+            ))
             
             return {"success": True, "file": uploaded}
         
@@ -554,7 +541,7 @@ async def upload_to_drive(
 async def share_drive_file(file_id: str, email: str, role: str = "reader"):
     """Share file with a user"""
     try:
-        service = await get_drive_service()
+        client = await get_drive_service()
         
         permission = {
             'type': 'user',
@@ -562,11 +549,11 @@ async def share_drive_file(file_id: str, email: str, role: str = "reader"):
             'emailAddress': email
         }
         
-        result = service.permissions().create(
+        result = await client.execute(client.service.permissions().create(
             fileId=file_id,
             body=permission,
             sendNotificationEmail=True
-        ).execute()
+        ))
         
         return {"success": True, "permission_id": result.get('id')}
     
@@ -578,8 +565,8 @@ async def share_drive_file(file_id: str, email: str, role: str = "reader"):
 async def delete_drive_file(file_id: str):
     """Delete file from Google Drive"""
     try:
-        service = await get_drive_service()
-        service.files().delete(fileId=file_id).execute()
+        client = await get_drive_service()
+        await client.execute(client.service.files().delete(fileId=file_id))
         return {"success": True}
     
     except Exception as e:
@@ -588,88 +575,11 @@ async def delete_drive_file(file_id: str):
 
 # ==================== EMAIL TEMPLATES ====================
 
-DEFAULT_TEMPLATES = [
-    {
-        "id": "welcome",
-        "name": "Welcome Email",
-        "subject": "Welcome to Sanjaya Program",
-        "body_html": """
-        <div style="font-family: 'Nunito', Arial, sans-serif; max-width: 600px; margin: 0 auto;">
-            <div style="background: linear-gradient(135deg, #f97316, #ec4899); padding: 30px; text-align: center; border-radius: 12px 12px 0 0;">
-                <h1 style="color: white; margin: 0;">Welcome to Sanjaya! 🌟</h1>
-            </div>
-            <div style="padding: 30px; background: #fff;">
-                <p>Dear {{name}},</p>
-                <p>We are thrilled to welcome you to the Sanjaya family! Our emotional support program is designed to help children grow, express, and thrive.</p>
-                <p>Here's what you can expect:</p>
-                <ul>
-                    <li>Regular sessions with trained observers</li>
-                    <li>Progress reports and insights</li>
-                    <li>Resources for emotional well-being</li>
-                </ul>
-                <p>If you have any questions, feel free to reach out!</p>
-                <p>Warm regards,<br>The Sanjaya Team</p>
-            </div>
-        </div>
-        """
-    },
-    {
-        "id": "session_reminder",
-        "name": "Session Reminder",
-        "subject": "Upcoming Session Reminder - {{child_name}}",
-        "body_html": """
-        <div style="font-family: 'Nunito', Arial, sans-serif; max-width: 600px; margin: 0 auto;">
-            <div style="background: linear-gradient(135deg, #6366f1, #8b5cf6); padding: 30px; text-align: center; border-radius: 12px 12px 0 0;">
-                <h1 style="color: white; margin: 0;">Session Reminder 📅</h1>
-            </div>
-            <div style="padding: 30px; background: #fff;">
-                <p>Dear {{parent_name}},</p>
-                <p>This is a friendly reminder about {{child_name}}'s upcoming session:</p>
-                <div style="background: #f3f4f6; padding: 20px; border-radius: 8px; margin: 20px 0;">
-                    <p><strong>Date:</strong> {{session_date}}</p>
-                    <p><strong>Time:</strong> {{session_time}}</p>
-                    <p><strong>Observer:</strong> {{observer_name}}</p>
-                </div>
-                <p>Please ensure {{child_name}} is ready for the session.</p>
-                <p>Best regards,<br>The Sanjaya Team</p>
-            </div>
-        </div>
-        """
-    },
-    {
-        "id": "report_ready",
-        "name": "Report Ready",
-        "subject": "New Report Available for {{child_name}}",
-        "body_html": """
-        <div style="font-family: 'Nunito', Arial, sans-serif; max-width: 600px; margin: 0 auto;">
-            <div style="background: linear-gradient(135deg, #10b981, #14b8a6); padding: 30px; text-align: center; border-radius: 12px 12px 0 0;">
-                <h1 style="color: white; margin: 0;">Report Ready! 📊</h1>
-            </div>
-            <div style="padding: 30px; background: #fff;">
-                <p>Dear {{parent_name}},</p>
-                <p>A new {{report_type}} report is now available for {{child_name}}.</p>
-                <p>You can view the report by logging into your parent portal.</p>
-                <div style="text-align: center; margin: 30px 0;">
-                    <a href="{{portal_link}}" style="background: #10b981; color: white; padding: 12px 30px; border-radius: 8px; text-decoration: none;">View Report</a>
-                </div>
-                <p>Best regards,<br>The Sanjaya Team</p>
-            </div>
-        </div>
-        """
-    }
-]
-
 @router.get("/google/templates")
 async def get_email_templates():
     """Get all email templates"""
     try:
-        templates = await db.email_templates.find({}, {"_id": 0}).to_list(100)
-        if not templates:
-            # Initialize with default templates
-            for tpl in DEFAULT_TEMPLATES:
-                await db.email_templates.insert_one(tpl)
-            templates = DEFAULT_TEMPLATES
-        return {"templates": templates}
+        return {"templates": await email_templates.list_templates()}
     
     except Exception as e:
         logger.error(f"Failed to get templates: {str(e)}")
@@ -680,26 +590,31 @@ async def create_email_template(
     template_id: str,
     name: str,
     subject: str,
-    body_html: str
+    body_html: str,
+    current_user: dict = Depends(verify_admin_token)
 ):
     """Create or update email template"""
     try:
-        template = {
-            "id": template_id,
-            "name": name,
-            "subject": subject,
-            "body_html": body_html,
-            "updated_at": datetime.now(timezone.utc).isoformat()
-        }
-        
-        await db.email_templates.update_one(
-            {"id": template_id},
-            {"$set": template},
-            upsert=True
-        )
+        template = await email_templates.save_template(template_id, name, subject, body_html)
         
         return {"success": True, "template": template}
     
+    except TemplateSyntaxError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid template: {str(e)}")
     except Exception as e:
         logger.error(f"Failed to save template: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to save template: {str(e)}")
+
+@router.post("/google/templates/{template_id}/send")
+async def send_template_email(
+    template_id: str,
+    to: str,
+    context: dict = Body(default={}),
+    current_user: dict = Depends(verify_admin_token)
+):
+    """Render a template with `context` and send it via Gmail"""
+    try:
+        subject, body_html = await email_templates.render(template_id, context)
+    except TemplateNotFound:
+        raise HTTPException(status_code=404, detail="Template not found")
+    return await send_gmail(to=to, subject=subject, body_html=body_html)
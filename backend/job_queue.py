@@ -0,0 +1,292 @@
+"""
+Job Queue - Persistent background jobs for slow work (AI analysis) off the request path
+- Jobs live in db.ai_jobs, one per (type, ref_id); enqueueing is idempotent
+- Workers claim jobs with an atomic find_one_and_update and hold a lease, so a job
+  whose worker died is picked up again once the lease expires
+- Failures retry with exponential backoff up to AI_JOB_MAX_ATTEMPTS, then park as "failed"
+- A bounded asyncio worker pool per process (AI_JOB_WORKERS)
+- Periodic sweeps re-enqueue work that was never queued (e.g. rows written before
+  the queue existed)
+- Job types with a batch handler are claimed several at a time and processed in one
+  call; each job is still settled (retried/failed) on its own. Jobs the batch handler
+  hands back with RUN_SINGLY then go through the single-job handler, each with a
+  renewed lease and its own LEASE_SECONDS budget
+
+Handlers are registered per job type with register(); start()/stop() are wired to
+the server lifecycle.
+"""
+from pymongo import ReturnDocument
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from status_counts import count_by_status
+import asyncio
+import logging
+import os
+import uuid
+
+db = None
+logger = logging.getLogger(__name__)
+
+COLLECTION = "ai_jobs"
+WORKERS = int(os.environ.get('AI_JOB_WORKERS', '2'))
+MAX_ATTEMPTS = int(os.environ.get('AI_JOB_MAX_ATTEMPTS', '5'))
+LEASE_SECONDS = float(os.environ.get('AI_JOB_LEASE_SECONDS', '300'))
+POLL_SECONDS = float(os.environ.get('AI_JOB_POLL_SECONDS', '2'))
+BACKOFF_SECONDS = float(os.environ.get('AI_JOB_BACKOFF_SECONDS', '30'))
+MAX_BACKOFF_SECONDS = float(os.environ.get('AI_JOB_MAX_BACKOFF_SECONDS', '3600'))
+SWEEP_SECONDS = float(os.environ.get('AI_JOB_SWEEP_SECONDS', '600'))
+
+JOB_STATUSES = ["queued", "running", "done", "failed"]
+
+# job type -> async handler(ref_id) / async on_failed(ref_id, error)
+_handlers: Dict[str, Callable[[str], Awaitable[None]]] = {}
+_failure_hooks: Dict[str, Callable[[str, str], Awaitable[None]]] = {}
+# job type -> (async batch_handler(ref_ids) -> {ref_id: error or None}, max batch size)
+_batch_handlers: Dict[str, Tuple[Callable[[List[str]], Awaitable[Dict[str, Optional[str]]]], int]] = {}
+_sweeps: List[Callable[[], Awaitable[int]]] = []
+# Batch handler result for a ref_id that should be retried through the single-job handler
+RUN_SINGLY = object()
+_workers: List[asyncio.Task] = []
+_wakeup: Optional[asyncio.Event] = None
+_worker_prefix = uuid.uuid4().hex[:8]
+
+def set_database(database):
+    """Set the database instance from main server"""
+    global db
+    db = database
+
+def register(
+    job_type: str,
+    handler: Callable[[str], Awaitable[None]],
+    on_failed: Optional[Callable[[str, str], Awaitable[None]]] = None,
+    batch_handler: Optional[Callable[[List[str]], Awaitable[Dict[str, Optional[str]]]]] = None,
+    batch_size: int = 1
+):
+    """Register the coroutine that processes jobs of `job_type`; `on_failed` runs once
+    retries are exhausted. With `batch_handler`, up to `batch_size` due jobs are handed
+    over together; it returns an error message, None or RUN_SINGLY per ref_id."""
+    _handlers[job_type] = handler
+    if on_failed:
+        _failure_hooks[job_type] = on_failed
+    if batch_handler and batch_size > 1:
+        _batch_handlers[job_type] = (batch_handler, batch_size)
+    else:
+        _batch_handlers.pop(job_type, None)
+
+def add_sweep(sweep: Callable[[], Awaitable[int]]):
+    """Register a catch-up coroutine run at start() and every SWEEP_SECONDS"""
+    _sweeps.append(sweep)
+
+def backoff(attempts: int) -> float:
+    """Seconds to wait before retry number `attempts` (1-based)"""
+    return min(BACKOFF_SECONDS * (2 ** max(attempts - 1, 0)), MAX_BACKOFF_SECONDS)
+
+# ==================== PRODUCERS ====================
+
+async def enqueue(job_type: str, ref_id: str, requeue: bool = False) -> dict:
+    """Queue a job for `ref_id`. No-op if one already exists, unless `requeue` resets a
+    finished or failed job."""
+    now = datetime.now(timezone.utc)
+    job = await db[COLLECTION].find_one_and_update(
+        {"type": job_type, "ref_id": ref_id},
+        {"$setOnInsert": {
+            "id": str(uuid.uuid4()),
+            "type": job_type,
+            "ref_id": ref_id,
+            "status": "queued",
+            "attempts": 0,
+            "run_after": now,
+            "lease_until": None,
+            "last_error": None,
+            "created_at": now,
+            "updated_at": now
+        }},
+        upsert=True,
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    if requeue and job["status"] in ("done", "failed"):
+        job = await db[COLLECTION].find_one_and_update(
+            {"id": job["id"], "status": job["status"]},
+            {"$set": {"status": "queued", "attempts": 0, "run_after": now, "last_error": None, "updated_at": now}},
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        ) or job
+    if _wakeup:
+        _wakeup.set()
+    return job
+
+async def get_job(job_type: str, ref_id: str) -> Optional[dict]:
+    return await db[COLLECTION].find_one({"type": job_type, "ref_id": ref_id}, {"_id": 0})
+
+# ==================== WORKERS ====================
+
+async def claim(worker_id: str, job_type: Optional[str] = None) -> Optional[dict]:
+    """Atomically lease the next due job (queued, or running with an expired lease)"""
+    now = datetime.now(timezone.utc)
+    return await db[COLLECTION].find_one_and_update(
+        {
+            "type": job_type if job_type else {"$in": list(_handlers)},
+            "$or": [
+                {"status": "queued", "run_after": {"$lte": now}},
+                {"status": "running", "lease_until": {"$lt": now}}
+            ]
+        },
+        {
+            "$set": {
+                "status": "running",
+                "worker_id": worker_id,
+                "lease_until": now + timedelta(seconds=LEASE_SECONDS),
+                "updated_at": now
+            },
+            "$inc": {"attempts": 1}
+        },
+        sort=[("run_after", 1)],
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+
+async def _finish(job: dict, error: Optional[str] = None):
+    now = datetime.now(timezone.utc)
+    if error is None:
+        update = {"status": "done", "lease_until": None, "last_error": None, "completed_at": now}
+    elif job["attempts"] >= MAX_ATTEMPTS:
+        update = {"status": "failed", "lease_until": None, "last_error": error}
+    else:
+        update = {
+            "status": "queued",
+            "lease_until": None,
+            "last_error": error,
+            "run_after": now + timedelta(seconds=backoff(job["attempts"]))
+        }
+    update["updated_at"] = now
+    # Only the lease holder may settle the job
+    result = await db[COLLECTION].update_one({"id": job["id"], "worker_id": job["worker_id"]}, {"$set": update})
+    if result.modified_count and update["status"] == "failed" and job["type"] in _failure_hooks:
+        try:
+            await _failure_hooks[job["type"]](job["ref_id"], error)
+        except Exception as e:
+            logger.error(f"Failure hook for {job['type']}:{job['ref_id']} error: {str(e)}")
+    return update["status"]
+
+async def run_job(job: dict) -> str:
+    """Run one claimed job through its handler and settle it; returns the new status"""
+    handler = _handlers[job["type"]]
+    try:
+        await asyncio.wait_for(handler(job["ref_id"]), timeout=LEASE_SECONDS)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        error = str(e) or type(e).__name__
+        status = await _finish(job, error)
+        logger.warning(f"Job {job['type']}:{job['ref_id']} attempt {job['attempts']} failed ({status}): {error}")
+        return status
+    return await _finish(job)
+
+async def claim_batch(worker_id: str, job: dict) -> List[dict]:
+    """Lease more due jobs of `job`'s type, up to its batch size"""
+    jobs = [job]
+    _, size = _batch_handlers[job["type"]]
+    while len(jobs) < size:
+        more = await claim(worker_id, job["type"])
+        if not more:
+            break
+        jobs.append(more)
+    return jobs
+
+async def _renew_lease(job: dict) -> bool:
+    """Extend a held lease by LEASE_SECONDS; False if the job is no longer ours"""
+    now = datetime.now(timezone.utc)
+    result = await db[COLLECTION].update_one(
+        {"id": job["id"], "worker_id": job["worker_id"], "status": "running"},
+        {"$set": {"lease_until": now + timedelta(seconds=LEASE_SECONDS), "updated_at": now}}
+    )
+    return bool(result.modified_count)
+
+async def run_batch(jobs: List[dict]) -> Dict[str, str]:
+    """Run claimed jobs of one type through its batch handler and settle each;
+    returns the new status per ref_id. A handler exception fails the whole batch;
+    jobs returned as RUN_SINGLY are then run one by one."""
+    handler, _ = _batch_handlers[jobs[0]["type"]]
+    try:
+        errors = await asyncio.wait_for(handler([job["ref_id"] for job in jobs]), timeout=LEASE_SECONDS)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        error = str(e) or type(e).__name__
+        logger.warning(f"Batch of {len(jobs)} {jobs[0]['type']} jobs failed: {error}")
+        errors = {job["ref_id"]: error for job in jobs}
+    statuses, singles = {}, []
+    for job in jobs:
+        error = errors.get(job["ref_id"])
+        if error is RUN_SINGLY:
+            singles.append(job)
+            continue
+        statuses[job["ref_id"]] = await _finish(job, error)
+        if error:
+            logger.warning(f"Job {job['type']}:{job['ref_id']} attempt {job['attempts']} failed ({statuses[job['ref_id']]}): {error}")
+    for job in singles:
+        # The batch call used part of the lease; another worker may have taken the job
+        if await _renew_lease(job):
+            statuses[job["ref_id"]] = await run_job(job)
+        else:
+            logger.warning(f"Job {job['type']}:{job['ref_id']} lease lost before its single run")
+    return statuses
+
+async def _worker(worker_id: str):
+    while True:
+        try:
+            job = await claim(worker_id)
+            if job and job["type"] in _batch_handlers:
+                jobs = await claim_batch(worker_id, job)
+                if len(jobs) > 1:
+                    await run_batch(jobs)
+                else:
+                    await run_job(job)
+                continue
+            if job:
+                await run_job(job)
+                continue
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Job worker {worker_id} error: {str(e)}")
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        _wakeup.clear()
+
+async def _sweeper():
+    while True:
+        for sweep in _sweeps:
+            try:
+                queued = await sweep()
+                if queued:
+                    logger.info(f"Sweep {sweep.__name__} queued {queued} jobs")
+            except Exception as e:
+                logger.error(f"Sweep {sweep.__name__} error: {str(e)}")
+        await asyncio.sleep(SWEEP_SECONDS)
+
+def start(workers: int = WORKERS):
+    """Start the worker pool in the running event loop"""
+    global _wakeup
+    if _workers:
+        return
+    _wakeup = asyncio.Event()
+    for i in range(max(workers, 0)):
+        _workers.append(asyncio.create_task(_worker(f"{_worker_prefix}-{i}")))
+    if _sweeps:
+        _workers.append(asyncio.create_task(_sweeper()))
+    logger.info(f"Job queue started with {len(_workers)} workers")
+
+async def stop():
+    """Cancel the worker pool; leased jobs are retried by the next process after the lease"""
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+
+async def stats(job_type: Optional[str] = None) -> Dict[str, int]:
+    """Job counts by status"""
+    return await count_by_status(COLLECTION, {"type": job_type} if job_type else {}, JOB_STATUSES)
@@ -0,0 +1,290 @@
+"""
+Lexicon Tagger - In-process fast path for behavioral tag extraction
+- Maps session notes, concerns, positive observations and topics onto the tag
+  vocabulary the LLM analysis uses, with a word-level phrase trie compiled at import
+- Each tag collects weighted phrase evidence; negated mentions ("no signs of
+  anxiety") are ignored
+- A confidence score (evidence strength x note length) decides whether a log is
+  routine enough to tag locally; anything mentioning safety-related phrases,
+  long notes or thin evidence is left to the LLM
+- `python lexicon_tagger.py` evaluates it against stored LLM analyses at several
+  thresholds (coverage, tag precision/recall) to tune LEXICON_TAGGER_THRESHOLD
+"""
+from motor.motor_asyncio import AsyncIOMotorClient
+from typing import Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from functools import lru_cache
+import argparse
+import asyncio
+import os
+import re
+import time
+
+# Logs scoring at least this are tagged locally; above 1 disables the fast path
+THRESHOLD = float(os.environ.get('LEXICON_TAGGER_THRESHOLD', '0.8'))
+# Evidence a tag needs to be reported
+MIN_TAG_SCORE = 1.0
+# Evidence at which a tag counts as certain
+STRONG_TAG_SCORE = 2.0
+MAX_TAGS = 7
+# Longer notes lose confidence proportionally - they tend to carry more nuance
+ROUTINE_WORDS = 150
+FIELDS = ("session_notes", "concerns_noted", "positive_observations", "topics_discussed")
+
+# tag -> [(phrase, weight)]. Phrases are word sequences matched case-insensitively;
+# "a|b" offers alternatives for one word and a trailing "*" matches any word with that prefix
+LEXICON: Dict[str, List[Tuple[str, float]]] = {
+    "shows_empathy": [
+        ("empath*", 1.0), ("comforted|comforting", 1.0), ("cared about", 1.0), ("felt sorry for", 1.0),
+        ("helped a|his|her|their friend*|classmate*|sibling*", 1.0), ("kind|kindness to", 0.5),
+        ("considerate", 0.5), ("understood how", 1.0), ("concern for others", 1.0),
+    ],
+    "anxiety_indicators": [
+        ("anxious|anxiety", 1.0), ("worry|worried|worries|worrying", 1.0), ("nervous*", 1.0), ("panic*", 1.0),
+        ("scared", 0.5), ("afraid", 0.5), ("fear*", 0.5), ("stress|stressed|stressful", 0.5),
+        ("restless", 0.5), ("fidget*", 0.5), ("tense", 0.5), ("overwhelm*", 1.0),
+    ],
+    "social_confidence": [
+        ("confident*", 1.0), ("confidence", 1.0), ("spoke up", 1.0), ("made new friend|friends", 1.0),
+        ("made a new friend", 1.0), ("outgoing", 1.0), ("assertive*", 1.0), ("took the lead", 1.0),
+        ("leadership", 1.0), ("introduced himself|herself|themselves", 1.0), ("volunteered", 0.5), ("presented", 0.5),
+    ],
+    "creative_expression": [
+        ("creativ*", 1.0), ("imagin*", 1.0), ("drew", 0.5), ("drawing|drawings", 0.5), ("paint*", 0.5),
+        ("made up a story|song|game", 1.0), ("story|stories", 0.5), ("poem|poems|poetry", 1.0), ("sang", 0.5),
+        ("song|songs", 0.5), ("music", 0.5), ("craft*", 0.5), ("art|artwork", 0.5),
+    ],
+    "emotional_regulation": [
+        ("calmed down", 1.0), ("calm|calmed himself|herself|themselves", 1.0), ("deep breath*", 1.0),
+        ("self regulat*", 1.0), ("regulate|regulated|regulating his|her|their emotions", 1.0),
+        ("tantrum*", 1.0), ("meltdown*", 1.0), ("outburst*", 1.0), ("frustrat*", 0.5),
+        ("angry", 0.5), ("anger", 0.5), ("cope|coped|coping", 0.5), ("calm", 0.5),
+    ],
+    "peer_relationships": [
+        ("friend|friends", 0.5), ("friendship|friendships", 1.0), ("classmate|classmates", 0.5), ("peer|peers", 1.0),
+        ("bully|bullied|bullying", 1.0), ("left out", 1.0), ("played with", 0.5), ("fight with", 0.5),
+        ("best friend", 1.0),
+    ],
+    "family_attachment": [
+        ("mom|mum|mother", 0.5), ("dad|father", 0.5), ("parent|parents", 0.5), ("family", 0.5),
+        ("sister|brother|sibling|siblings", 0.5), ("grandma|grandpa|grandmother|grandfather|grandparents", 0.5),
+        ("misses his|her|their mom|mum|dad|mother|father|parents", 1.0), ("at home", 0.5),
+    ],
+    "academic_stress": [
+        ("exam|exams", 1.0), ("test|tests", 0.5), ("homework", 0.5), ("grade|grades", 0.5), ("marks", 0.5),
+        ("studies|studying", 0.5), ("assignment|assignments", 0.5), ("report card", 1.0),
+        ("pressure|stress|stressed about|over|from school|studies|exam|exams|marks|grades", 1.0),
+    ],
+    "self_esteem_building": [
+        ("proud", 1.0), ("self esteem", 1.0), ("praised", 0.5), ("accomplish*", 0.5),
+        ("achiev*", 0.5), ("felt good about", 1.0), ("believe|believes|believed in himself|herself|themselves", 1.0),
+        ("not good enough", 1.0), ("compares|compared|comparing himself|herself|themselves", 1.0),
+        ("stupid|useless|worthless", 1.0),
+    ],
+    "communication_growth": [
+        ("opened up", 1.0), ("expressed|expresses|expressing", 0.5), ("articulat*", 1.0), ("talked|talking more", 1.0),
+        ("shared openly|more|about", 1.0), ("eye contact", 1.0), ("asked questions", 0.5),
+        ("spoke clearly", 1.0), ("conversation*", 0.5), ("listened", 0.5),
+    ],
+}
+
+# Phrases that always go to the LLM (and the humans behind it)
+ESCALATION = "__escalation__"
+ESCALATION_PHRASES = [
+    "self harm*", "hurt|hurting himself|herself|themselves|myself", "suicid*", "kill*", "abuse*", "abusive",
+    "want|wants|wanted to die", "touched him|her|them|me", "unsafe", "run|running away", "hit|hits|hitting him|her|them|me",
+]
+
+NEGATIONS = {"no", "not", "never", "without", "didn't", "wasn't", "isn't", "doesn't", "hardly", "nor"}
+
+FOCUS_AREAS = {
+    "shows_empathy": "Build on the child's empathy with perspective-taking conversations",
+    "anxiety_indicators": "Explore what triggers worry and practise calming strategies",
+    "social_confidence": "Keep encouraging the child to take social initiative",
+    "creative_expression": "Use creative activities as a channel for expressing feelings",
+    "emotional_regulation": "Practise naming feelings and simple regulation techniques",
+    "peer_relationships": "Check in on friendships and peer interactions",
+    "family_attachment": "Talk about family routines and connections",
+    "academic_stress": "Discuss school workload and ways to manage study pressure",
+    "self_esteem_building": "Reinforce strengths and effort-based praise",
+    "communication_growth": "Give space for the child to lead the conversation",
+}
+
+_WORD = re.compile(r"[a-z0-9']+")
+
+class _Node:
+    __slots__ = ("words", "prefixes", "targets")
+
+    def __init__(self):
+        self.words: Dict[str, "_Node"] = {}
+        self.prefixes: List[Tuple[str, "_Node"]] = []
+        # (tag, weight, phrase) for phrases ending here
+        self.targets: List[Tuple[str, float, str]] = []
+
+def _child(node: _Node, word: str) -> _Node:
+    if word.endswith("*"):
+        stem = word[:-1]
+        for existing, child in node.prefixes:
+            if existing == stem:
+                return child
+        node.prefixes.append((stem, _Node()))
+        return node.prefixes[-1][1]
+    return node.words.setdefault(word, _Node())
+
+def _compile() -> _Node:
+    """Word-level trie over every phrase; alternatives fan out into branches"""
+    root = _Node()
+    entries = [(tag, phrase, weight) for tag, phrases in LEXICON.items() for phrase, weight in phrases]
+    entries += [(ESCALATION, phrase, 1.0) for phrase in ESCALATION_PHRASES]
+    for tag, phrase, weight in entries:
+        nodes = [root]
+        for position in phrase.lower().split():
+            nodes = [_child(node, alternative) for node in nodes for alternative in position.split("|")]
+        for node in nodes:
+            node.targets.append((tag, weight, phrase))
+    return root
+
+_TRIE = _compile()
+
+def _step(node: _Node, word: str) -> List[_Node]:
+    advanced = [node.words[word]] if word in node.words else []
+    advanced += [child for stem, child in node.prefixes if word.startswith(stem)]
+    return advanced
+
+@lru_cache(maxsize=20000)
+def _start(word: str) -> Tuple[_Node, ...]:
+    # Nearly every word is tried at the root, so its transitions are memoised
+    return tuple(_step(_TRIE, word))
+
+def _matches(words: List[str], start: int):
+    """(tag, weight, end) for every phrase starting at words[start]"""
+    frontier = None
+    for i in range(start, len(words)):
+        if frontier is None:
+            advanced = _start(words[i])
+        else:
+            advanced = [child for node in frontier for child in _step(node, words[i])]
+        if not advanced:
+            return
+        for node in advanced:
+            for tag, weight, _ in node.targets:
+                yield tag, weight, i + 1
+        frontier = advanced
+
+def score(session_log: dict) -> dict:
+    """Tag evidence for a session log: {"tags": [...], "scores", "evidence", "confidence",
+    "escalation", "words"}"""
+    words = _WORD.findall("\n".join(str(session_log.get(field) or "") for field in FIELDS).lower())
+    scores: Dict[str, float] = {}
+    evidence: Dict[str, List[str]] = {}
+    escalation = False
+    for start in range(len(words)):
+        for tag, weight, end in _matches(words, start):
+            if tag == ESCALATION:
+                escalation = True
+                continue
+            if NEGATIONS.intersection(words[max(0, start - 3):start]):
+                continue
+            scores[tag] = scores.get(tag, 0) + weight
+            phrase = " ".join(words[start:end])
+            if phrase not in evidence.setdefault(tag, []):
+                evidence[tag].append(phrase)
+
+    tags = sorted((t for t, s in scores.items() if s >= MIN_TAG_SCORE), key=lambda t: scores[t], reverse=True)[:MAX_TAGS]
+    if escalation or not tags:
+        confidence = 0.0
+    else:
+        strength = sum(min(scores[t], STRONG_TAG_SCORE) / STRONG_TAG_SCORE for t in tags[:3]) / 3
+        confidence = round(strength * min(1.0, ROUTINE_WORDS / len(words)), 3)
+    return {
+        "tags": tags,
+        "scores": scores,
+        "evidence": evidence,
+        "confidence": confidence,
+        "escalation": escalation,
+        "words": len(words)
+    }
+
+def _readable(tag: str) -> str:
+    return tag.replace("_", " ")
+
+def analyze(session_log: dict, threshold: float = THRESHOLD) -> Optional[dict]:
+    """Analysis in the LLM result shape if the log is confidently routine, else None"""
+    result = score(session_log)
+    if result["confidence"] < threshold or not result["tags"]:
+        return None
+    tags = result["tags"]
+    return {
+        "behavioral_tags": tags,
+        "emotional_summary": (
+            f"The child appeared {session_log.get('mood_observed', 'neutral')} with "
+            f"{session_log.get('engagement_level', 'moderate')} engagement; the notes point to "
+            f"{' and '.join(_readable(t) for t in tags[:2])}."
+        ),
+        "patterns": [f"{_readable(t).capitalize()}: {', '.join(result['evidence'][t][:3])}" for t in tags[:3]],
+        "focus_areas": [FOCUS_AREAS[t] for t in tags[:2]],
+        "source": "lexicon",
+        "confidence": result["confidence"]
+    }
+
+# ==================== EVALUATION ====================
+
+def evaluate(session_logs: List[dict], thresholds: List[float]) -> List[dict]:
+    """Compare lexicon tags with the stored LLM tags. Per threshold: share of logs that
+    would be tagged locally and micro precision/recall/F1 on those logs."""
+    scored = [(score(log), set(log.get("behavioral_tags") or [])) for log in session_logs]
+    rows = []
+    for threshold in thresholds:
+        true_pos = predicted = expected = covered = 0
+        for result, llm_tags in scored:
+            if result["confidence"] < threshold or not result["tags"]:
+                continue
+            covered += 1
+            local_tags = set(result["tags"])
+            true_pos += len(local_tags & llm_tags)
+            predicted += len(local_tags)
+            expected += len(llm_tags)
+        precision = true_pos / predicted if predicted else 0
+        recall = true_pos / expected if expected else 0
+        rows.append({
+            "threshold": threshold,
+            "coverage": covered / len(scored) if scored else 0,
+            "tagged": covered,
+            "precision": precision,
+            "recall": recall,
+            "f1": 2 * precision * recall / (precision + recall) if precision + recall else 0
+        })
+    return rows
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--thresholds", default="0.5,0.6,0.7,0.8,0.9")
+    parser.add_argument("--limit", type=int, default=5000, help="most recent LLM-analysed logs to use")
+    args = parser.parse_args()
+
+    load_dotenv()
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], tz_aware=True)
+    db = client[os.environ['DB_NAME']]
+    projection = {"_id": 0, "behavioral_tags": 1, **{field: 1 for field in FIELDS}}
+    logs = await db.session_logs.find(
+        {"ai_processed": True, "behavioral_tags.0": {"$exists": True}, "ai_analysis.source": {"$ne": "lexicon"}},
+        projection
+    ).sort("session_date", -1).to_list(args.limit)
+    client.close()
+    if not logs:
+        print("No LLM-analysed session logs to evaluate against")
+        return
+
+    started = time.perf_counter()
+    for log in logs:
+        score(log)
+    per_log_us = (time.perf_counter() - started) * 1e6 / len(logs)
+
+    print(f"{len(logs)} logs, {per_log_us:.0f} µs per log")
+    print(f"{'threshold':>10} {'coverage':>9} {'tagged':>7} {'precision':>10} {'recall':>7} {'f1':>6}")
+    for row in evaluate(logs, [float(t) for t in args.thresholds.split(",")]):
+        print(f"{row['threshold']:>10.2f} {row['coverage']:>8.1%} {row['tagged']:>7} "
+              f"{row['precision']:>10.2f} {row['recall']:>7.2f} {row['f1']:>6.2f}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
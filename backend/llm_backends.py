@@ -0,0 +1,185 @@
+"""
+LLM Backends - Pluggable completion backends behind llm_gateway and llm_stream
+- "emergent" (default): LlmChat for completions, litellm for token streaming
+- "stub": local deterministic stand-in for offline load tests and benchmarks -
+  schema-valid JSON for tag extraction (single and batched), templated markdown
+  for reports and chat, with configurable latency and failure rate
+- Selected with LLM_BACKEND; the gateway's concurrency, budget and metrics apply
+  to every backend alike
+
+Stub settings:
+    LLM_STUB_LATENCY_MS        mean latency per completion (default 800)
+    LLM_STUB_LATENCY_JITTER_MS spread around the mean (default 200)
+    LLM_STUB_LATENCY_DIST      fixed | uniform | normal | lognormal (default lognormal)
+    LLM_STUB_FAILURE_RATE      share of calls raising StubLLMError (default 0)
+    LLM_STUB_SEED              seed for latency/failure draws (default 0)
+"""
+from typing import AsyncIterator, Dict, List
+from emergentintegrations.llm.chat import LlmChat, UserMessage
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import random
+import re
+import uuid
+
+logger = logging.getLogger(__name__)
+
+LLM_BACKEND = os.environ.get('LLM_BACKEND', 'emergent')
+# Universal (sk-emergent-) keys are served through the Emergent proxy
+EMERGENT_LLM_BASE_URL = os.environ.get('EMERGENT_LLM_BASE_URL', 'https://integrations.emergentagent.com/llm')
+
+STUB_LATENCY_MS = float(os.environ.get('LLM_STUB_LATENCY_MS', '800'))
+STUB_LATENCY_JITTER_MS = float(os.environ.get('LLM_STUB_LATENCY_JITTER_MS', '200'))
+STUB_LATENCY_DIST = os.environ.get('LLM_STUB_LATENCY_DIST', 'lognormal')
+STUB_FAILURE_RATE = float(os.environ.get('LLM_STUB_FAILURE_RATE', '0'))
+STUB_SEED = int(os.environ.get('LLM_STUB_SEED', '0'))
+
+class EmergentBackend:
+    """Live completions through the Emergent integrations client"""
+    name = "emergent"
+
+    async def complete(self, api_key: str, system_message: str, prompt: str,
+                       provider: str, model: str, session_id: str) -> str:
+        chat = LlmChat(
+            api_key=api_key,
+            session_id=session_id,
+            system_message=system_message
+        ).with_model(provider, model)
+        return await chat.send_message(UserMessage(text=prompt))
+
+    async def stream(self, api_key: str, system_message: str, messages: List[dict],
+                     provider: str, model: str) -> AsyncIterator[str]:
+        params = {
+            "model": f"{provider}/{model}",
+            "messages": [{"role": "system", "content": system_message}, *messages],
+            "api_key": api_key,
+            "stream": True
+        }
+        if api_key.startswith("sk-emergent-"):
+            params["api_base"] = EMERGENT_LLM_BASE_URL
+        try:
+            import litellm
+            stream = await litellm.acompletion(**params)
+        except Exception as e:
+            logger.warning(f"Streaming unavailable, falling back to a single completion: {str(e)}")
+            yield await self.complete(api_key, system_message, messages[-1]["content"], provider, model, str(uuid.uuid4()))
+            return
+
+        try:
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    yield delta
+        finally:
+            # Runs on completion, error or cancellation - release the upstream HTTP stream
+            close = getattr(stream, "aclose", None)
+            if close:
+                await close()
+
+class StubLLMError(RuntimeError):
+    pass
+
+STUB_TAGS = [
+    "shows_empathy", "anxiety_indicators", "social_confidence", "creative_expression",
+    "emotional_regulation", "peer_relationships", "family_attachment", "academic_stress",
+    "self_esteem_building", "communication_growth"
+]
+
+class StubBackend:
+    """Deterministic offline stand-in: the response depends only on the prompt;
+    latency and failures are drawn from a seeded generator"""
+    name = "stub"
+
+    def __init__(self, latency_ms: float = STUB_LATENCY_MS, jitter_ms: float = STUB_LATENCY_JITTER_MS,
+                 distribution: str = STUB_LATENCY_DIST, failure_rate: float = STUB_FAILURE_RATE,
+                 seed: int = STUB_SEED):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.distribution = distribution
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self.calls = 0
+
+    def latency(self) -> float:
+        """Seconds for the next call"""
+        mean, jitter = self.latency_ms, self.jitter_ms
+        if self.distribution == "fixed" or jitter <= 0 or mean <= 0:
+            ms = mean
+        elif self.distribution == "uniform":
+            ms = self._random.uniform(mean - jitter, mean + jitter)
+        elif self.distribution == "normal":
+            ms = self._random.gauss(mean, jitter)
+        else:
+            # Lognormal with the given mean and standard deviation - long right tail like real APIs
+            sigma2 = math.log(1 + (jitter / mean) ** 2)
+            ms = self._random.lognormvariate(math.log(mean) - sigma2 / 2, math.sqrt(sigma2))
+        return max(ms, 0) / 1000
+
+    async def _simulate(self) -> float:
+        self.calls += 1
+        delay = self.latency()
+        if self._random.random() < self.failure_rate:
+            await asyncio.sleep(delay / 2)
+            raise StubLLMError("Stub LLM backend: simulated failure")
+        return delay
+
+    @staticmethod
+    def _analysis(seed_text: str) -> dict:
+        rng = random.Random(hashlib.sha256(seed_text.encode()).hexdigest())
+        tags = rng.sample(STUB_TAGS, rng.randint(3, 5))
+        return {
+            "behavioral_tags": tags,
+            "emotional_summary": f"The child appeared settled and engaged, with signs of {tags[0].replace('_', ' ')}.",
+            "patterns": [f"Consistent {tag.replace('_', ' ')}" for tag in tags[:2]],
+            "focus_areas": [f"Continue supporting {tags[-1].replace('_', ' ')}"]
+        }
+
+    def respond(self, system_message: str, prompt: str) -> str:
+        """Canned response matching the shape the prompt asks for"""
+        session_ids = re.findall(r"^### Session (\S+)", prompt, re.MULTILINE)
+        if session_ids:
+            return json.dumps([{"session_id": sid, **self._analysis(sid)} for sid in session_ids])
+        if '"behavioral_tags"' in prompt:
+            return json.dumps(self._analysis(prompt))
+        headings = re.findall(r"^\s*\d+\. \*\*(.+?)\*\*", prompt, re.MULTILINE)
+        if headings:
+            return "\n\n".join(
+                f"## {heading}\nThis section is generated by the offline stub backend for load testing."
+                for heading in headings
+            )
+        return "Thanks for your question! This is a canned reply from the offline stub backend."
+
+    async def complete(self, api_key: str, system_message: str, prompt: str,
+                       provider: str, model: str, session_id: str) -> str:
+        delay = await self._simulate()
+        await asyncio.sleep(delay)
+        return self.respond(system_message, prompt)
+
+    async def stream(self, api_key: str, system_message: str, messages: List[dict],
+                     provider: str, model: str) -> AsyncIterator[str]:
+        delay = await self._simulate()
+        words = re.findall(r"\S+\s*", self.respond(system_message, messages[-1]["content"]))
+        for word in words:
+            await asyncio.sleep(delay / max(len(words), 1))
+            yield word
+
+BACKENDS = {"emergent": EmergentBackend, "stub": StubBackend}
+_backends: Dict[str, object] = {}
+
+def get_backend(name: str = None):
+    """The configured backend instance (LLM_BACKEND), created once per process"""
+    name = name or LLM_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown LLM backend: {name}")
+    if name not in _backends:
+        _backends[name] = BACKENDS[name]()
+        if name != "emergent":
+            logger.warning(f"LLM backend '{name}' in use - responses are not from a live model")
+    return _backends[name]
+
+def is_stub() -> bool:
+    return LLM_BACKEND == "stub"
@@ -0,0 +1,184 @@
+"""
+LLM Gateway - Single choke point for every LLM call
+- Separate concurrency pools per priority class: interactive (public chat),
+  observer (reports and analysis an observer is waiting on) and batch (background jobs)
+- Shared per-minute request and token budget; lower priorities may only use a share
+  of it, so batch work can never starve interactive chat
+- Admission is immediate: over budget or a full queue -> 429 with Retry-After
+- Admitted calls wait for a pool slot until their deadline -> 503 on timeout
+- Per-priority metrics: queue depth, in flight, wait times, rejections
+- Completions are served by the backend selected in llm_backends (LLM_BACKEND)
+
+Limits are per process: with several workers, size the budget as upstream limit / workers.
+"""
+from fastapi import HTTPException
+from contextlib import asynccontextmanager
+from collections import deque
+from typing import Dict, Optional
+import llm_backends
+import asyncio
+import logging
+import math
+import os
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+OBSERVER = "observer"
+BATCH = "batch"
+PRIORITIES = (INTERACTIVE, OBSERVER, BATCH)
+
+def _env(name: str, default):
+    return type(default)(os.environ.get(name, default))
+
+# priority -> (concurrency, max queued, queue deadline seconds, share of the minute budget)
+POOLS = {
+    INTERACTIVE: (_env('LLM_INTERACTIVE_CONCURRENCY', 4), _env('LLM_INTERACTIVE_MAX_QUEUE', 20),
+                  _env('LLM_INTERACTIVE_DEADLINE_SECONDS', 15.0), 1.0),
+    OBSERVER: (_env('LLM_OBSERVER_CONCURRENCY', 3), _env('LLM_OBSERVER_MAX_QUEUE', 30),
+               _env('LLM_OBSERVER_DEADLINE_SECONDS', 60.0), _env('LLM_OBSERVER_BUDGET_SHARE', 0.8)),
+    BATCH: (_env('LLM_BATCH_CONCURRENCY', 2), _env('LLM_BATCH_MAX_QUEUE', 200),
+            _env('LLM_BATCH_DEADLINE_SECONDS', 600.0), _env('LLM_BATCH_BUDGET_SHARE', 0.5)),
+}
+REQUESTS_PER_MINUTE = _env('LLM_REQUESTS_PER_MINUTE', 120)
+TOKENS_PER_MINUTE = _env('LLM_TOKENS_PER_MINUTE', 200000)
+# Completion size assumed when reserving budget, before the real length is known
+DEFAULT_OUTPUT_TOKENS = _env('LLM_DEFAULT_OUTPUT_TOKENS', 800)
+CHARS_PER_TOKEN = 4
+WINDOW_SECONDS = 60.0
+
+_semaphores: Dict[str, asyncio.Semaphore] = {p: asyncio.Semaphore(POOLS[p][0]) for p in PRIORITIES}
+# Admitted calls in the last minute: [admitted_at, tokens]
+_window: deque = deque()
+_metrics: Dict[str, dict] = {
+    p: {"queued": 0, "in_flight": 0, "completed": 0, "failed": 0, "rejected": 0, "timed_out": 0,
+        "wait_ms_total": 0.0, "wait_ms_max": 0.0}
+    for p in PRIORITIES
+}
+
+def estimate_tokens(*texts: str) -> int:
+    return sum(len(t or "") for t in texts) // CHARS_PER_TOKEN
+
+def _prune(now: float):
+    while _window and now - _window[0][0] >= WINDOW_SECONDS:
+        _window.popleft()
+
+def _admit(priority: str, tokens: int) -> list:
+    """Reserve budget for one call or raise 429; synchronous so check-and-reserve is atomic"""
+    concurrency, max_queue, _, share = POOLS[priority]
+    stats = _metrics[priority]
+    now = time.monotonic()
+    _prune(now)
+    used_tokens = sum(entry[1] for entry in _window)
+
+    reason = None
+    if stats["queued"] >= max_queue:
+        reason = "queue full"
+    elif len(_window) + 1 > REQUESTS_PER_MINUTE * share:
+        reason = "request budget exhausted"
+    elif used_tokens + tokens > TOKENS_PER_MINUTE * share:
+        reason = "token budget exhausted"
+    if reason:
+        stats["rejected"] += 1
+        retry_after = math.ceil(WINDOW_SECONDS - (now - _window[0][0])) if _window else 1
+        raise HTTPException(
+            status_code=429,
+            detail=f"AI service is busy ({reason}), please retry shortly",
+            headers={"Retry-After": str(max(retry_after, 1))}
+        )
+
+    entry = [now, tokens]
+    _window.append(entry)
+    return entry
+
+def _release_budget(entry: list):
+    try:
+        _window.remove(entry)
+    except ValueError:
+        pass
+
+@asynccontextmanager
+async def slot(priority: str, tokens: int, deadline: Optional[float] = None):
+    """Hold a pool slot for one LLM call. Yields the budget entry; set entry[1] to the
+    real token count once known."""
+    if priority not in POOLS:
+        raise ValueError(f"Unknown LLM priority: {priority}")
+    entry = _admit(priority, tokens)
+    stats = _metrics[priority]
+    deadline = POOLS[priority][2] if deadline is None else deadline
+
+    stats["queued"] += 1
+    started = time.monotonic()
+    try:
+        await asyncio.wait_for(_semaphores[priority].acquire(), timeout=deadline)
+    except asyncio.TimeoutError:
+        stats["timed_out"] += 1
+        _release_budget(entry)
+        raise HTTPException(status_code=503, detail="AI service queue timed out, please retry")
+    finally:
+        stats["queued"] -= 1
+
+    waited = (time.monotonic() - started) * 1000
+    stats["wait_ms_total"] += waited
+    stats["wait_ms_max"] = max(stats["wait_ms_max"], waited)
+    stats["in_flight"] += 1
+    try:
+        yield entry
+        stats["completed"] += 1
+    except BaseException:
+        stats["failed"] += 1
+        raise
+    finally:
+        stats["in_flight"] -= 1
+        _semaphores[priority].release()
+
+async def send_message(
+    api_key: str,
+    system_message: str,
+    prompt: str,
+    priority: str = INTERACTIVE,
+    provider: str = "openai",
+    model: str = "gpt-4o-mini",
+    session_id: Optional[str] = None,
+    deadline: Optional[float] = None,
+    output_tokens: Optional[int] = None
+) -> str:
+    """One completion from the configured backend through the gateway. `output_tokens` is the expected
+    completion size to reserve (DEFAULT_OUTPUT_TOKENS if not given)."""
+    input_tokens = estimate_tokens(system_message, prompt)
+    reserve = input_tokens + (output_tokens or DEFAULT_OUTPUT_TOKENS)
+    async with slot(priority, reserve, deadline) as entry:
+        response = await llm_backends.get_backend().complete(
+            api_key, system_message, prompt, provider, model, session_id or str(uuid.uuid4())
+        )
+        entry[1] = input_tokens + estimate_tokens(response)
+        return response
+
+def metrics() -> dict:
+    """Current pools, queues and minute-window usage"""
+    now = time.monotonic()
+    _prune(now)
+    pools = {}
+    for priority, stats in _metrics.items():
+        concurrency, max_queue, deadline, share = POOLS[priority]
+        served = stats["completed"] + stats["failed"]
+        pools[priority] = {
+            **stats,
+            "concurrency": concurrency,
+            "max_queue": max_queue,
+            "deadline_seconds": deadline,
+            "budget_share": share,
+            "wait_ms_avg": round(stats["wait_ms_total"] / served, 1) if served else 0
+        }
+    return {
+        "backend": llm_backends.LLM_BACKEND,
+        "pools": pools,
+        "window": {
+            "requests": len(_window),
+            "requests_limit": REQUESTS_PER_MINUTE,
+            "tokens": sum(entry[1] for entry in _window),
+            "tokens_limit": TOKENS_PER_MINUTE
+        }
+    }
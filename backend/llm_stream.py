@@ -0,0 +1,75 @@
+"""
+LLM Streaming - Token streaming for chat and report generation over Server-Sent Events
+- Streams completions from the configured llm_backends backend (litellm for the
+  live one, falling back to a single chunk when streaming cannot be started)
+- Each stream holds an llm_gateway slot of its priority for its whole duration
+- stream_events() turns a token stream into SSE frames, persists the result only
+  once the stream completes and closes the upstream call if the client disconnects
+"""
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, Awaitable, Callable, List
+import llm_backends
+import llm_gateway
+import asyncio
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+def sse_event(event: str, data) -> str:
+    """One Server-Sent Events frame with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def sse_response(events: AsyncIterator[str]) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def stream_completion(
+    api_key: str,
+    system_message: str,
+    messages: List[dict],
+    priority: str = llm_gateway.INTERACTIVE,
+    provider: str = "openai",
+    model: str = "gpt-4o-mini"
+) -> AsyncIterator[str]:
+    """Yield text deltas of a chat completion. `messages` are {"role", "content"} dicts
+    ending with the user turn."""
+    input_tokens = llm_gateway.estimate_tokens(system_message, *[m["content"] for m in messages])
+    async with llm_gateway.slot(priority, input_tokens + llm_gateway.DEFAULT_OUTPUT_TOKENS) as budget:
+        output = 0
+        deltas = llm_backends.get_backend().stream(api_key, system_message, messages, provider, model)
+        try:
+            async for delta in deltas:
+                output += len(delta)
+                yield delta
+        finally:
+            budget[1] = input_tokens + output // llm_gateway.CHARS_PER_TOKEN
+            await deltas.aclose()
+
+async def stream_events(
+    tokens: AsyncIterator[str],
+    on_complete: Callable[[str], Awaitable[dict]]
+) -> AsyncIterator[str]:
+    """SSE frames: `token` per delta, then `done` with on_complete(full_text), or `error`.
+    A client disconnect cancels this generator, which closes `tokens` and skips on_complete."""
+    parts = []
+    try:
+        async for text in tokens:
+            parts.append(text)
+            yield sse_event("token", {"text": text})
+        yield sse_event("done", await on_complete("".join(parts)))
+    except asyncio.CancelledError:
+        logger.info(f"Stream cancelled by client after {len(parts)} chunks")
+        raise
+    except HTTPException as e:
+        # Gateway rejection (429) or queue timeout (503)
+        yield sse_event("error", {"detail": e.detail, "status": e.status_code})
+    except Exception as e:
+        logger.error(f"Streaming error: {str(e)}")
+        yield sse_event("error", {"detail": "Generation failed"})
+    finally:
+        await tokens.aclose()
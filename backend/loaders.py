@@ -0,0 +1,122 @@
+"""
+Entity Loaders - Request-scoped batching of id lookups (DataLoader pattern)
+- load()/load_many() calls made in the same event-loop tick are collapsed into
+  one {"id": {"$in": [...]}} query per collection and projection
+- Results are memoized for the lifetime of the request
+
+Usage in a route:
+    loaders: EntityLoaders = Depends(get_loaders)
+    parents, children = await asyncio.gather(
+        loaders.load_many("parents", parent_ids),
+        loaders.load_many("children", child_ids, {"_id": 0, "name": 1}),
+    )
+"""
+from typing import Dict, Iterable, List, Optional
+import asyncio
+import logging
+
+db = None
+logger = logging.getLogger(__name__)
+
+# Default projections - never leak password hashes through enrichment
+DEFAULT_PROJECTIONS = {
+    "children": {"_id": 0},
+    "observers": {"_id": 0, "hashed_password": 0},
+    "parents": {"_id": 0, "hashed_password": 0},
+    "principals": {"_id": 0, "hashed_password": 0},
+}
+
+def set_database(database):
+    """Set the database instance from main server"""
+    global db
+    db = database
+
+def _with_id(projection: dict) -> dict:
+    """Inclusion projections must still return `id` so results can be matched"""
+    inclusive = any(value for key, value in projection.items() if key != "_id")
+    if inclusive and not projection.get("id"):
+        return {**projection, "id": 1}
+    return projection
+
+class BatchLoader:
+    """Loads documents of one collection by `id`, one $in query per tick"""
+
+    def __init__(self, database, collection: str, projection: dict):
+        self.database = database
+        self.collection = collection
+        self.projection = _with_id(projection)
+        self._cache: Dict[str, asyncio.Future] = {}
+        self._queue: List[str] = []
+        self._scheduled = False
+        self.queries = 0
+
+    def load(self, key: str) -> asyncio.Future:
+        if key in self._cache:
+            return self._cache[key]
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._cache[key] = future
+        self._queue.append(key)
+        if not self._scheduled:
+            self._scheduled = True
+            loop.call_soon(self._dispatch)
+        return future
+
+    def _dispatch(self):
+        keys, self._queue, self._scheduled = self._queue, [], False
+        asyncio.ensure_future(self._fetch(keys))
+
+    async def _fetch(self, keys: List[str]):
+        try:
+            self.queries += 1
+            docs = await self.database[self.collection].find(
+                {"id": {"$in": keys}}, self.projection
+            ).to_list(len(keys))
+            by_id = {doc.get("id"): doc for doc in docs}
+            for key in keys:
+                future = self._cache[key]
+                if not future.done():
+                    future.set_result(by_id.get(key))
+        except Exception as e:
+            logger.error(f"Batch load failed for {self.collection}: {str(e)}")
+            for key in keys:
+                future = self._cache.pop(key)
+                if not future.done():
+                    future.set_exception(e)
+
+class EntityLoaders:
+    """Per-request registry of BatchLoaders keyed by (collection, projection)"""
+
+    def __init__(self, database):
+        self.database = database
+        self._loaders: Dict[tuple, BatchLoader] = {}
+
+    def loader(self, collection: str, projection: Optional[dict] = None) -> BatchLoader:
+        projection = projection if projection is not None else DEFAULT_PROJECTIONS.get(collection, {"_id": 0})
+        key = (collection, tuple(sorted(projection.items())))
+        if key not in self._loaders:
+            self._loaders[key] = BatchLoader(self.database, collection, projection)
+        return self._loaders[key]
+
+    async def load(self, collection: str, key: Optional[str], projection: Optional[dict] = None):
+        """Load one document by id (None for a missing or empty id)"""
+        if not key:
+            return None
+        return await self.loader(collection, projection).load(key)
+
+    async def load_many(self, collection: str, keys: Iterable[Optional[str]], projection: Optional[dict] = None) -> list:
+        """Load documents aligned with `keys`; missing or empty ids yield None"""
+        keys = list(keys)
+        batch = self.loader(collection, projection)
+        futures = {key: batch.load(key) for key in keys if key}
+        if futures:
+            await asyncio.gather(*futures.values())
+        return [futures[key].result() if key else None for key in keys]
+
+    @property
+    def query_count(self) -> int:
+        return sum(batch.queries for batch in self._loaders.values())
+
+def get_loaders() -> EntityLoaders:
+    """FastAPI dependency - a fresh loader set for every request"""
+    return EntityLoaders(db)
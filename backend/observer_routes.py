@@ -4,8 +4,13 @@ Observer Routes - Authentication, Dashboard, Child Management
 from fastapi import APIRouter, HTTPException, Depends
 from passlib.context import CryptContext
 from jose import JWTError, jwt
+from pymongo import ReturnDocument
 from datetime import datetime, timedelta, timezone
 from typing import List, Optional
+from date_ranges import parse_datetime, resolve_timezone, today_range, range_filter
+import status_counts
+import rollups
+import search
 import logging
 import uuid
 
@@ -111,6 +116,7 @@ async def get_observer_dashboard(token: str):
         # Statistics
         total_children = len(children)
         active_children = len([c for c in children if c.get('status') == 'active'])
+        week_start = datetime.now(timezone.utc) - timedelta(days=7)
         
         return {
             "observer": observer,
@@ -119,7 +125,7 @@ async def get_observer_dashboard(token: str):
             "statistics": {
                 "total_children": total_children,
                 "active_children": active_children,
-                "sessions_this_week": len([s for s in recent_sessions if s.get('scheduled_date', '')[:10] >= (datetime.now(timezone.utc) - timedelta(days=7)).date().isoformat()])
+                "sessions_this_week": len([s for s in recent_sessions if (parse_datetime(s.get('scheduled_date')) or week_start) > week_start])
             }
         }
     except HTTPException:
@@ -229,10 +235,11 @@ async def create_mood_entry_observer(
             "notes": notes,
             "triggers": [],
             "logged_date": logged_date,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         }
         
         await db.mood_entries.insert_one(entry)
+        await rollups.record_mood(entry, child.get('school'))
         
         return {"success": True, "entry": {
             "id": entry["id"],
@@ -374,7 +381,7 @@ async def create_readiness_check(
             "distractions_minimized": distractions_minimized,
             "notes": notes,
             "all_ready": environment_ready and materials_ready and distractions_minimized,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         }
         
         await db.readiness_checks.insert_one(readiness)
@@ -390,10 +397,12 @@ async def create_readiness_check(
                 "child_name": child.get('name'),
                 "status": "in_progress",
                 "started_at": datetime.now(timezone.utc).isoformat(),
+                "created_at": datetime.now(timezone.utc),
                 "ended_at": None,
                 "duration_minutes": 0
             }
             await db.session_logs.insert_one(session)
+            await rollups.record_session(session, child.get('school'))
             readiness['session_id'] = session_id
         
         return {
@@ -463,10 +472,18 @@ async def end_session(
             "key_observations": key_observations
         }
         
-        await db.session_logs.update_one(
+        previous = await db.session_logs.find_one_and_update(
             {"id": session_id},
-            {"$set": update_data}
+            {"$set": update_data},
+            projection={"_id": 0, "status": 1},
+            return_document=ReturnDocument.BEFORE
         )
+        await search.index_session_log({**session, **update_data})
+        # Only the request that actually completes the session counts it, even when
+        # two end requests race
+        if previous and previous.get("status") != "completed":
+            child = await db.children.find_one({"id": session.get("child_id")}, {"_id": 0, "school": 1})
+            await rollups.record_session_completed(session, (child or {}).get("school"), mood_observed)
         
         return {"success": True, "message": "Session ended successfully"}
     except HTTPException:
@@ -551,6 +568,8 @@ async def create_daily_report(
         }
         
         await db.daily_reports.insert_one(report)
+        status_counts.invalidate("daily_reports")
+        await search.index_daily_report(report)
         
         return {"success": True, "report_id": report_id, "message": "Daily report submitted"}
     except HTTPException:
@@ -626,6 +645,7 @@ async def upload_session_recording(
         }
         
         await db.session_recordings.insert_one(recording)
+        status_counts.invalidate("session_recordings")
         
         return {"success": True, "recording_id": recording_id}
     except HTTPException:
@@ -766,6 +786,7 @@ async def create_escalation(
             "created_at": datetime.now(timezone.utc).isoformat()
         }
         await db.red_flags.insert_one(red_flag)
+        status_counts.invalidate("red_flags")
         
         return {
             "success": True, 
@@ -804,12 +825,17 @@ async def get_observer_escalations(token: str, child_id: str = None, status: str
 # ==================== TODAY'S SCHEDULE ====================
 
 @router.get("/observer/today-schedule")
-async def get_today_schedule(token: str):
-    """Get observer's schedule for today"""
+async def get_today_schedule(token: str, tz: Optional[str] = None):
+    """Get observer's schedule for today (calendar day in the optional IANA time zone)"""
     try:
         user = verify_observer_token(token)
         
-        today = datetime.now(timezone.utc).date().isoformat()
+        try:
+            zone = resolve_timezone(tz)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        today = datetime.now(zone).date().isoformat()
+        today_filter = range_filter(*today_range(tz))
         
         # Get assigned children
         children = await db.children.find(
@@ -822,7 +848,7 @@ async def get_today_schedule(token: str):
         today_sessions = await db.session_logs.find({
             "observer_id": user['id'],
             "child_id": {"$in": child_ids},
-            "created_at": {"$regex": f"^{today}"}
+            "created_at": today_filter
         }, {"_id": 0}).to_list(100)
         
         sessions_by_child = {s['child_id']: s for s in today_sessions}
@@ -846,7 +872,7 @@ async def get_today_schedule(token: str):
         # Get today's readiness checks
         readiness_checks = await db.readiness_checks.find({
             "observer_id": user['id'],
-            "created_at": {"$regex": f"^{today}"}
+            "created_at": today_filter
         }, {"_id": 0}).to_list(100)
         
         return {
@@ -862,3 +888,28 @@ async def get_today_schedule(token: str):
     except Exception as e:
         logger.error(f"Schedule error: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to load schedule")
+
+# ==================== SEARCH ====================
+
+@router.get("/observer/search")
+async def search_notes(token: str, q: str, kind: str = None, limit: int = 20, cursor: str = None):
+    """Full-text search over session notes and daily reports of the observer's children"""
+    try:
+        user = verify_observer_token(token)
+        
+        children = await db.children.find(
+            {"observer_id": user['id']},
+            {"_id": 0, "id": 1, "name": 1}
+        ).to_list(None)
+        names = {c['id']: c.get('name') for c in children}
+        
+        page = await search.search(q, list(names), kind, limit, cursor)
+        for result in page["results"]:
+            result["child_name"] = names.get(result["child_id"])
+        
+        return page
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Search error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Search failed")
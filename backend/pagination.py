@@ -0,0 +1,110 @@
+"""
+Pagination - Shared keyset (cursor) pagination for list endpoints
+- Stable ordering on (sort_key, id) so ties never drop or repeat rows
+- Opaque base64 cursors; the client only echoes back `next_cursor`
+- Bounded page size regardless of collection size
+- Cursors continue across sort key types in Mongo's sort order (null/missing, numbers,
+  strings, dates), so rows with no sort key or a legacy string date are still paged
+"""
+from fastapi import HTTPException
+from datetime import datetime
+from typing import Optional
+import base64
+import json
+
+db = None
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+def set_database(database):
+    """Set the database instance from main server"""
+    global db
+    db = database
+
+def clamp_limit(limit: Optional[int]) -> int:
+    if not limit or limit < 1:
+        return DEFAULT_LIMIT
+    return min(limit, MAX_LIMIT)
+
+def encode_cursor(sort_value, doc_id) -> str:
+    if isinstance(sort_value, datetime):
+        sort_value = {"$date": sort_value.isoformat()}
+    raw = json.dumps({"v": sort_value, "id": doc_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    """Return (sort_value, id) from an opaque cursor; 400 if it was tampered with"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        value = data["v"]
+        if isinstance(value, dict) and "$date" in value:
+            value = datetime.fromisoformat(value["$date"])
+        return value, data["id"]
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+# Mongo sorts null/missing < numbers < strings < dates; a range filter ($lt/$gt) only
+# matches values of its own type, so the rows of the other types are added explicitly
+_TYPE_FILTERS = [None, {"$type": "number"}, {"$type": "string"}, {"$type": "date"}]
+
+def _type_rank(value) -> int:
+    if value is None:
+        return 0
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return 1
+    if isinstance(value, str):
+        return 2
+    if isinstance(value, datetime):
+        return 3
+    raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def after_cursor(sort_key: str, value, last_id, direction: int = -1) -> dict:
+    """Filter for the rows that follow (value, last_id) in (sort_key, id) order"""
+    op = "$lt" if direction < 0 else "$gt"
+    rank = _type_rank(value)
+    if value is None:
+        clauses = [{sort_key: None, "id": {op: last_id}}]
+    else:
+        clauses = [{sort_key: {op: value}}, {sort_key: value, "id": {op: last_id}}]
+    later = range(rank) if direction < 0 else range(rank + 1, len(_TYPE_FILTERS))
+    clauses += [{sort_key: _TYPE_FILTERS[r]} for r in later]
+    return {"$or": clauses}
+
+async def paginate(
+    collection: str,
+    query: dict,
+    sort_key: str = "created_at",
+    direction: int = -1,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    projection: Optional[dict] = None
+) -> dict:
+    """Fetch one page of `collection` ordered by (sort_key, id).
+
+    Returns {"items", "next_cursor", "limit"}; next_cursor is None on the last page.
+    Documents must carry `id` (forced into the projection along with `sort_key`).
+    Rows whose sort key is null, missing, or of another type (ISO strings next to
+    datetimes) are paged in Mongo's cross-type order, see after_cursor()."""
+    limit = clamp_limit(limit)
+    projection = dict(projection) if projection is not None else {"_id": 0}
+    if any(value for key, value in projection.items() if key != "_id"):
+        projection.update({sort_key: 1, "id": 1})
+
+    page_query = query
+    if cursor:
+        value, last_id = decode_cursor(cursor)
+        page_query = {"$and": [query, after_cursor(sort_key, value, last_id, direction)]}
+
+    docs = await db[collection].find(page_query, projection).sort(
+        [(sort_key, direction), ("id", direction)]
+    ).limit(limit + 1).to_list(limit + 1)
+
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        last = docs[-1]
+        next_cursor = encode_cursor(last.get(sort_key), last.get("id"))
+
+    return {"items": docs, "next_cursor": next_cursor, "limit": limit}
@@ -2,9 +2,10 @@
 Phase 2 Routes - Messaging, Resources, Gamification
 """
 from fastapi import APIRouter, HTTPException, Depends
-from typing import List
+from typing import List, Optional
 from models import Message, Conversation, Activity, ResourceArticle, Badge, ChildBadge, ChildStreak
 from parent_routes import verify_parent_token
+from pagination import paginate
 import logging
 import uuid
 from datetime import datetime, timezone
@@ -39,9 +40,12 @@ async def get_parent_conversations(current_user: dict = Depends(verify_parent_to
 @router.get("/parent/messages/{conversation_id}")
 async def get_conversation_messages(
     conversation_id: str,
+    limit: int = 50,
+    cursor: Optional[str] = None,
     current_user: dict = Depends(verify_parent_token)
 ):
-    """Get all messages in a conversation"""
+    """Get messages in a conversation: the newest page first, each page in chronological
+    order; `next_cursor` loads the page of older messages"""
     try:
         parent_id = current_user['id']
         
@@ -55,10 +59,8 @@ async def get_conversation_messages(
             raise HTTPException(status_code=404, detail="Conversation not found")
         
         # Get messages
-        messages = await db.messages.find(
-            {"conversation_id": conversation_id},
-            {"_id": 0}
-        ).sort("created_at", 1).to_list(1000)
+        page = await paginate("messages", {"conversation_id": conversation_id}, "created_at", -1, limit, cursor)
+        messages = page["items"][::-1]
         
         # Mark as read for parent
         await db.messages.update_many(
@@ -76,7 +78,12 @@ async def get_conversation_messages(
             {"$set": {"unread_count_parent": 0}}
         )
         
-        return {"messages": messages, "conversation": conversation}
+        return {
+            "messages": messages,
+            "conversation": conversation,
+            "next_cursor": page["next_cursor"],
+            "limit": page["limit"]
+        }
     except HTTPException:
         raise
     except Exception as e:
@@ -8,6 +8,8 @@ from models import (
     GroupSession, SessionRegistration
 )
 from parent_routes import verify_parent_token
+from pagination import paginate
+import rollups
 import logging
 import uuid
 from datetime import datetime, timezone, timedelta
@@ -79,10 +81,11 @@ async def create_mood_entry(
             "notes": notes,
             "triggers": triggers if triggers else [],
             "logged_date": logged_date,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         }
         
         await db.mood_entries.insert_one(entry)
+        await rollups.record_mood(entry, child.get('school'))
         
         return {"success": True, "entry": {
             "id": entry["id"],
@@ -257,22 +260,26 @@ async def update_goal_progress(
 async def get_forum_posts(
     category: Optional[str] = None,
     limit: int = 50,
+    cursor: Optional[str] = None,
     current_user: dict = Depends(verify_parent_token)
 ):
-    """Get forum posts (all anonymous)"""
+    """Get forum posts (all anonymous, cursor-paginated, newest first)"""
     try:
         query = {}
         if category:
             query["category"] = category
         
-        posts = await db.forum_posts.find(query, {"_id": 0}).sort("created_at", -1).limit(limit).to_list(limit)
+        page = await paginate("forum_posts", query, "created_at", -1, limit, cursor)
+        posts = page["items"]
         
         # Replace parent_id with "Anonymous Parent" for display
         for post in posts:
             post["author"] = "Anonymous Parent"
             post.pop("parent_id", None)
         
-        return {"posts": posts}
+        return {"posts": posts, "next_cursor": page["next_cursor"], "limit": page["limit"]}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching forum posts: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to load forum posts")
@@ -317,21 +324,23 @@ async def create_forum_post(
 @router.get("/forum/posts/{post_id}/comments")
 async def get_post_comments(
     post_id: str,
+    limit: int = 50,
+    cursor: Optional[str] = None,
     current_user: dict = Depends(verify_parent_token)
 ):
-    """Get all comments for a post"""
+    """Get comments for a post (cursor-paginated, oldest first)"""
     try:
-        comments = await db.forum_comments.find(
-            {"post_id": post_id},
-            {"_id": 0}
-        ).sort("created_at", 1).to_list(1000)
+        page = await paginate("forum_comments", {"post_id": post_id}, "created_at", 1, limit, cursor)
+        comments = page["items"]
         
         # Replace parent_id with "Anonymous Parent"
         for comment in comments:
             comment["author"] = "Anonymous Parent"
             comment.pop("parent_id", None)
         
-        return {"comments": comments}
+        return {"comments": comments, "next_cursor": page["next_cursor"], "limit": page["limit"]}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching comments: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to load comments")
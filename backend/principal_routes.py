@@ -1,10 +1,19 @@
 """
 Principal Routes - Authentication, School Overview, Analytics
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta, timezone
+from date_ranges import parse_datetime, month_range, range_filter, month_key
+from loaders import EntityLoaders, get_loaders
+from status_counts import count_by_status
+from pagination import paginate
+import school_scope
+import search
+import trends
+import status_counts
+import asyncio
 import logging
 
 router = APIRouter()
@@ -89,41 +98,43 @@ async def get_principal_dashboard(token: str):
         user = verify_principal_token(token)
         principal_id = user['id']
         
-        # Get principal details
-        principal = await db.principals.find_one({"id": principal_id}, {"_id": 0, "hashed_password": 0})
-        if not principal:
+        # Get principal details and school scope
+        scope = await school_scope.get_scope(principal_id)
+        if not scope:
             raise HTTPException(status_code=404, detail="Principal not found")
         
-        school = principal.get('school', '')
+        principal = scope['principal']
+        school = scope['school']
+        child_ids = scope['child_ids']
         
-        # Get all children from this school
+        # Overview children from this school
         children = await db.children.find(
             {"school": school},
             {"_id": 0}
-        ).to_list(1000)
+        ).limit(10).to_list(10)
         
         # Get all observers working with this school
-        observer_ids = list(set([c.get('observer_id') for c in children if c.get('observer_id')]))
         observers = await db.observers.find(
-            {"id": {"$in": observer_ids}},
+            {"id": {"$in": scope['observer_ids']}},
             {"_id": 0, "hashed_password": 0}
         ).to_list(100)
         
         # Get recent appointments
-        child_ids = [c['id'] for c in children]
         recent_appointments = await db.appointments.find(
             {"child_id": {"$in": child_ids}},
             {"_id": 0}
         ).sort("scheduled_date", -1).limit(20).to_list(20)
         
         # Calculate statistics
-        total_students = len(children)
-        active_students = len([c for c in children if c.get('status') == 'active'])
+        total_students = len(scope['children'])
+        active_students = len([c for c in scope['children'] if c.get('status') == 'active'])
         total_observers = len(observers)
         
         # Appointments this month
-        current_month = datetime.now(timezone.utc).strftime("%Y-%m")
-        appointments_this_month = len([a for a in recent_appointments if a.get('scheduled_date', '').startswith(current_month)])
+        appointments_this_month = await db.appointments.count_documents({
+            "child_id": {"$in": child_ids},
+            "scheduled_date": range_filter(*month_range())
+        })
         
         return {
             "principal": principal,
@@ -147,21 +158,23 @@ async def get_principal_dashboard(token: str):
 # ==================== SCHOOL MANAGEMENT ====================
 
 @router.get("/principal/students")
-async def get_all_students(token: str):
-    """Get all students in the school"""
+async def get_all_students(token: str, limit: int = 50, cursor: str = None):
+    """Get students in the school (cursor-paginated, by name)"""
     try:
         user = verify_principal_token(token)
         
-        principal = await db.principals.find_one({"id": user['id']}, {"_id": 0})
+        principal = await school_scope.get_principal(user['id'])
         if not principal:
             raise HTTPException(status_code=404, detail="Principal not found")
         
-        children = await db.children.find(
-            {"school": principal.get('school', '')},
-            {"_id": 0}
-        ).to_list(1000)
+        page = await paginate("children", {"school": principal.get('school', '')}, "name", 1, limit, cursor)
         
-        return {"students": children, "school": principal.get('school')}
+        return {
+            "students": page["items"],
+            "school": principal.get('school'),
+            "next_cursor": page["next_cursor"],
+            "limit": page["limit"]
+        }
     except HTTPException:
         raise
     except Exception as e:
@@ -174,28 +187,20 @@ async def get_all_observers(token: str):
     try:
         user = verify_principal_token(token)
         
-        principal = await db.principals.find_one({"id": user['id']}, {"_id": 0})
-        if not principal:
+        scope = await school_scope.get_scope(user['id'])
+        if not scope:
             raise HTTPException(status_code=404, detail="Principal not found")
         
-        # Get children from this school to find observer IDs
-        children = await db.children.find(
-            {"school": principal.get('school', '')},
-            {"_id": 0, "observer_id": 1}
-        ).to_list(1000)
-        
-        observer_ids = list(set([c.get('observer_id') for c in children if c.get('observer_id')]))
-        
         observers = await db.observers.find(
-            {"id": {"$in": observer_ids}},
+            {"id": {"$in": scope['observer_ids']}},
             {"_id": 0, "hashed_password": 0}
         ).to_list(100)
         
         # Add student count for each observer
         for observer in observers:
-            observer['student_count'] = len([c for c in children if c.get('observer_id') == observer['id']])
+            observer['student_count'] = len(scope['observer_children'].get(observer['id'], []))
         
-        return {"observers": observers, "school": principal.get('school')}
+        return {"observers": observers, "school": scope['school']}
     except HTTPException:
         raise
     except Exception as e:
@@ -210,15 +215,13 @@ async def get_school_analytics(token: str):
     try:
         user = verify_principal_token(token)
         
-        principal = await db.principals.find_one({"id": user['id']}, {"_id": 0})
-        if not principal:
+        scope = await school_scope.get_scope(user['id'])
+        if not scope:
             raise HTTPException(status_code=404, detail="Principal not found")
         
-        school = principal.get('school', '')
-        
-        # Get all children
-        children = await db.children.find({"school": school}, {"_id": 0}).to_list(1000)
-        child_ids = [c['id'] for c in children]
+        school = scope['school']
+        children = scope['children']
+        child_ids = scope['child_ids']
         
         # Appointments data
         all_appointments = await db.appointments.find(
@@ -286,6 +289,47 @@ async def get_school_analytics(token: str):
         logger.error(f"Analytics error: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to load analytics")
 
+@router.get("/principal/trends")
+async def get_school_trends(
+    token: str,
+    days: int = 30,
+    window: int = 7,
+    observer_id: str = None,
+    child_ids: str = None,
+    loaders: EntityLoaders = Depends(get_loaders)
+):
+    """School-wide mood, energy, engagement and tag trends - per child and for the cohort.
+    Narrow with observer_id or comma-separated child_ids."""
+    try:
+        user = verify_principal_token(token)
+
+        scope = await school_scope.get_scope(user['id'])
+        if not scope:
+            raise HTTPException(status_code=404, detail="Principal not found")
+
+        if child_ids:
+            requested = [cid.strip() for cid in child_ids.split(",") if cid.strip()]
+            denied = [cid for cid in requested if cid not in scope['child_id_set']]
+            if denied:
+                raise HTTPException(status_code=404, detail=f"Student not found in your school: {', '.join(denied)}")
+        elif observer_id:
+            requested = scope['observer_children'].get(observer_id, [])
+        else:
+            requested = scope['child_ids']
+
+        result = await trends.get_trends(requested, days, window)
+
+        children = await loaders.load_many("children", list(result["children"]), {"_id": 0, "name": 1})
+        for child_trends, child in zip(result["children"].values(), children):
+            child_trends["child_name"] = child.get('name') if child else None
+
+        return result
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Trends error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to load trends")
+
 # ==================== STUDENT-OBSERVER ASSIGNMENT ====================
 
 @router.get("/principal/students/unassigned")
@@ -293,7 +337,7 @@ async def get_unassigned_students(token: str):
     """Get students not assigned to any observer"""
     try:
         user = verify_principal_token(token)
-        principal = await db.principals.find_one({"id": user['id']}, {"_id": 0})
+        principal = await school_scope.get_principal(user['id'])
         if not principal:
             raise HTTPException(status_code=404, detail="Principal not found")
         
@@ -314,7 +358,7 @@ async def assign_student_to_observer(student_id: str, observer_id: str, token: s
     """Assign a student to an observer"""
     try:
         user = verify_principal_token(token)
-        principal = await db.principals.find_one({"id": user['id']}, {"_id": 0})
+        principal = await school_scope.get_principal(user['id'])
         if not principal:
             raise HTTPException(status_code=404, detail="Principal not found")
         
@@ -337,6 +381,7 @@ async def assign_student_to_observer(student_id: str, observer_id: str, token: s
                 "observer_assigned_by": user['id']
             }}
         )
+        school_scope.invalidate_school(student.get('school'))
         
         # Create assignment log
         await db.assignment_logs.insert_one({
@@ -368,7 +413,7 @@ async def unassign_student_from_observer(student_id: str, token: str):
     """Remove observer assignment from a student"""
     try:
         user = verify_principal_token(token)
-        principal = await db.principals.find_one({"id": user['id']}, {"_id": 0})
+        principal = await school_scope.get_principal(user['id'])
         if not principal:
             raise HTTPException(status_code=404, detail="Principal not found")
         
@@ -380,6 +425,7 @@ async def unassign_student_from_observer(student_id: str, token: str):
             {"id": student_id},
             {"$set": {"observer_id": None, "observer_assigned_at": None, "observer_assigned_by": None}}
         )
+        school_scope.invalidate_school(student.get('school'))
         
         return {"success": True, "message": f"{student.get('name', 'Student')} unassigned from observer"}
     except HTTPException:
@@ -393,7 +439,7 @@ async def get_available_observers(token: str):
     """Get all available observers for assignment"""
     try:
         user = verify_principal_token(token)
-        principal = await db.principals.find_one({"id": user['id']}, {"_id": 0})
+        principal = await school_scope.get_principal(user['id'])
         if not principal:
             raise HTTPException(status_code=404, detail="Principal not found")
         
@@ -419,65 +465,88 @@ async def get_available_observers(token: str):
 
 # ==================== OBSERVER PERFORMANCE ====================
 
+async def aggregate_observer_metrics(observer_ids, child_ids, since):
+    """Session, red-flag and escalation metrics for many observers in three grouped queries.
+    Returns {observer_id: {total_sessions, recent_sessions, average_rating, red_flags, escalations}}"""
+    if not observer_ids:
+        return {}
+    
+    sessions_pipeline = [
+        {"$match": {"observer_id": {"$in": observer_ids}, "child_id": {"$in": child_ids}}},
+        {"$group": {
+            "_id": "$observer_id",
+            "total_sessions": {"$sum": 1},
+            "recent_sessions": {"$sum": {"$cond": [{"$gt": ["$created_at", since]}, 1, 0]}},
+            # $avg skips nulls, so unrated (missing / 0) sessions do not drag the average down
+            "average_rating": {"$avg": {"$cond": [{"$gt": ["$rating", 0]}, "$rating", None]}}
+        }}
+    ]
+    red_flags_pipeline = [
+        {"$match": {"observer_id": {"$in": observer_ids}}},
+        {"$group": {"_id": "$observer_id", "count": {"$sum": 1}}}
+    ]
+    escalations_pipeline = [
+        {"$match": {"created_by": {"$in": observer_ids}}},
+        {"$group": {"_id": "$created_by", "count": {"$sum": 1}}}
+    ]
+    
+    session_rows, red_flag_rows, escalation_rows = await asyncio.gather(
+        db.session_logs.aggregate(sessions_pipeline).to_list(None),
+        db.red_flags.aggregate(red_flags_pipeline).to_list(None),
+        db.incidents.aggregate(escalations_pipeline).to_list(None)
+    )
+    
+    metrics = {obs_id: {"total_sessions": 0, "recent_sessions": 0, "average_rating": 0, "red_flags": 0, "escalations": 0}
+               for obs_id in observer_ids}
+    for row in session_rows:
+        metrics[row['_id']].update({
+            "total_sessions": row['total_sessions'],
+            "recent_sessions": row['recent_sessions'],
+            "average_rating": round(row['average_rating'], 1) if row.get('average_rating') else 0
+        })
+    for row in red_flag_rows:
+        metrics[row['_id']]["red_flags"] = row['count']
+    for row in escalation_rows:
+        metrics[row['_id']]["escalations"] = row['count']
+    return metrics
+
 @router.get("/principal/observer-performance")
 async def get_observer_performance(token: str):
     """Get performance metrics for all observers in the school"""
     try:
         user = verify_principal_token(token)
-        principal = await db.principals.find_one({"id": user['id']}, {"_id": 0})
-        if not principal:
+        scope = await school_scope.get_scope(user['id'])
+        if not scope:
             raise HTTPException(status_code=404, detail="Principal not found")
         
-        school = principal.get('school', '')
-        
-        # Get children from this school
-        children = await db.children.find({"school": school}, {"_id": 0}).to_list(1000)
-        child_ids = [c['id'] for c in children]
-        observer_ids = list(set([c.get('observer_id') for c in children if c.get('observer_id')]))
+        school = scope['school']
+        child_ids = scope['child_ids']
         
         # Get observers
         observers = await db.observers.find(
-            {"id": {"$in": observer_ids}},
+            {"id": {"$in": scope['observer_ids']}},
             {"_id": 0, "hashed_password": 0}
-        ).to_list(100)
+        ).to_list(None)
+        
+        since = datetime.now(timezone.utc) - timedelta(days=30)
+        metrics_by_observer = await aggregate_observer_metrics([o['id'] for o in observers], child_ids, since)
         
         performance_data = []
         
         for observer in observers:
             obs_id = observer['id']
-            
-            # Get sessions by this observer
-            sessions = await db.session_logs.find(
-                {"observer_id": obs_id, "child_id": {"$in": child_ids}},
-                {"_id": 0}
-            ).to_list(1000)
-            
-            # Get observer's students
-            obs_students = [c for c in children if c.get('observer_id') == obs_id]
-            
-            # Calculate metrics
-            total_sessions = len(sessions)
-            last_30_days = datetime.now(timezone.utc) - timedelta(days=30)
-            recent_sessions = [s for s in sessions if s.get('created_at', '') >= last_30_days.isoformat()]
-            
-            # Average session rating (if available)
-            ratings = [s.get('rating', 0) for s in sessions if s.get('rating')]
-            avg_rating = round(sum(ratings) / len(ratings), 1) if ratings else 0
+            metrics = metrics_by_observer.get(obs_id, {})
+            assigned_students = len(scope['observer_children'].get(obs_id, []))
+            total_sessions = metrics.get('total_sessions', 0)
             
             # Consistency score (sessions per week average)
-            if total_sessions > 0 and obs_students:
-                expected_weekly = len(obs_students) * 5  # 5 sessions per student per week
-                actual_weekly = len(recent_sessions) / 4  # Last 4 weeks
-                consistency = min(100, round((actual_weekly / expected_weekly) * 100)) if expected_weekly > 0 else 0
+            if total_sessions > 0 and assigned_students:
+                expected_weekly = assigned_students * 5  # 5 sessions per student per week
+                actual_weekly = metrics.get('recent_sessions', 0) / 4  # Last 4 weeks
+                consistency = min(100, round((actual_weekly / expected_weekly) * 100))
             else:
                 consistency = 0
             
-            # Red flags raised
-            red_flags = await db.red_flags.count_documents({"observer_id": obs_id})
-            
-            # Escalations
-            escalations = await db.incidents.count_documents({"created_by": obs_id})
-            
             performance_data.append({
                 "observer": {
                     "id": obs_id,
@@ -486,13 +555,13 @@ async def get_observer_performance(token: str):
                     "specialization": observer.get('specialization', '')
                 },
                 "metrics": {
-                    "assigned_students": len(obs_students),
+                    "assigned_students": assigned_students,
                     "total_sessions": total_sessions,
-                    "sessions_last_30_days": len(recent_sessions),
-                    "average_rating": avg_rating,
+                    "sessions_last_30_days": metrics.get('recent_sessions', 0),
+                    "average_rating": metrics.get('average_rating', 0),
                     "consistency_score": consistency,
-                    "red_flags_raised": red_flags,
-                    "escalations": escalations
+                    "red_flags_raised": metrics.get('red_flags', 0),
+                    "escalations": metrics.get('escalations', 0)
                 },
                 "status": "excellent" if consistency >= 80 else "good" if consistency >= 60 else "needs_attention"
             })
@@ -521,7 +590,7 @@ async def get_observer_details(observer_id: str, token: str):
     """Get detailed information about a specific observer"""
     try:
         user = verify_principal_token(token)
-        principal = await db.principals.find_one({"id": user['id']}, {"_id": 0})
+        principal = await school_scope.get_principal(user['id'])
         if not principal:
             raise HTTPException(status_code=404, detail="Principal not found")
         
@@ -568,11 +637,11 @@ async def get_observer_details(observer_id: str, token: str):
 # ==================== PARENT CONSULTATIONS ====================
 
 @router.get("/principal/consultations")
-async def get_consultations(token: str, status: str = None):
+async def get_consultations(token: str, status: str = None, loaders: EntityLoaders = Depends(get_loaders)):
     """Get all parent consultations"""
     try:
         user = verify_principal_token(token)
-        principal = await db.principals.find_one({"id": user['id']}, {"_id": 0})
+        principal = await school_scope.get_principal(user['id'])
         if not principal:
             raise HTTPException(status_code=404, detail="Principal not found")
         
@@ -583,26 +652,28 @@ async def get_consultations(token: str, status: str = None):
         consultations = await db.consultations.find(query, {"_id": 0}).sort("scheduled_date", -1).to_list(500)
         
         # Enrich with parent and child info
-        for consultation in consultations:
+        parents, children = await asyncio.gather(
+            loaders.load_many("parents", [c.get('parent_id') for c in consultations]),
+            loaders.load_many("children", [c.get('child_id') for c in consultations])
+        )
+        for consultation, parent, child in zip(consultations, parents, children):
             if consultation.get('parent_id'):
-                parent = await db.parents.find_one({"id": consultation['parent_id']}, {"_id": 0, "hashed_password": 0})
                 consultation['parent'] = parent
             if consultation.get('child_id'):
-                child = await db.children.find_one({"id": consultation['child_id']}, {"_id": 0})
                 consultation['child'] = child
         
         # Count by status
-        status_counts = {
-            "scheduled": await db.consultations.count_documents({"principal_id": user['id'], "status": "scheduled"}),
-            "completed": await db.consultations.count_documents({"principal_id": user['id'], "status": "completed"}),
-            "cancelled": await db.consultations.count_documents({"principal_id": user['id'], "status": "cancelled"}),
-            "pending_approval": await db.consultations.count_documents({"principal_id": user['id'], "status": "pending_approval"})
-        }
+        counts = await count_by_status(
+            "consultations",
+            {"principal_id": user['id']},
+            ["scheduled", "completed", "cancelled", "pending_approval"],
+            scope=user['id']
+        )
         
         return {
             "consultations": consultations,
             "total": len(consultations),
-            "status_counts": status_counts
+            "status_counts": counts
         }
     except HTTPException:
         raise
@@ -623,7 +694,7 @@ async def create_consultation(
     """Schedule a new parent consultation"""
     try:
         user = verify_principal_token(token)
-        principal = await db.principals.find_one({"id": user['id']}, {"_id": 0})
+        principal = await school_scope.get_principal(user['id'])
         if not principal:
             raise HTTPException(status_code=404, detail="Principal not found")
         
@@ -636,6 +707,10 @@ async def create_consultation(
         if not child:
             raise HTTPException(status_code=404, detail="Child not found")
         
+        scheduled_at = parse_datetime(scheduled_date)
+        if not scheduled_at:
+            raise HTTPException(status_code=400, detail="Invalid scheduled_date")
+        
         consultation_id = f"cons_{datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')}_{child_id[:6]}"
         
         consultation = {
@@ -648,7 +723,7 @@ async def create_consultation(
             "child_id": child_id,
             "child_name": child.get('name', ''),
             "school": principal.get('school', ''),
-            "scheduled_date": scheduled_date,
+            "scheduled_date": scheduled_at,
             "scheduled_time": scheduled_time,
             "consultation_type": consultation_type,  # progress_review, concern_discussion, general
             "status": "scheduled",
@@ -656,10 +731,11 @@ async def create_consultation(
             "meeting_link": "",  # Can be added later
             "summary": "",
             "action_items": [],
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         }
         
         await db.consultations.insert_one(consultation)
+        status_counts.invalidate("consultations")
         
         return {
             "success": True,
@@ -700,7 +776,7 @@ async def update_consultation(
         if status:
             update_data["status"] = status
             if status == "completed":
-                update_data["completed_at"] = datetime.now(timezone.utc).isoformat()
+                update_data["completed_at"] = datetime.now(timezone.utc)
         if summary:
             update_data["summary"] = summary
         if action_items:
@@ -711,6 +787,7 @@ async def update_consultation(
             update_data["notes"] = notes
         
         await db.consultations.update_one({"id": consultation_id}, {"$set": update_data})
+        status_counts.invalidate("consultations")
         
         return {"success": True, "message": "Consultation updated"}
     except HTTPException:
@@ -737,6 +814,7 @@ async def cancel_consultation(consultation_id: str, token: str, reason: str = ""
                 "cancellation_reason": reason
             }}
         )
+        status_counts.invalidate("consultations")
         
         return {"success": True, "message": "Consultation cancelled"}
     except HTTPException:
@@ -746,11 +824,11 @@ async def cancel_consultation(consultation_id: str, token: str, reason: str = ""
         raise HTTPException(status_code=500, detail="Failed to cancel consultation")
 
 @router.get("/principal/consultation-requests")
-async def get_consultation_requests(token: str):
+async def get_consultation_requests(token: str, loaders: EntityLoaders = Depends(get_loaders)):
     """Get consultation requests from parents"""
     try:
         user = verify_principal_token(token)
-        principal = await db.principals.find_one({"id": user['id']}, {"_id": 0})
+        principal = await school_scope.get_principal(user['id'])
         if not principal:
             raise HTTPException(status_code=404, detail="Principal not found")
         
@@ -761,12 +839,14 @@ async def get_consultation_requests(token: str):
         ).sort("created_at", -1).to_list(100)
         
         # Enrich with parent and child info
-        for request in requests:
+        parents, children = await asyncio.gather(
+            loaders.load_many("parents", [r.get('parent_id') for r in requests]),
+            loaders.load_many("children", [r.get('child_id') for r in requests])
+        )
+        for request, parent, child in zip(requests, parents, children):
             if request.get('parent_id'):
-                parent = await db.parents.find_one({"id": request['parent_id']}, {"_id": 0, "hashed_password": 0})
                 request['parent'] = parent
             if request.get('child_id'):
-                child = await db.children.find_one({"id": request['child_id']}, {"_id": 0})
                 request['child'] = child
         
         return {"requests": requests, "total": len(requests)}
@@ -786,7 +866,7 @@ async def approve_consultation_request(
     """Approve a consultation request and schedule it"""
     try:
         user = verify_principal_token(token)
-        principal = await db.principals.find_one({"id": user['id']}, {"_id": 0})
+        principal = await school_scope.get_principal(user['id'])
         if not principal:
             raise HTTPException(status_code=404, detail="Principal not found")
         
@@ -794,6 +874,10 @@ async def approve_consultation_request(
         if not request:
             raise HTTPException(status_code=404, detail="Request not found")
         
+        scheduled_at = parse_datetime(scheduled_date)
+        if not scheduled_at:
+            raise HTTPException(status_code=400, detail="Invalid scheduled_date")
+        
         # Create the consultation
         consultation_id = f"cons_{datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')}_{request['child_id'][:6]}"
         
@@ -807,16 +891,17 @@ async def approve_consultation_request(
             "child_id": request['child_id'],
             "child_name": request.get('child_name', ''),
             "school": principal.get('school', ''),
-            "scheduled_date": scheduled_date,
+            "scheduled_date": scheduled_at,
             "scheduled_time": scheduled_time,
             "consultation_type": request.get('consultation_type', 'general'),
             "status": "scheduled",
             "notes": request.get('notes', ''),
             "request_id": request_id,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         }
         
         await db.consultations.insert_one(consultation)
+        status_counts.invalidate("consultations")
         
         # Update request status
         await db.consultation_requests.update_one(
@@ -839,19 +924,22 @@ async def approve_consultation_request(
 # ==================== SESSION RECORDINGS REVIEW ====================
 
 @router.get("/principal/session-recordings")
-async def get_session_recordings(token: str, status: str = None, observer_id: str = None):
-    """Get session recordings for review"""
+async def get_session_recordings(
+    token: str,
+    status: str = None,
+    observer_id: str = None,
+    limit: int = 50,
+    cursor: str = None,
+    loaders: EntityLoaders = Depends(get_loaders)
+):
+    """Get session recordings for review (cursor-paginated, newest first)"""
     try:
         user = verify_principal_token(token)
-        principal = await db.principals.find_one({"id": user['id']}, {"_id": 0})
-        if not principal:
+        scope = await school_scope.get_scope(user['id'])
+        if not scope:
             raise HTTPException(status_code=404, detail="Principal not found")
         
-        school = principal.get('school', '')
-        
-        # Get children from this school
-        children = await db.children.find({"school": school}, {"_id": 0}).to_list(1000)
-        child_ids = [c['id'] for c in children]
+        child_ids = scope['child_ids']
         
         # Build query for session recordings
         query = {"child_id": {"$in": child_ids}}
@@ -860,29 +948,35 @@ async def get_session_recordings(token: str, status: str = None, observer_id: st
         if observer_id:
             query["observer_id"] = observer_id
         
-        recordings = await db.session_recordings.find(query, {"_id": 0}).sort("created_at", -1).to_list(500)
+        page = await paginate("session_recordings", query, "created_at", -1, limit, cursor)
+        recordings = page["items"]
         
         # Enrich with observer and child info
-        for rec in recordings:
+        observers, rec_children = await asyncio.gather(
+            loaders.load_many("observers", [r.get('observer_id') for r in recordings], {"_id": 0, "id": 1, "name": 1}),
+            loaders.load_many("children", [r.get('child_id') for r in recordings], {"_id": 0, "id": 1, "name": 1, "age": 1})
+        )
+        for rec, observer, child in zip(recordings, observers, rec_children):
             if rec.get('observer_id'):
-                observer = await db.observers.find_one({"id": rec['observer_id']}, {"_id": 0, "hashed_password": 0})
                 rec['observer'] = {"id": observer.get('id'), "name": observer.get('name')} if observer else None
             if rec.get('child_id'):
-                child = await db.children.find_one({"id": rec['child_id']}, {"_id": 0})
                 rec['child'] = {"id": child.get('id'), "name": child.get('name'), "age": child.get('age')} if child else None
         
         # Count by status
-        status_counts = {
-            "pending_review": await db.session_recordings.count_documents({"child_id": {"$in": child_ids}, "review_status": "pending_review"}),
-            "reviewed": await db.session_recordings.count_documents({"child_id": {"$in": child_ids}, "review_status": "reviewed"}),
-            "flagged": await db.session_recordings.count_documents({"child_id": {"$in": child_ids}, "review_status": "flagged"}),
-            "approved": await db.session_recordings.count_documents({"child_id": {"$in": child_ids}, "review_status": "approved"})
-        }
+        counts = await count_by_status(
+            "session_recordings",
+            {"child_id": {"$in": child_ids}},
+            ["pending_review", "reviewed", "flagged", "approved"],
+            field="review_status",
+            scope=user['id']
+        )
         
         return {
             "recordings": recordings,
-            "total": len(recordings),
-            "status_counts": status_counts
+            "total": await db.session_recordings.count_documents(query),
+            "status_counts": counts,
+            "next_cursor": page["next_cursor"],
+            "limit": page["limit"]
         }
     except HTTPException:
         raise
@@ -917,6 +1011,7 @@ async def review_session_recording(
             update_data["rating"] = rating
         
         await db.session_recordings.update_one({"id": recording_id}, {"$set": update_data})
+        status_counts.invalidate("session_recordings")
         
         return {"success": True, "message": f"Recording marked as {review_status}"}
     except HTTPException:
@@ -928,20 +1023,16 @@ async def review_session_recording(
 # ==================== DAILY REPORTS REVIEW ====================
 
 @router.get("/principal/daily-reports")
-async def get_daily_reports(token: str, date: str = None, observer_id: str = None, status: str = None):
+async def get_daily_reports(token: str, date: str = None, observer_id: str = None, status: str = None, loaders: EntityLoaders = Depends(get_loaders)):
     """Get daily reports from observers for review"""
     try:
         user = verify_principal_token(token)
-        principal = await db.principals.find_one({"id": user['id']}, {"_id": 0})
-        if not principal:
+        scope = await school_scope.get_scope(user['id'])
+        if not scope:
             raise HTTPException(status_code=404, detail="Principal not found")
         
-        school = principal.get('school', '')
-        
-        # Get children from this school
-        children = await db.children.find({"school": school}, {"_id": 0}).to_list(1000)
-        child_ids = [c['id'] for c in children]
-        observer_ids = list(set([c.get('observer_id') for c in children if c.get('observer_id')]))
+        child_ids = scope['child_ids']
+        observer_ids = scope['observer_ids']
         
         # Build query
         query = {"$or": [{"child_id": {"$in": child_ids}}, {"observer_id": {"$in": observer_ids}}]}
@@ -955,22 +1046,25 @@ async def get_daily_reports(token: str, date: str = None, observer_id: str = Non
         reports = await db.daily_reports.find(query, {"_id": 0}).sort("created_at", -1).to_list(500)
         
         # Enrich with observer and child info
-        for report in reports:
+        observers, report_children = await asyncio.gather(
+            loaders.load_many("observers", [r.get('observer_id') for r in reports], {"_id": 0, "id": 1, "name": 1}),
+            loaders.load_many("children", [r.get('child_id') for r in reports], {"_id": 0, "id": 1, "name": 1})
+        )
+        for report, observer, child in zip(reports, observers, report_children):
             if report.get('observer_id'):
-                observer = await db.observers.find_one({"id": report['observer_id']}, {"_id": 0, "hashed_password": 0})
                 report['observer'] = {"id": observer.get('id'), "name": observer.get('name')} if observer else None
             if report.get('child_id'):
-                child = await db.children.find_one({"id": report['child_id']}, {"_id": 0})
                 report['child'] = {"id": child.get('id'), "name": child.get('name')} if child else None
         
         # Count by status
         base_query = {"$or": [{"child_id": {"$in": child_ids}}, {"observer_id": {"$in": observer_ids}}]}
-        status_counts = {
-            "pending_review": await db.daily_reports.count_documents({**base_query, "review_status": "pending_review"}),
-            "reviewed": await db.daily_reports.count_documents({**base_query, "review_status": "reviewed"}),
-            "flagged": await db.daily_reports.count_documents({**base_query, "review_status": "flagged"}),
-            "approved": await db.daily_reports.count_documents({**base_query, "review_status": "approved"})
-        }
+        counts = await count_by_status(
+            "daily_reports",
+            base_query,
+            ["pending_review", "reviewed", "flagged", "approved"],
+            field="review_status",
+            scope=user['id']
+        )
         
         # Get AI insights summary
         ai_insights = await db.ai_reports.find(
@@ -981,7 +1075,7 @@ async def get_daily_reports(token: str, date: str = None, observer_id: str = Non
         return {
             "reports": reports,
             "total": len(reports),
-            "status_counts": status_counts,
+            "status_counts": counts,
             "ai_insights": ai_insights
         }
     except HTTPException:
@@ -1014,6 +1108,7 @@ async def review_daily_report(
                 "principal_feedback": feedback
             }}
         )
+        status_counts.invalidate("daily_reports")
         
         return {"success": True, "message": f"Report marked as {review_status}"}
     except HTTPException:
@@ -1029,15 +1124,16 @@ async def get_business_summary(token: str, period: str = "month"):
     """Get business summary - how much business the principal has generated"""
     try:
         user = verify_principal_token(token)
-        principal = await db.principals.find_one({"id": user['id']}, {"_id": 0})
-        if not principal:
+        scope = await school_scope.get_scope(user['id'])
+        if not scope:
             raise HTTPException(status_code=404, detail="Principal not found")
         
-        school = principal.get('school', '')
+        principal = scope['principal']
+        school = scope['school']
         
-        # Get children and their subscription info
-        children = await db.children.find({"school": school}, {"_id": 0}).to_list(1000)
-        child_ids = [c['id'] for c in children]
+        # Children and their subscription info
+        children = scope['children']
+        child_ids = scope['child_ids']
         
         # Calculate business metrics
         total_children = len(children)
@@ -1053,10 +1149,10 @@ async def get_business_summary(token: str, period: str = "month"):
         total_monthly_revenue = sum([s.get('monthly_amount', 0) for s in subscriptions])
         
         # Get sessions this month
-        current_month = datetime.now(timezone.utc).strftime("%Y-%m")
+        this_month = range_filter(*month_range())
         sessions_this_month = await db.session_logs.count_documents({
             "child_id": {"$in": child_ids},
-            "created_at": {"$regex": f"^{current_month}"}
+            "created_at": this_month
         })
         
         # Principal's earnings (from consultations)
@@ -1064,13 +1160,12 @@ async def get_business_summary(token: str, period: str = "month"):
         consultations_completed = await db.consultations.count_documents({
             "principal_id": user['id'],
             "status": "completed",
-            "completed_at": {"$regex": f"^{current_month}"}
+            "completed_at": this_month
         })
         principal_earnings = consultations_completed * principal_rate
         
         # Get observers under this principal
-        observer_ids = list(set([c.get('observer_id') for c in children if c.get('observer_id')]))
-        observers = await db.observers.find({"id": {"$in": observer_ids}}, {"_id": 0, "hashed_password": 0}).to_list(100)
+        observers = await db.observers.find({"id": {"$in": scope['observer_ids']}}, {"_id": 0, "hashed_password": 0}).to_list(100)
         
         return {
             "principal": {
@@ -1106,19 +1201,19 @@ async def get_observer_payments(token: str, month: str = None):
     """Get payment details for all observers under this principal"""
     try:
         user = verify_principal_token(token)
-        principal = await db.principals.find_one({"id": user['id']}, {"_id": 0})
-        if not principal:
+        scope = await school_scope.get_scope(user['id'])
+        if not scope:
             raise HTTPException(status_code=404, detail="Principal not found")
         
-        school = principal.get('school', '')
-        
-        # Get children and their observers
-        children = await db.children.find({"school": school}, {"_id": 0}).to_list(1000)
-        child_ids = [c['id'] for c in children]
-        observer_ids = list(set([c.get('observer_id') for c in children if c.get('observer_id')]))
+        # Children and their observers
+        observer_ids = scope['observer_ids']
         
         if not month:
             month = datetime.now(timezone.utc).strftime("%Y-%m")
+        try:
+            month_filter = range_filter(*month_range(month))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid month, expected YYYY-MM")
         
         payment_data = []
         
@@ -1128,11 +1223,11 @@ async def get_observer_payments(token: str, month: str = None):
                 continue
             
             # Get sessions by this observer for the month
-            obs_children = [c['id'] for c in children if c.get('observer_id') == obs_id]
+            obs_children = scope['observer_children'].get(obs_id, [])
             sessions = await db.session_logs.find({
                 "observer_id": obs_id,
                 "child_id": {"$in": obs_children},
-                "created_at": {"$regex": f"^{month}"}
+                "created_at": month_filter
             }, {"_id": 0}).to_list(1000)
             
             # Calculate earnings
@@ -1191,7 +1286,7 @@ async def get_principal_earnings(token: str, period: str = "all"):
     """Get principal's own earnings from consultations"""
     try:
         user = verify_principal_token(token)
-        principal = await db.principals.find_one({"id": user['id']}, {"_id": 0})
+        principal = await school_scope.get_principal(user['id'])
         if not principal:
             raise HTTPException(status_code=404, detail="Principal not found")
         
@@ -1200,8 +1295,7 @@ async def get_principal_earnings(token: str, period: str = "all"):
         # Get completed consultations
         query = {"principal_id": user['id'], "status": "completed"}
         if period != "all":
-            current_month = datetime.now(timezone.utc).strftime("%Y-%m")
-            query["completed_at"] = {"$regex": f"^{current_month}"}
+            query["completed_at"] = range_filter(*month_range())
         
         consultations = await db.consultations.find(query, {"_id": 0}).sort("completed_at", -1).to_list(1000)
         
@@ -1221,7 +1315,7 @@ async def get_principal_earnings(token: str, period: str = "all"):
         # Monthly breakdown
         monthly_data = {}
         for cons in consultations:
-            month = cons.get('completed_at', '')[:7]
+            month = month_key(cons.get('completed_at'))
             if month:
                 if month not in monthly_data:
                     monthly_data[month] = {"consultations": 0, "earnings": 0}
@@ -1248,3 +1342,40 @@ async def get_principal_earnings(token: str, period: str = "all"):
     except Exception as e:
         logger.error(f"Principal earnings error: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to load earnings")
+
+# ==================== SEARCH ====================
+
+@router.get("/principal/search")
+async def search_school_notes(
+    token: str,
+    q: str,
+    kind: str = None,
+    limit: int = 20,
+    cursor: str = None,
+    loaders: EntityLoaders = Depends(get_loaders)
+):
+    """Full-text search over session notes and daily reports of the school's children"""
+    try:
+        user = verify_principal_token(token)
+        
+        scope = await school_scope.get_scope(user['id'])
+        if not scope:
+            raise HTTPException(status_code=404, detail="Principal not found")
+        
+        page = await search.search(q, scope['child_ids'], kind, limit, cursor)
+        
+        name_only = {"_id": 0, "name": 1}
+        children, observers = await asyncio.gather(
+            loaders.load_many("children", [r["child_id"] for r in page["results"]], name_only),
+            loaders.load_many("observers", [r["observer_id"] for r in page["results"]], name_only)
+        )
+        for result, child, observer in zip(page["results"], children, observers):
+            result["child_name"] = child.get('name') if child else None
+            result["observer_name"] = observer.get('name') if observer else None
+        
+        return page
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Search error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Search failed")
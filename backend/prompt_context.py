@@ -0,0 +1,129 @@
+"""
+Prompt Context - Token-budgeted packing of child data into LLM prompts
+- Token counts come from tiktoken with the model's own encoding; if the encoding
+  cannot be loaded (e.g. no network for the first download) a chars/4 estimate is used
+- Sections are filled in priority order: items go in whole, or trimmed when a
+  useful remainder fits, and lower-priority sections get whatever budget is left
+- Repeated notes are collapsed into one line with a count instead of repeating them
+- build_context() reports tokens, items kept and items dropped per section
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "gpt-4o-mini"
+REPORT_CONTEXT_TOKENS = int(os.environ.get('REPORT_CONTEXT_TOKENS', '1500'))
+ANALYSIS_CONTEXT_TOKENS = int(os.environ.get('ANALYSIS_CONTEXT_TOKENS', '1200'))
+# Don't bother trimming an item into less than this
+MIN_TRIMMED_TOKENS = 12
+
+_encodings: Dict[str, object] = {}
+
+def _encoding(model: str):
+    if model not in _encodings:
+        try:
+            import tiktoken
+            try:
+                _encodings[model] = tiktoken.encoding_for_model(model)
+            except KeyError:
+                _encodings[model] = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            logger.warning(f"tiktoken encoding unavailable for {model}, estimating tokens: {str(e)}")
+            _encodings[model] = None
+    return _encodings[model]
+
+def count_tokens(text: str, model: str = DEFAULT_MODEL) -> int:
+    if not text:
+        return 0
+    encoding = _encoding(model)
+    if encoding is None:
+        return max(1, len(text) // 4)
+    return len(encoding.encode(text))
+
+def truncate_tokens(text: str, max_tokens: int, model: str = DEFAULT_MODEL) -> str:
+    """Cut `text` to at most `max_tokens` tokens, marking the cut with an ellipsis"""
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text, model) <= max_tokens:
+        return text
+    encoding = _encoding(model)
+    if encoding is None:
+        return text[:max(max_tokens - 1, 0) * 4].rstrip() + "…"
+    return encoding.decode(encoding.encode(text)[:max_tokens - 1]).rstrip() + "…"
+
+def _normalise(text: str) -> str:
+    # Only case, whitespace and punctuation are folded; numbers and non-ASCII letters
+    # carry meaning ("slept 2 hours" vs "slept 8 hours", notes in other languages)
+    return re.sub(r"[\W_]+", " ", text.casefold()).strip()
+
+def dedupe(items: Iterable[str]) -> List[str]:
+    """Collapse notes that differ only in case, whitespace or punctuation; keeps first-seen order"""
+    counts, firsts = {}, {}
+    for item in items:
+        if not item or not item.strip():
+            continue
+        key = _normalise(item)
+        if key not in counts:
+            counts[key] = 0
+            firsts[key] = item.strip()
+        counts[key] += 1
+    return [f"{firsts[key]} (noted {n} times)" if n > 1 else firsts[key] for key, n in counts.items()]
+
+def section(
+    name: str,
+    items: Iterable[str],
+    priority: int,
+    max_tokens: Optional[int] = None,
+    item_tokens: Optional[int] = None,
+    empty: str = "- None recorded",
+    bullet: str = "- ",
+    deduplicate: bool = True
+) -> dict:
+    """Describe one prompt section. Items should be ordered most relevant first;
+    lower `priority` values are filled first."""
+    return {
+        "name": name,
+        "items": dedupe(items) if deduplicate else [i for i in items if i],
+        "priority": priority,
+        "max_tokens": max_tokens,
+        "item_tokens": item_tokens,
+        "empty": empty,
+        "bullet": bullet
+    }
+
+def build_context(sections: List[dict], budget: int, model: str = DEFAULT_MODEL) -> Tuple[Dict[str, str], dict]:
+    """Pack sections into `budget` tokens.
+
+    Returns ({name: rendered text}, stats) where stats has the budget, tokens used and
+    per-section {"tokens", "items", "dropped"}."""
+    remaining = budget
+    rendered, stats = {}, {}
+    for sec in sorted(sections, key=lambda s: s["priority"]):
+        cap = remaining if sec["max_tokens"] is None else min(remaining, sec["max_tokens"])
+        lines, used = [], 0
+        for item in sec["items"]:
+            text = truncate_tokens(item, sec["item_tokens"], model) if sec["item_tokens"] else item
+            line = f"{sec['bullet']}{text}"
+            tokens = count_tokens(line + "\n", model)
+            if used + tokens > cap:
+                room = cap - used - count_tokens(sec["bullet"] + "\n", model)
+                if room >= MIN_TRIMMED_TOKENS:
+                    line = f"{sec['bullet']}{truncate_tokens(text, room, model)}"
+                    tokens = count_tokens(line + "\n", model)
+                    lines.append(line)
+                    used += tokens
+                break
+            lines.append(line)
+            used += tokens
+        remaining -= used
+        if lines:
+            rendered[sec["name"]] = "\n".join(lines)
+        elif sec["items"]:
+            rendered[sec["name"]] = f"{sec['bullet']}({len(sec['items'])} entries omitted for length)"
+        else:
+            rendered[sec["name"]] = sec["empty"]
+        stats[sec["name"]] = {"tokens": used, "items": len(lines), "dropped": len(sec["items"]) - len(lines)}
+    return rendered, {"budget": budget, "used": budget - remaining, "sections": stats}
@@ -0,0 +1,137 @@
+"""
+Report Cache - Content-addressed cache and single-flight for AI report generation
+- Key is a SHA-256 of everything the LLM would see (prompt, system message, model)
+  plus the report identity (kind, child, observer, period); unchanged inputs never
+  pay for a second completion
+- Concurrent identical requests in this process share one in-flight generation
+- `force` bypasses the cached result (the fresh one replaces it)
+- lookup()/store() for callers that produce the result themselves (streaming)
+- Hits, misses, coalesced and forced requests are counted per day in
+  db.report_cache_stats, with an estimate of the tokens saved
+"""
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from date_ranges import day_key
+from rollups import window_start
+import asyncio
+import hashlib
+import json
+import logging
+import os
+
+db = None
+logger = logging.getLogger(__name__)
+
+# Cached reports are dropped after this many days (TTL index on created_at)
+REPORT_CACHE_TTL_DAYS = int(os.environ.get('REPORT_CACHE_TTL_DAYS', '30'))
+# Rough chars-per-token ratio for the savings estimate
+CHARS_PER_TOKEN = 4
+
+# key -> in-flight generation task
+_inflight: Dict[str, asyncio.Task] = {}
+
+def set_database(database):
+    """Set the database instance from main server"""
+    global db
+    db = database
+
+def cache_key(kind: str, inputs: dict) -> str:
+    """Stable hash of the report kind and its generation inputs"""
+    raw = json.dumps({"kind": kind, **inputs}, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+async def _record(kind: str, outcome: str, tokens_saved: int = 0):
+    inc = {outcome: 1}
+    if tokens_saved:
+        inc["tokens_saved"] = tokens_saved
+    try:
+        await db.report_cache_stats.update_one(
+            {"day": day_key(datetime.now(timezone.utc)), "kind": kind},
+            {"$inc": inc},
+            upsert=True
+        )
+    except Exception as e:
+        logger.error(f"Report cache stats update failed: {str(e)}")
+
+def _estimate_tokens(inputs: dict, result: dict) -> int:
+    text_len = len(inputs.get("prompt", "")) + len(inputs.get("system", "")) + len(result.get("content", ""))
+    return text_len // CHARS_PER_TOKEN
+
+async def _store(kind: str, key: str, inputs: dict, result: dict):
+    await db.report_cache.update_one(
+        {"key": key},
+        {"$set": {
+            "key": key,
+            "kind": kind,
+            "child_id": inputs.get("child_id"),
+            "result": result,
+            "tokens_estimate": _estimate_tokens(inputs, result),
+            "created_at": datetime.now(timezone.utc)
+        }},
+        upsert=True
+    )
+
+async def _generate_and_store(kind: str, key: str, inputs: dict, generate: Callable[[], Awaitable[dict]]) -> dict:
+    result = await generate()
+    await _store(kind, key, inputs, result)
+    return result
+
+async def lookup(kind: str, inputs: dict) -> Optional[dict]:
+    """Cached result for these inputs (counted as a hit), or None"""
+    cached = await db.report_cache.find_one(
+        {"key": cache_key(kind, inputs)}, {"_id": 0, "result": 1, "tokens_estimate": 1}
+    )
+    if not cached:
+        return None
+    await _record(kind, "hits", cached.get("tokens_estimate", 0))
+    return cached["result"]
+
+async def store(kind: str, inputs: dict, result: dict, force: bool = False):
+    """Cache a result generated outside get_or_generate (counted as a miss)"""
+    await _store(kind, cache_key(kind, inputs), inputs, result)
+    await _record(kind, "forced" if force else "misses")
+
+async def get_or_generate(
+    kind: str,
+    inputs: dict,
+    generate: Callable[[], Awaitable[dict]],
+    force: bool = False
+) -> Tuple[dict, bool]:
+    """Return (result, cached). `generate` is only awaited on a miss (or with `force`)
+    and must return a JSON-serialisable dict; exceptions propagate and are not cached."""
+    key = cache_key(kind, inputs)
+
+    if not force:
+        cached = await lookup(kind, inputs)
+        if cached:
+            return cached, True
+
+    task = _inflight.get(key)
+    if task:
+        result = await asyncio.shield(task)
+        await _record(kind, "coalesced", _estimate_tokens(inputs, result))
+        return result, True
+
+    task = asyncio.ensure_future(_generate_and_store(kind, key, inputs, generate))
+    _inflight[key] = task
+    try:
+        result = await asyncio.shield(task)
+    finally:
+        if task.done():
+            _inflight.pop(key, None)
+        else:
+            task.add_done_callback(lambda _: _inflight.pop(key, None))
+    await _record(kind, "forced" if force else "misses")
+    return result, False
+
+async def get_stats(days: int = 30) -> dict:
+    """Outcome totals per report kind over the last `days` days"""
+    totals = {}
+    async for row in db.report_cache_stats.find({"day": {"$gte": window_start(days)}}, {"_id": 0}):
+        kind = totals.setdefault(row["kind"], {"hits": 0, "coalesced": 0, "misses": 0, "forced": 0, "tokens_saved": 0})
+        for field in kind:
+            kind[field] += row.get(field, 0)
+    for kind in totals.values():
+        requests = kind["hits"] + kind["coalesced"] + kind["misses"] + kind["forced"]
+        kind["hit_rate"] = round((kind["hits"] + kind["coalesced"]) / requests, 3) if requests else 0
+    return totals
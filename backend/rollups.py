@@ -0,0 +1,233 @@
+"""
+Daily Rollups - Materialised per-day counters for analytics
+- One row per (day, scope, key) in db.daily_rollups; scopes are "all", "school",
+  "observer" and "child"
+- Maintained incrementally: write paths call record_* which issue atomic $inc
+  upserts (one bulk_write round-trip per event)
+- Analytics read O(days) rows instead of scanning session_logs / enrollments
+- rebuild() recomputes a window from the source collections (backfill / repair)
+
+Days are UTC ("YYYY-MM-DD", see date_ranges.day_key). Run a full backfill with
+`python rollups.py [--days N]`; the server backfills in the background at startup
+when the collection is still empty.
+"""
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne, ReplaceOne
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+from date_ranges import day_key
+import argparse
+import asyncio
+import logging
+import os
+
+db = None
+logger = logging.getLogger(__name__)
+
+COLLECTION = "daily_rollups"
+BATCH_SIZE = 500
+COUNTERS = ("sessions", "completed_sessions", "enrollments")
+MOOD_FIELDS = ("session_moods", "moods")
+
+def set_database(database):
+    """Set the database instance from main server"""
+    global db
+    db = database
+
+def _mood_key(mood) -> str:
+    """Mood labels become sub-document keys - keep them valid field names"""
+    label = str(mood or "unknown").strip().lower()
+    return label.replace(".", "_").replace("$", "_") or "unknown"
+
+def _scopes(school=None, observer_id=None, child_id=None) -> List[tuple]:
+    scopes = [("all", "all")]
+    if school:
+        scopes.append(("school", school))
+    if observer_id:
+        scopes.append(("observer", observer_id))
+    if child_id:
+        scopes.append(("child", child_id))
+    return scopes
+
+async def _increment(when, inc: Dict[str, int], **scope):
+    day = day_key(when or datetime.now(timezone.utc))
+    if not day:
+        return
+    ops = [
+        UpdateOne(
+            {"day": day, "scope": kind, "key": key},
+            {"$inc": inc, "$set": {"updated_at": datetime.now(timezone.utc)}},
+            upsert=True
+        )
+        for kind, key in _scopes(**scope)
+    ]
+    try:
+        await db[COLLECTION].bulk_write(ops, ordered=False)
+    except Exception as e:
+        # Analytics must never fail the write that triggered them; rebuild() repairs drift
+        logger.error(f"Rollup update failed for {day}: {str(e)}")
+
+# ==================== INCREMENTAL UPDATES ====================
+
+async def record_session(session: dict, school: Optional[str] = None):
+    """A new session log was created"""
+    inc = {"sessions": 1}
+    if session.get("mood_observed"):
+        inc[f"session_moods.{_mood_key(session['mood_observed'])}"] = 1
+    await _increment(
+        session.get("created_at"), inc,
+        school=school, observer_id=session.get("observer_id"), child_id=session.get("child_id")
+    )
+
+async def record_session_completed(session: dict, school: Optional[str] = None, mood: Optional[str] = None):
+    """A session moved to "completed" - counted on the day the session was opened"""
+    inc = {"completed_sessions": 1}
+    if mood:
+        inc[f"session_moods.{_mood_key(mood)}"] = 1
+    await _increment(
+        session.get("created_at") or session.get("started_at"), inc,
+        school=school, observer_id=session.get("observer_id"), child_id=session.get("child_id")
+    )
+
+async def record_enrollment(enrollment: dict):
+    await _increment(
+        enrollment.get("created_at"), {"enrollments": 1},
+        school=enrollment.get("school"), child_id=enrollment.get("student_id")
+    )
+
+async def record_mood(entry: dict, school: Optional[str] = None):
+    await _increment(
+        entry.get("created_at"), {f"moods.{_mood_key(entry.get('mood'))}": 1},
+        school=school, observer_id=entry.get("observer_id"), child_id=entry.get("child_id")
+    )
+
+# ==================== READS ====================
+
+def window_start(days: int) -> str:
+    """First day key of a window of `days` days ending today"""
+    days = max(int(days or 1), 1)
+    return (datetime.now(timezone.utc) - timedelta(days=days - 1)).date().isoformat()
+
+async def get_rows(scope: str, days: int, key: Optional[str] = None) -> List[dict]:
+    """Rollup rows of one scope for the last `days` days, oldest first"""
+    query = {"scope": scope, "day": {"$gte": window_start(days)}}
+    if key is not None:
+        query["key"] = key
+    return await db[COLLECTION].find(query, {"_id": 0, "updated_at": 0}).sort("day", 1).to_list(None)
+
+def merge(rows: List[dict]) -> dict:
+    """Sum counters and mood maps of several rows"""
+    total = {counter: 0 for counter in COUNTERS}
+    total.update({field: {} for field in MOOD_FIELDS})
+    for row in rows:
+        for counter in COUNTERS:
+            total[counter] += row.get(counter, 0)
+        for field in MOOD_FIELDS:
+            for mood, count in (row.get(field) or {}).items():
+                total[field][mood] = total[field].get(mood, 0) + count
+    return total
+
+# ==================== BACKFILL ====================
+
+def _add(rows: dict, when, inc: Dict[str, int], **scope):
+    day = day_key(when)
+    if not day:
+        return
+    for kind, key in _scopes(**scope):
+        row = rows.setdefault((day, kind, key), {})
+        for field, value in inc.items():
+            if "." in field:
+                parent, child = field.split(".", 1)
+                row.setdefault(parent, {})
+                row[parent][child] = row[parent].get(child, 0) + value
+            else:
+                row[field] = row.get(field, 0) + value
+
+async def rebuild(days: Optional[int] = None, batch_size: int = BATCH_SIZE) -> int:
+    """Recompute rollups from source collections (all history, or the last `days` days).
+
+    Rows in the window are replaced wholesale. Events written while the rebuild runs
+    may be counted twice or missed - run it off-peak, or re-run it for the window."""
+    since = None
+    if days:
+        start = window_start(days)
+        since = datetime.fromisoformat(start).replace(tzinfo=timezone.utc)
+
+    schools = {}
+    async for child in db.children.find({}, {"_id": 0, "id": 1, "school": 1}):
+        schools[child.get("id")] = child.get("school")
+
+    rows: Dict[tuple, dict] = {}
+    created = {"created_at": {"$gte": since}} if since else {}
+
+    async for s in db.session_logs.find(
+        created, {"_id": 0, "created_at": 1, "started_at": 1, "observer_id": 1, "child_id": 1,
+                  "status": 1, "mood_observed": 1}
+    ).batch_size(batch_size):
+        when = s.get("created_at") or s.get("started_at")
+        scope = {"school": schools.get(s.get("child_id")), "observer_id": s.get("observer_id"),
+                 "child_id": s.get("child_id")}
+        inc = {"sessions": 1}
+        if s.get("status") == "completed":
+            inc["completed_sessions"] = 1
+        if s.get("mood_observed"):
+            inc[f"session_moods.{_mood_key(s['mood_observed'])}"] = 1
+        _add(rows, when, inc, **scope)
+
+    async for e in db.enrollments.find(
+        created, {"_id": 0, "created_at": 1, "school": 1, "student_id": 1}
+    ).batch_size(batch_size):
+        _add(rows, e.get("created_at"), {"enrollments": 1}, school=e.get("school"), child_id=e.get("student_id"))
+
+    async for m in db.mood_entries.find(
+        created, {"_id": 0, "created_at": 1, "observer_id": 1, "child_id": 1, "mood": 1}
+    ).batch_size(batch_size):
+        _add(rows, m.get("created_at"), {f"moods.{_mood_key(m.get('mood'))}": 1},
+             school=schools.get(m.get("child_id")), observer_id=m.get("observer_id"), child_id=m.get("child_id"))
+
+    now = datetime.now(timezone.utc)
+    ops = [
+        ReplaceOne(
+            {"day": day, "scope": kind, "key": key},
+            {"day": day, "scope": kind, "key": key, **counters, "updated_at": now},
+            upsert=True
+        )
+        for (day, kind, key), counters in rows.items()
+    ]
+    for i in range(0, len(ops), batch_size):
+        await db[COLLECTION].bulk_write(ops[i:i + batch_size], ordered=False)
+
+    # Rows in the window that no longer have any source events
+    stale = {"updated_at": {"$lt": now}}
+    if since:
+        stale["day"] = {"$gte": window_start(days)}
+    await db[COLLECTION].delete_many(stale)
+
+    logger.info(f"Rollups rebuilt: {len(rows)} rows")
+    return len(rows)
+
+async def backfill_if_empty():
+    """Startup hook - seed rollups once for databases that predate them"""
+    try:
+        if await db[COLLECTION].find_one({}, {"_id": 1}) is None:
+            await rebuild()
+    except Exception as e:
+        logger.error(f"Rollup backfill failed: {str(e)}")
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, default=None, help="only rebuild the last N days")
+    args = parser.parse_args()
+
+    load_dotenv()
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], tz_aware=True)
+    set_database(client[os.environ['DB_NAME']])
+
+    count = await rebuild(args.days)
+    print(f"✓ {COLLECTION}: {count} rows rebuilt")
+
+    client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
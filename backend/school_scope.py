@@ -0,0 +1,83 @@
+"""
+School Scope - Cached principal -> school -> children/observers resolution
+- One lookup per principal instead of re-reading every child of the school per request
+- Per-school cache with explicit invalidation from the write paths that change it
+  (student enrollment/update, principal and observer assignment)
+- A TTL bounds staleness across worker processes
+"""
+from typing import Dict, Optional
+import logging
+import os
+import time
+
+db = None
+logger = logging.getLogger(__name__)
+
+SCHOOL_SCOPE_TTL = float(os.environ.get('SCHOOL_SCOPE_TTL_SECONDS', '300'))
+
+# Only what the principal routes aggregate on - full documents are fetched where displayed
+CHILD_SCOPE_FIELDS = {"_id": 0, "id": 1, "observer_id": 1, "status": 1, "age": 1, "subscription_type": 1}
+
+# principal_id -> (expires_at, principal doc)
+_principals: Dict[str, tuple] = {}
+# school -> (expires_at, scope dict)
+_schools: Dict[str, tuple] = {}
+
+def set_database(database):
+    """Set the database instance from main server"""
+    global db
+    db = database
+
+async def _load_school(school: str) -> dict:
+    children = await db.children.find({"school": school}, CHILD_SCOPE_FIELDS).to_list(None)
+    observer_children = {}
+    for child in children:
+        if child.get('observer_id'):
+            observer_children.setdefault(child['observer_id'], []).append(child['id'])
+    child_ids = [c['id'] for c in children]
+    return {
+        "school": school,
+        "children": children,
+        "child_ids": child_ids,
+        "child_id_set": frozenset(child_ids),
+        "observer_ids": list(observer_children.keys()),
+        "observer_children": observer_children
+    }
+
+async def get_school(school: str) -> dict:
+    """Scope of a school: compact children, child_ids and observer_ids (treat as read-only)"""
+    cached = _schools.get(school)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+    scope = await _load_school(school)
+    _schools[school] = (time.monotonic() + SCHOOL_SCOPE_TTL, scope)
+    return scope
+
+async def get_principal(principal_id: str) -> Optional[dict]:
+    """Principal document (without password hash), cached"""
+    cached = _principals.get(principal_id)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+    principal = await db.principals.find_one({"id": principal_id}, {"_id": 0, "hashed_password": 0})
+    if principal:
+        _principals[principal_id] = (time.monotonic() + SCHOOL_SCOPE_TTL, principal)
+    return principal
+
+async def get_scope(principal_id: str) -> Optional[dict]:
+    """Principal plus the scope of their school; None if the principal does not exist"""
+    principal = await get_principal(principal_id)
+    if not principal:
+        return None
+    scope = await get_school(principal.get('school', ''))
+    return {**scope, "principal": principal}
+
+def invalidate_school(school: Optional[str]):
+    _schools.pop(school or '', None)
+
+def invalidate_principal(principal_id: str):
+    _principals.pop(principal_id, None)
+
+def invalidate_all():
+    """For writes whose previous school is unknown (e.g. a student moving schools)"""
+    _schools.clear()
+    _principals.clear()
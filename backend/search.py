@@ -0,0 +1,271 @@
+"""
+Search - Full-text search over session notes, concerns and observations
+- One denormalised document per searchable record in db.search_docs (session logs
+  and daily reports), kept current by the write paths via index_*()
+- A weighted Mongo text index (concerns and observations above general notes)
+  does stemming, ranking and stop words server-side
+- Callers pass the role scope as child ids (observer: own children, principal:
+  the school's children, see school_scope)
+- Results are ranked by text score with keyset cursors on (score, id) and carry
+  highlighted snippets of the matching fields. Words match exactly or as known
+  suffix variants (worried ~ worry) since Mongo's Snowball stems aren't exposed;
+  a result with no highlighted word falls back to the first line of its first
+  non-empty field
+- rebuild() reindexes from the source collections (`python search.py`); the server
+  backfills at startup when the index is still empty
+"""
+from motor.motor_asyncio import AsyncIOMotorClient
+from fastapi import HTTPException
+from pymongo import ReplaceOne
+from datetime import datetime, timezone
+from typing import List, Optional
+from dotenv import load_dotenv
+from pagination import clamp_limit, decode_cursor, encode_cursor
+import argparse
+import asyncio
+import html
+import logging
+import os
+import re
+
+db = None
+logger = logging.getLogger(__name__)
+
+COLLECTION = "search_docs"
+BATCH_SIZE = 500
+SNIPPET_CHARS = 160
+KINDS = ("session_log", "daily_report")
+SEARCH_FIELDS = ("notes", "concerns", "observations")
+TEXT_WEIGHTS = {"notes": 1, "concerns": 3, "observations": 2}
+
+# kind -> search field -> source fields joined into it
+FIELD_MAP = {
+    "session_log": {
+        "notes": ("session_notes", "topics_discussed"),
+        "concerns": ("concerns_noted",),
+        "observations": ("key_observations", "positive_observations"),
+    },
+    "daily_report": {
+        "notes": ("session_summary", "recommendations"),
+        "concerns": ("concerns",),
+        "observations": ("key_observations", "positive_moments"),
+    },
+}
+DATE_FIELD = {"session_log": "session_date", "daily_report": "report_date"}
+SOURCE_COLLECTION = {"session_log": "session_logs", "daily_report": "daily_reports"}
+
+def set_database(database):
+    """Set the database instance from main server"""
+    global db
+    db = database
+
+def _document(kind: str, record: dict) -> Optional[dict]:
+    fields = {
+        name: "\n".join(str(record.get(source)) for source in sources if record.get(source))
+        for name, sources in FIELD_MAP[kind].items()
+    }
+    if not any(fields.values()):
+        return None
+    return {
+        "id": f"{kind}:{record['id']}",
+        "kind": kind,
+        "ref_id": record["id"],
+        "child_id": record.get("child_id"),
+        "observer_id": record.get("observer_id"),
+        "date": record.get(DATE_FIELD[kind]),
+        **fields,
+        "updated_at": datetime.now(timezone.utc)
+    }
+
+async def _index(kind: str, record: dict):
+    try:
+        doc = _document(kind, record)
+        if doc:
+            await db[COLLECTION].replace_one({"id": doc["id"]}, doc, upsert=True)
+        else:
+            await db[COLLECTION].delete_one({"id": f"{kind}:{record['id']}"})
+    except Exception as e:
+        logger.error(f"Search indexing failed for {kind} {record.get('id')}: {str(e)}")
+
+async def index_session_log(session_log: dict):
+    """Call after a session log's text fields are written (pass the full document)"""
+    await _index("session_log", session_log)
+
+async def index_daily_report(report: dict):
+    await _index("daily_report", report)
+
+# ==================== QUERY ====================
+
+_WORD = re.compile(r"[\w']+")
+# Quoted phrases or single words, each optionally negated with a leading "-"
+_QUERY_TOKEN = re.compile(r"""-?"[^"]*"|-?[\w']+""")
+
+_INFLECTIONS = ("ing", "ed", "es", "s")
+
+def _bases(word: str) -> set:
+    """The word plus the forms it could be an inflection of (studies -> study,
+    hoping -> hope, running -> run)"""
+    bases = {word}
+    if len(word) > 4 and word.endswith(("ies", "ied")):
+        bases.add(word[:-3] + "y")
+    for suffix in _INFLECTIONS:
+        stem = word[:-len(suffix)]
+        if not word.endswith(suffix) or len(stem) < 3:
+            continue
+        if suffix == "es" and not stem.endswith(("s", "x", "z", "ch", "sh")):
+            continue
+        bases.add(stem)
+        if suffix in ("ing", "ed"):
+            bases.add(stem + "e")
+            if stem[-1] == stem[-2]:
+                bases.add(stem[:-1])
+    return bases
+
+def _same_stem(word: str, term: str) -> bool:
+    # Only known suffix variants match (worry/worried, class/classes); unrelated
+    # words sharing a prefix (play/plan, car/cart) don't
+    return word == term or bool(_bases(word) & _bases(term))
+
+def query_terms(q: str) -> List[str]:
+    """Lowercased positive words and phrase words of a $text search string"""
+    terms = set()
+    for token in _QUERY_TOKEN.findall(q):
+        if not token.startswith("-"):
+            terms.update(word.lower() for word in _WORD.findall(token) if len(word) > 1)
+    return sorted(terms)
+
+def highlight(text: str, terms: List[str], width: int = SNIPPET_CHARS) -> Optional[str]:
+    """HTML-escaped snippet of `text` around the first matching word, matches in <mark>"""
+    if not text or not terms:
+        return None
+    matches = [m for m in _WORD.finditer(text)
+               if any(_same_stem(m.group(0).lower(), term) for term in terms)]
+    if not matches:
+        return None
+    start = max(0, matches[0].start() - width // 3)
+    end = min(len(text), start + width)
+    parts, cursor = [], start
+    for m in matches:
+        if m.start() < start or m.end() > end:
+            continue
+        parts.append(html.escape(text[cursor:m.start()]))
+        parts.append(f"<mark>{html.escape(m.group(0))}</mark>")
+        cursor = m.end()
+    parts.append(html.escape(text[cursor:end]))
+    return ("…" if start > 0 else "") + "".join(parts).strip() + ("…" if end < len(text) else "")
+
+def first_line(text: str, width: int = SNIPPET_CHARS) -> Optional[str]:
+    """HTML-escaped first line of `text`, cut to `width`"""
+    line = (text or "").strip().split("\n", 1)[0].strip()
+    if not line:
+        return None
+    return html.escape(line[:width]) + ("…" if len(line) > width else "")
+
+async def search(
+    q: str,
+    child_ids: List[str],
+    kind: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None
+) -> dict:
+    """Ranked matches for `q` within `child_ids`. Returns {"results", "next_cursor", "limit"}."""
+    q = (q or "").strip()
+    if not q:
+        raise HTTPException(status_code=400, detail="Search query is required")
+    if kind and kind not in KINDS:
+        raise HTTPException(status_code=400, detail=f"kind must be one of {', '.join(KINDS)}")
+    limit = clamp_limit(limit)
+    match = {"$text": {"$search": q}, "child_id": {"$in": child_ids}}
+    if kind:
+        match["kind"] = kind
+    pipeline = [
+        {"$match": match},
+        {"$addFields": {"score": {"$meta": "textScore"}}},
+    ]
+    if cursor:
+        score, last_id = decode_cursor(cursor)
+        pipeline.append({"$match": {"$or": [
+            {"score": {"$lt": score}},
+            {"score": score, "id": {"$lt": last_id}}
+        ]}})
+    pipeline += [
+        {"$sort": {"score": -1, "id": -1}},
+        {"$limit": limit + 1},
+        {"$project": {"_id": 0, "updated_at": 0}}
+    ]
+    docs = await db[COLLECTION].aggregate(pipeline).to_list(limit + 1)
+
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1]["score"], docs[-1]["id"])
+
+    terms = query_terms(q)
+    results = []
+    for doc in docs:
+        highlights = {field: highlight(doc.get(field), terms) for field in SEARCH_FIELDS}
+        if not any(highlights.values()):
+            # Mongo matched on a stem we didn't recognise; show where the record starts
+            field = next((f for f in SEARCH_FIELDS if first_line(doc.get(f))), None)
+            if field:
+                highlights[field] = first_line(doc.get(field))
+        results.append({
+            "kind": doc["kind"],
+            "id": doc["ref_id"],
+            "child_id": doc.get("child_id"),
+            "observer_id": doc.get("observer_id"),
+            "date": doc.get("date"),
+            "score": round(doc["score"], 3),
+            "highlights": {field: snippet for field, snippet in highlights.items() if snippet}
+        })
+    return {"results": results, "next_cursor": next_cursor, "limit": limit}
+
+# ==================== REBUILD ====================
+
+async def rebuild(batch_size: int = BATCH_SIZE) -> int:
+    """Reindex every session log and daily report"""
+    started = datetime.now(timezone.utc)
+    count = 0
+    for kind in KINDS:
+        projection = {"_id": 0, "id": 1, "child_id": 1, "observer_id": 1, DATE_FIELD[kind]: 1}
+        for sources in FIELD_MAP[kind].values():
+            projection.update({source: 1 for source in sources})
+        ops = []
+        async for record in db[SOURCE_COLLECTION[kind]].find({}, projection).batch_size(batch_size):
+            doc = _document(kind, record) if record.get("id") else None
+            if doc:
+                ops.append(ReplaceOne({"id": doc["id"]}, doc, upsert=True))
+            if len(ops) >= batch_size:
+                await db[COLLECTION].bulk_write(ops, ordered=False)
+                count += len(ops)
+                ops = []
+        if ops:
+            await db[COLLECTION].bulk_write(ops, ordered=False)
+            count += len(ops)
+    # Records deleted or emptied since the last rebuild
+    await db[COLLECTION].delete_many({"updated_at": {"$lt": started}})
+    logger.info(f"Search index rebuilt: {count} documents")
+    return count
+
+async def backfill_if_empty():
+    """Startup hook - index existing records once for databases that predate search"""
+    try:
+        if await db[COLLECTION].find_one({}, {"_id": 1}) is None:
+            await rebuild()
+    except Exception as e:
+        logger.error(f"Search backfill failed: {str(e)}")
+
+async def main():
+    argparse.ArgumentParser(description="Rebuild the full-text search index").parse_args()
+
+    load_dotenv()
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], tz_aware=True)
+    set_database(client[os.environ['DB_NAME']])
+
+    count = await rebuild()
+    print(f"✓ {COLLECTION}: {count} documents indexed")
+
+    client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
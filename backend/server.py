@@ -5,13 +5,16 @@ from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
 import asyncio
-import resend
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict
 from typing import List, Optional
 import uuid
+import hashlib
 from datetime import datetime, timezone
-from emergentintegrations.llm.chat import LlmChat, UserMessage
+import llm_stream
+import llm_gateway
+import llm_backends
+import chat_history
 from admin_routes import router as admin_router
 from admin_management_routes import router as admin_mgmt_router
 from admin_advanced_routes import router as admin_adv_router
@@ -31,44 +34,15 @@ load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, tz_aware=True)
 db = client[os.environ['DB_NAME']]
 
 # Email configuration
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-RESEND_API_KEY = os.environ.get('RESEND_API_KEY', '')
-SENDER_EMAIL = os.environ.get('SENDER_EMAIL', 'onboarding@resend.dev')
 ADMIN_EMAIL = os.environ.get('ADMIN_EMAIL', 'founder@sanjaya.com')
 
-if RESEND_API_KEY and RESEND_API_KEY != 're_placeholder_get_real_key_from_resend':
-    resend.api_key = RESEND_API_KEY
-    logger.info("Resend email service configured")
-else:
-    logger.warning("Resend API key not configured - emails will be logged only")
-
-async def send_email_async(to_email: str, subject: str, html_content: str):
-    """Send email using Resend API (non-blocking)"""
-    if not RESEND_API_KEY or RESEND_API_KEY == 're_placeholder_get_real_key_from_resend':
-        logger.info(f"[EMAIL MOCK] To: {to_email}, Subject: {subject}")
-        return {"status": "mocked", "message": "Email mocked (API key not configured)"}
-    
-    try:
-        params = {
-            "from": SENDER_EMAIL,
-            "to": [to_email],
-            "subject": subject,
-            "html": html_content
-        }
-        
-        email_response = await asyncio.to_thread(resend.Emails.send, params)
-        logger.info(f"Email sent to {to_email}: {email_response.get('id')}")
-        return {"status": "success", "email_id": email_response.get("id")}
-    except Exception as e:
-        logger.error(f"Failed to send email to {to_email}: {str(e)}")
-        return {"status": "error", "message": str(e)}
-
 # Create the main app without a prefix
 app = FastAPI()
 
@@ -207,6 +181,13 @@ async def get_public_get_started_content():
         content['_id'] = str(content['_id'])
     return content or {}
 
+def inquiry_email_key(inquiry: InquirySubmission) -> str:
+    """Outbox key shared by resubmissions of one inquiry (same parent email, child
+    and UTC day), which get new inquiry ids"""
+    day = datetime.now(timezone.utc).date().isoformat()
+    identity = "|".join([inquiry.email.strip().lower(), " ".join(inquiry.child_name.lower().split()), day])
+    return "inquiry:" + hashlib.sha256(identity.encode()).hexdigest()[:24]
+
 @api_router.post("/inquiries")
 async def submit_inquiry(inquiry: InquirySubmission):
     """Public endpoint for submitting Get Started form"""
@@ -227,113 +208,31 @@ async def submit_inquiry(inquiry: InquirySubmission):
         
         await db.inquiries.insert_one(inquiry_doc)
         
-        # Send email notifications
-        # 1. Admin notification
-        admin_html = f"""
-        <html>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-            <div style="max-width: 600px; margin: 0 auto; padding: 20px; background-color: #f9f9f9;">
-                <h2 style="color: #f97316; border-bottom: 2px solid #f97316; padding-bottom: 10px;">
-                    🎉 New Inquiry Received!
-                </h2>
-                
-                <div style="background: white; padding: 20px; border-radius: 8px; margin: 20px 0;">
-                    <h3 style="color: #4f46e5; margin-top: 0;">Parent Information</h3>
-                    <p><strong>Name:</strong> {inquiry.parent_name}</p>
-                    <p><strong>Email:</strong> <a href="mailto:{inquiry.email}">{inquiry.email}</a></p>
-                    <p><strong>Phone:</strong> <a href="tel:{inquiry.phone}">{inquiry.phone}</a></p>
-                </div>
-                
-                <div style="background: white; padding: 20px; border-radius: 8px; margin: 20px 0;">
-                    <h3 style="color: #8b5cf6; margin-top: 0;">Child Information</h3>
-                    <p><strong>Name:</strong> {inquiry.child_name}</p>
-                    <p><strong>Age:</strong> {inquiry.child_age} years</p>
-                    <p><strong>School:</strong> {inquiry.school_name or 'Not provided'}</p>
-                </div>
-                
-                {f'''<div style="background: white; padding: 20px; border-radius: 8px; margin: 20px 0;">
-                    <h3 style="color: #059669; margin-top: 0;">Parent's Message</h3>
-                    <p style="background: #f3f4f6; padding: 15px; border-radius: 5px; border-left: 4px solid #f97316;">
-                        {inquiry.message}
-                    </p>
-                </div>''' if inquiry.message else ''}
-                
-                <div style="background: #fef3c7; padding: 15px; border-radius: 8px; margin: 20px 0;">
-                    <p style="margin: 0;"><strong>📅 Submitted:</strong> {datetime.now(timezone.utc).strftime('%B %d, %Y at %I:%M %p UTC')}</p>
-                    <p style="margin: 10px 0 0 0;"><strong>🆔 Inquiry ID:</strong> {inquiry_doc['id']}</p>
-                </div>
-                
-                <p style="color: #666; font-size: 14px; margin-top: 30px; padding-top: 20px; border-top: 1px solid #ddd;">
-                    Please respond to this inquiry within 24 hours for best parent experience.
-                </p>
-            </div>
-        </body>
-        </html>
-        """
-        
-        # 2. Parent confirmation email
-        parent_html = f"""
-        <html>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-            <div style="max-width: 600px; margin: 0 auto; padding: 20px; background-color: #f9f9f9;">
-                <h2 style="color: #f97316; border-bottom: 2px solid #f97316; padding-bottom: 10px;">
-                    Thank You for Your Interest in Sanjaya!
-                </h2>
-                
-                <div style="background: white; padding: 20px; border-radius: 8px; margin: 20px 0;">
-                    <p>Dear {inquiry.parent_name},</p>
-                    
-                    <p>Thank you for reaching out to us about <strong>{inquiry.child_name}</strong>. We're excited about the opportunity to support your child's emotional growth journey.</p>
-                    
-                    <p><strong>What happens next?</strong></p>
-                    <ol style="color: #666;">
-                        <li>Our team will review your inquiry within 24 hours</li>
-                        <li>We'll contact you at <strong>{inquiry.email}</strong> or <strong>{inquiry.phone}</strong></li>
-                        <li>We'll schedule a call to discuss how Sanjaya can best support {inquiry.child_name}</li>
-                    </ol>
-                </div>
-                
-                <div style="background: #dbeafe; padding: 15px; border-radius: 8px; margin: 20px 0;">
-                    <p style="margin: 0;"><strong>Your Inquiry Details:</strong></p>
-                    <p style="margin: 10px 0 0 0;">Child: {inquiry.child_name}, Age {inquiry.child_age}</p>
-                    {f"<p style='margin: 5px 0 0 0;'>School: {inquiry.school_name}</p>" if inquiry.school_name else ""}
-                    <p style="margin: 5px 0 0 0;">Inquiry ID: {inquiry_doc['id']}</p>
-                </div>
-                
-                <div style="background: white; padding: 20px; border-radius: 8px; margin: 20px 0;">
-                    <p><strong>In the meantime, learn more about Sanjaya:</strong></p>
-                    <ul style="color: #666;">
-                        <li><a href="https://sanjaya-admin.preview.emergentagent.com/about" style="color: #f97316;">Why Sanjaya Exists</a></li>
-                        <li><a href="https://sanjaya-admin.preview.emergentagent.com/how-it-works" style="color: #f97316;">How It Works</a></li>
-                        <li><a href="https://sanjaya-admin.preview.emergentagent.com/faq" style="color: #f97316;">Frequently Asked Questions</a></li>
-                    </ul>
-                </div>
-                
-                <p style="color: #666; font-size: 14px; margin-top: 30px; padding-top: 20px; border-top: 1px solid #ddd;">
-                    If you have any immediate questions, feel free to reply to this email or call us.
-                </p>
-                
-                <p style="color: #666; font-size: 14px;">
-                    Warm regards,<br>
-                    <strong>The Sanjaya Team</strong>
-                </p>
-            </div>
-        </body>
-        </html>
-        """
-        
-        # Send emails asynchronously (non-blocking)
-        asyncio.create_task(send_email_async(
-            ADMIN_EMAIL,
-            f"🎉 New Inquiry: {inquiry.parent_name} for {inquiry.child_name}",
-            admin_html
-        ))
-        
-        asyncio.create_task(send_email_async(
-            inquiry.email,
-            "Thank You for Your Interest in Sanjaya",
-            parent_html
-        ))
+        # Rendered from the precompiled templates (user fields auto-escaped) and delivered
+        # by the email outbox dispatchers (retried, rate limited); the keys keep a retried
+        # or repeated submission from queueing the same emails twice
+        context = {
+            **inquiry_doc,
+            "submitted_at": datetime.now(timezone.utc).strftime('%B %d, %Y at %I:%M %p UTC')
+        }
+        email_key = inquiry_email_key(inquiry)
+        try:
+            admin_subject, admin_html = await email_templates.render("inquiry_admin", context)
+            parent_subject, parent_html = await email_templates.render("inquiry_parent", context)
+            await email_outbox.enqueue(
+                ADMIN_EMAIL,
+                admin_subject,
+                admin_html,
+                key=f"{email_key}:admin"
+            )
+            await email_outbox.enqueue(
+                inquiry.email,
+                parent_subject,
+                parent_html,
+                key=f"{email_key}:parent"
+            )
+        except Exception as e:
+            logger.error(f"Failed to queue inquiry emails for {inquiry.email}: {str(e)}")
         
         logger.info(f"Inquiry submitted and emails queued for {inquiry.email}")
         
@@ -346,22 +245,8 @@ async def submit_inquiry(inquiry: InquirySubmission):
         logger.error(f"Error submitting inquiry: {str(e)}")
         raise HTTPException(status_code=500, detail="Error submitting inquiry")
 
-@api_router.post("/chat", response_model=ChatResponse)
-async def chat(chat_message: ChatMessage):
-    try:
-        # Get or create chat history for this session
-        session = await db.chat_sessions.find_one({"session_id": chat_message.session_id})
-        
-        if not session:
-            # Create new session
-            session = {
-                "session_id": chat_message.session_id,
-                "messages": [],
-                "created_at": datetime.now(timezone.utc)
-            }
-        
-        # System message for the chatbot
-        system_message = """You are a helpful AI assistant for Sanjaya - The Observer, 
+# System message for the chatbot
+CHAT_SYSTEM_MESSAGE = """You are a helpful AI assistant for Sanjaya - The Observer, 
         an educational platform that connects children with caring observers who listen to them daily.
         
         Key information about Sanjaya:
@@ -375,53 +260,54 @@ async def chat(chat_message: ChatMessage):
         
         Answer questions about the program, explain how it works, help users understand which role 
         is right for them, and provide information about the benefits. Be warm, friendly, and helpful."""
-        
-        # Initialize LLM chat
-        emergent_key = os.environ.get('EMERGENT_LLM_KEY')
-        if not emergent_key:
-            raise HTTPException(status_code=500, detail="LLM key not configured")
-        
-        chat_instance = LlmChat(
-            api_key=emergent_key,
-            session_id=chat_message.session_id,
-            system_message=system_message
-        )
-        
+
+def get_llm_key() -> str:
+    emergent_key = os.environ.get('EMERGENT_LLM_KEY')
+    if not emergent_key and llm_backends.is_stub():
+        return "stub"
+    if not emergent_key:
+        raise HTTPException(status_code=500, detail="LLM key not configured")
+    return emergent_key
+
+@api_router.post("/chat", response_model=ChatResponse)
+async def chat(chat_message: ChatMessage):
+    try:
+        history = await chat_history.get_history(chat_message.session_id)
         # Use GPT-4o-mini for cost-effective responses
-        chat_instance.with_model("openai", "gpt-4o-mini")
-        
-        # Create user message
-        user_msg = UserMessage(text=chat_message.message)
-        
-        # Get response from LLM
-        response = await chat_instance.send_message(user_msg)
-        
-        # Save messages to database
-        session["messages"].append({
-            "role": "user",
-            "content": chat_message.message,
-            "timestamp": datetime.now(timezone.utc).isoformat()
-        })
-        session["messages"].append({
-            "role": "assistant",
-            "content": response,
-            "timestamp": datetime.now(timezone.utc).isoformat()
-        })
-        session["updated_at"] = datetime.now(timezone.utc).isoformat()
-        
-        # Update session in database
-        await db.chat_sessions.update_one(
-            {"session_id": chat_message.session_id},
-            {"$set": session},
-            upsert=True
+        response = await llm_gateway.send_message(
+            get_llm_key(),
+            CHAT_SYSTEM_MESSAGE,
+            chat_history.with_history(history, chat_message.message),
+            llm_gateway.INTERACTIVE,
+            session_id=chat_message.session_id
         )
         
+        await chat_history.append_exchange(chat_message.session_id, chat_message.message, response)
+        
         return ChatResponse(response=response, session_id=chat_message.session_id)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error in chat endpoint: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing chat: {str(e)}")
 
+@api_router.post("/chat/stream")
+async def chat_stream(chat_message: ChatMessage):
+    """Streaming variant of /chat (text/event-stream): `token` events, then `done`.
+    The exchange is saved only once the full response has been streamed."""
+    history = await chat_history.get_history(chat_message.session_id)
+    tokens = llm_stream.stream_completion(
+        get_llm_key(), CHAT_SYSTEM_MESSAGE, [*history, {"role": "user", "content": chat_message.message}],
+        llm_gateway.INTERACTIVE
+    )
+    
+    async def finish(response: str):
+        await chat_history.append_exchange(chat_message.session_id, chat_message.message, response)
+        return {"session_id": chat_message.session_id}
+    
+    return llm_stream.sse_response(llm_stream.stream_events(tokens, finish))
+
 # Set database for admin routes
 import admin_routes
 admin_routes.set_database(db)
@@ -474,6 +360,73 @@ admin_management_routes.set_database(db)
 import admin_advanced_routes
 admin_advanced_routes.set_database(db)
 
+# Set database for index registry
+import db_indexes
+db_indexes.set_database(db)
+
+# Set database for request-scoped entity loaders
+import loaders
+loaders.set_database(db)
+
+# Set database for status breakdowns
+import status_counts
+status_counts.set_database(db)
+
+# Set database for cursor pagination
+import pagination
+pagination.set_database(db)
+
+# Set database for cached principal school scope
+import school_scope
+school_scope.set_database(db)
+
+# Set database for datetime migration
+import datetime_migration
+datetime_migration.set_database(db)
+
+# Set database for daily analytics rollups
+import rollups
+rollups.set_database(db)
+
+# Set database for the background job queue
+import job_queue
+job_queue.set_database(db)
+
+# Set database for behavioral profiles
+import behavioral_profiles
+behavioral_profiles.set_database(db)
+
+# Set database for full-text search
+import search
+search.set_database(db)
+
+# Set database for the outbound email outbox
+import email_outbox
+email_outbox.set_database(db)
+
+# Set database for the email template cache
+import email_templates
+email_templates.set_database(db)
+
+# Set database for the Google API client cache
+import google_client
+google_client.set_database(db)
+
+# Set database for the local Gmail mirror
+import gmail_sync
+gmail_sync.set_database(db)
+
+# Set database for the multi-child trend engine
+import trends
+trends.set_database(db)
+
+# Set database for the AI report cache
+import report_cache
+report_cache.set_database(db)
+
+# Set database for capped chat history
+chat_history.set_database(db)
+
 # Include the router in the main app
 app.include_router(api_router)
 app.include_router(admin_router)
@@ -505,6 +458,45 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def ensure_db_indexes():
+    await db_indexes.ensure_indexes()
+
+@app.on_event("startup")
+async def migrate_datetime_fields():
+    # Resumable and idempotent - runs in the background so startup is not blocked
+    asyncio.create_task(datetime_migration.migrate_all())
+
+@app.on_event("startup")
+async def backfill_rollups():
+    # Only seeds an empty rollup collection; `python rollups.py` rebuilds on demand
+    asyncio.create_task(rollups.backfill_if_empty())
+
+@app.on_event("startup")
+async def backfill_search_index():
+    # Only indexes into an empty collection; `python search.py` rebuilds on demand
+    asyncio.create_task(search.backfill_if_empty())
+
+@app.on_event("startup")
+async def start_job_workers():
+    job_queue.start()
+
+@app.on_event("startup")
+async def start_email_dispatchers():
+    email_outbox.start()
+
+@app.on_event("startup")
+async def start_google_token_refresher():
+    google_client.start()
+
+@app.on_event("startup")
+async def start_gmail_sync():
+    gmail_sync.start()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await job_queue.stop()
+    await email_outbox.stop()
+    await gmail_sync.stop()
+    await google_client.stop()
     client.close()
\ No newline at end of file
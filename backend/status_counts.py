@@ -0,0 +1,60 @@
+"""
+Status Counts - Single-pass status breakdowns for list endpoints
+- One $match + $group aggregation instead of a count_documents per status
+- Every expected status is present in the result, zero-filled
+- Optional short-TTL cache keyed by (collection, scope), invalidated on writes
+"""
+from typing import Dict, Iterable, Optional
+import logging
+import os
+import time
+
+db = None
+logger = logging.getLogger(__name__)
+
+STATUS_COUNT_TTL = float(os.environ.get('STATUS_COUNT_TTL_SECONDS', '15'))
+
+# (collection, field, scope) -> (expires_at, counts)
+_cache: Dict[tuple, tuple] = {}
+
+def set_database(database):
+    """Set the database instance from main server"""
+    global db
+    db = database
+
+async def count_by_status(
+    collection: str,
+    match: dict,
+    statuses: Iterable[str],
+    field: str = "status",
+    scope: Optional[str] = None,
+    ttl: Optional[float] = None
+) -> Dict[str, int]:
+    """Count documents matching `match` grouped by `field`.
+
+    `statuses` lists the buckets always returned (zero when empty); other values
+    found in the data are included too. Pass `scope` (e.g. the principal id) to
+    cache the result for `ttl` seconds (default STATUS_COUNT_TTL)."""
+    cache_key = (collection, field, scope) if scope is not None else None
+    if cache_key:
+        cached = _cache.get(cache_key)
+        if cached and cached[0] > time.monotonic():
+            return dict(cached[1])
+
+    counts = {status: 0 for status in statuses}
+    pipeline = [
+        {"$match": match},
+        {"$group": {"_id": f"${field}", "count": {"$sum": 1}}}
+    ]
+    async for row in db[collection].aggregate(pipeline):
+        if row["_id"] is not None:
+            counts[row["_id"]] = row["count"]
+
+    if cache_key:
+        _cache[cache_key] = (time.monotonic() + (STATUS_COUNT_TTL if ttl is None else ttl), counts)
+    return dict(counts)
+
+def invalidate(collection: str, scope: Optional[str] = None):
+    """Drop cached counts for a collection (all scopes unless one is given)"""
+    for key in [k for k in _cache if k[0] == collection and (scope is None or k[2] == scope)]:
+        _cache.pop(key, None)
@@ -0,0 +1,197 @@
+"""
+Trends - Vectorised behavioural and mood time series for many children at once
+- One query per request: a compact projection of session_logs (date, mood, energy,
+  engagement, tags) for every child in scope, loaded into a pandas frame
+- Categorical ratings are mapped to numeric scores (mood 1-5, energy/engagement 1-4);
+  labels outside the vocabulary are logged and counted in `unmapped_labels` rather
+  than silently averaged away
+- Per-child and cohort daily series, rolling averages over a day window and a
+  child x tag frequency matrix, all computed on day x child matrices
+- Output is columnar: one shared `dates` axis and one value list per series, with
+  null for days without sessions
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from date_ranges import day_range
+import numpy as np
+import pandas as pd
+import asyncio
+import logging
+import os
+
+db = None
+logger = logging.getLogger(__name__)
+
+MAX_TREND_DAYS = int(os.environ.get('TREND_MAX_DAYS', '365'))
+DEFAULT_ROLLING_WINDOW = 7
+TOP_TAGS = 10
+METRICS = ("mood", "energy", "engagement")
+
+# Every label the session forms store (ObserverSessionLogs, ObserverActiveSession)
+MOOD_SCORES = {
+    "very_sad": 1,
+    "sad": 2, "anxious": 2, "worried": 2, "upset": 2, "frustrated": 2, "angry": 2, "tired": 2,
+    "neutral": 3, "calm": 3, "okay": 3,
+    "happy": 4, "cheerful": 4, "content": 4, "excited": 4,
+    "very_happy": 5
+}
+# Energy (low/medium/high) and engagement (minimal/moderate/high/very_high) share a scale
+LEVEL_SCORES = {
+    "very_low": 1, "minimal": 1, "low": 1,
+    "medium": 2, "moderate": 2,
+    "high": 3,
+    "very_high": 4
+}
+
+SESSION_COLUMNS = (
+    "child_id", "session_date", "mood_observed", "mood_rating",
+    "energy_level", "engagement_level", "behavioral_tags"
+)
+
+def set_database(database):
+    """Set the database instance from main server"""
+    global db
+    db = database
+
+def clamp_days(days: Optional[int]) -> int:
+    return min(max(int(days or 30), 1), MAX_TREND_DAYS)
+
+def _labels(values: pd.Series) -> pd.Series:
+    return values.astype("string").str.strip().str.lower().replace("", pd.NA)
+
+def _scores(values: pd.Series, scale: Dict[str, int]) -> pd.Series:
+    return _labels(values).map(scale).astype("float64")
+
+def _unmapped(values: pd.Series, scores: pd.Series) -> Dict[str, int]:
+    """Counts of non-empty labels that got no score"""
+    labels = _labels(values)
+    return {str(label): int(count) for label, count in labels[labels.notna() & scores.isna()].value_counts().items()}
+
+def to_frame(session_logs: List[dict]) -> pd.DataFrame:
+    """Session log projections -> one row per session with numeric metric columns"""
+    raw = pd.DataFrame.from_records(session_logs, columns=list(SESSION_COLUMNS))
+    frame = pd.DataFrame({
+        "child_id": raw["child_id"],
+        "day": pd.to_datetime(raw["session_date"], utc=True, errors="coerce", format="ISO8601").dt.floor("D"),
+        # Legacy logs carry a 1-5 mood_rating instead of a mood label
+        "mood": pd.to_numeric(raw["mood_rating"], errors="coerce").fillna(_scores(raw["mood_observed"], MOOD_SCORES)),
+        "energy": _scores(raw["energy_level"], LEVEL_SCORES),
+        "engagement": _scores(raw["engagement_level"], LEVEL_SCORES),
+        "tags": raw["behavioral_tags"]
+    })
+    unmapped = {
+        metric: counts for metric, counts in (
+            ("mood", _unmapped(raw["mood_observed"], frame["mood"])),
+            ("energy", _unmapped(raw["energy_level"], frame["energy"])),
+            ("engagement", _unmapped(raw["engagement_level"], frame["engagement"])),
+        ) if counts
+    }
+    if unmapped:
+        logger.warning(f"Trend sessions with unscored labels (left out of averages): {unmapped}")
+    frame = frame.dropna(subset=["child_id", "day"])
+    frame.attrs["unmapped_labels"] = unmapped
+    return frame
+
+async def load_sessions(child_ids: List[str], days: int) -> pd.DataFrame:
+    """Sessions of the last `days` days for all `child_ids` in a single query"""
+    cutoff_day, _ = day_range((datetime.now(timezone.utc) - timedelta(days=days - 1)).date())
+    session_logs = await db.session_logs.find(
+        {"child_id": {"$in": child_ids}, "session_date": {"$gte": cutoff_day}},
+        {"_id": 0, **{column: 1 for column in SESSION_COLUMNS}}
+    ).to_list(None)
+    return to_frame(session_logs)
+
+def _columns(matrix: pd.DataFrame, digits: int = 2) -> list:
+    """day x child float matrix -> one JSON list per child, None for days without data"""
+    values = np.round(matrix.to_numpy(dtype="float64").T, digits).astype(object)
+    values[pd.isna(values)] = None
+    return values.tolist()
+
+def tag_matrix(frame: pd.DataFrame, child_ids: List[str]) -> pd.DataFrame:
+    """Children x tags counts over the frame (rows in child_ids order, columns by total)"""
+    tags = frame[["child_id", "tags"]].explode("tags", ignore_index=True).dropna(subset=["tags"])
+    if tags.empty:
+        return pd.DataFrame(index=pd.Index(child_ids, name="child_id"), dtype="int64")
+    matrix = pd.crosstab(tags["child_id"], tags["tags"]).reindex(child_ids, fill_value=0)
+    return matrix[matrix.sum().sort_values(ascending=False, kind="stable").index]
+
+def compute(frame: pd.DataFrame, child_ids: List[str], days: int, window: int = DEFAULT_ROLLING_WINDOW) -> dict:
+    """Per-child and cohort series, rolling averages and the tag matrix for one window"""
+    today = pd.Timestamp(datetime.now(timezone.utc)).floor("D")
+    dates = pd.date_range(end=today, periods=days, freq="D")
+    window = min(max(int(window or 1), 1), days)
+
+    # day x child matrices - one groupby for all children and metrics
+    daily = frame.groupby(["day", "child_id"])[list(METRICS)].mean()
+    counts = frame.groupby(["day", "child_id"]).size()
+    matrices = {
+        metric: daily[metric].unstack("child_id").reindex(index=dates, columns=child_ids)
+        for metric in METRICS
+    }
+    sessions = counts.unstack("child_id").reindex(index=dates, columns=child_ids).fillna(0).astype("int64")
+    rolling = {
+        metric: matrix.rolling(window, min_periods=1).mean()
+        for metric, matrix in matrices.items()
+    }
+
+    # Cohort: every session weighs the same, whichever child it belongs to
+    cohort_daily = frame.groupby("day")[list(METRICS)].mean().reindex(dates)
+    cohort_rolling = cohort_daily.rolling(window, min_periods=1).mean()
+
+    tags = tag_matrix(frame, child_ids)
+    counts_by_tag = tags.to_numpy(dtype="int64")
+    tag_names = [str(tag) for tag in tags.columns]
+    # Columns are already ordered by cohort total; a stable sort keeps that order for ties
+    top_columns = np.argsort(-counts_by_tag, axis=1, kind="stable")[:, :TOP_TAGS]
+
+    per_metric = {metric: _columns(matrices[metric]) for metric in METRICS}
+    per_metric_rolling = {metric: _columns(rolling[metric]) for metric in METRICS}
+    mood_means = _columns(frame.groupby("child_id")["mood"].mean().reindex(child_ids).to_frame().T)
+    session_counts = sessions.to_numpy().T
+
+    children = {}
+    for i, child_id in enumerate(child_ids):
+        children[child_id] = {
+            "total_sessions": int(session_counts[i].sum()),
+            "average_mood": mood_means[i][0],
+            "sessions": session_counts[i].tolist(),
+            "series": {metric: per_metric[metric][i] for metric in METRICS},
+            "rolling": {metric: per_metric_rolling[metric][i] for metric in METRICS},
+            "top_behavioral_tags": [
+                {"tag": tag_names[j], "count": int(counts_by_tag[i, j])}
+                for j in top_columns[i] if counts_by_tag[i, j] > 0
+            ]
+        }
+
+    tag_totals = counts_by_tag.sum(axis=0)
+    return {
+        "period_days": days,
+        "window": window,
+        "dates": [d.date().isoformat() for d in dates],
+        "children": children,
+        "cohort": {
+            "children": len(child_ids),
+            "total_sessions": int(len(frame)),
+            "unmapped_labels": frame.attrs.get("unmapped_labels", {}),
+            "sessions": sessions.sum(axis=1).astype("int64").tolist(),
+            "series": {metric: _columns(cohort_daily[[metric]])[0] for metric in METRICS},
+            "rolling": {metric: _columns(cohort_rolling[[metric]])[0] for metric in METRICS},
+            "top_behavioral_tags": [
+                {"tag": tag_names[j], "count": int(tag_totals[j])}
+                for j in range(min(TOP_TAGS, len(tag_names)))
+            ]
+        },
+        "tag_matrix": {
+            "child_ids": child_ids,
+            "tags": tag_names,
+            "counts": counts_by_tag.tolist()
+        }
+    }
+
+async def get_trends(child_ids: List[str], days: int = 30, window: int = DEFAULT_ROLLING_WINDOW) -> dict:
+    """Trend series for a set of children over the last `days` days"""
+    days = clamp_days(days)
+    child_ids = list(dict.fromkeys(child_ids))
+    frame = await load_sessions(child_ids, days) if child_ids else to_frame([])
+    # Frame work for a whole school takes tens of milliseconds - keep it off the event loop
+    return await asyncio.to_thread(compute, frame, child_ids, days, window)
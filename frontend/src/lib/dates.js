@@ -0,0 +1,6 @@
+// Date-only fields (session_date, scheduled_date) are stored as midnight-UTC
+// datetimes; show just the calendar day, as "YYYY-MM-DD"
+export function formatDateOnly(value) {
+  if (!value) return '';
+  return String(value).slice(0, 10);
+}
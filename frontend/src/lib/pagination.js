@@ -0,0 +1,24 @@
+import axios from 'axios';
+
+const PAGE_LIMIT = 200;
+
+// Fetches one page of a cursor-paginated list endpoint
+export async function fetchPage(url, config = {}, cursor = null, limit = PAGE_LIMIT) {
+  const params = { ...(config.params || {}), limit };
+  if (cursor) params.cursor = cursor;
+  const response = await axios.get(url, { ...config, params });
+  return response.data;
+}
+
+// Follows next_cursor until the last page and returns every item under `key`,
+// plus the first page's response (for totals and other summary fields)
+export async function fetchAllPages(url, key, config = {}) {
+  let data = await fetchPage(url, config);
+  const first = data;
+  const items = [...(data[key] || [])];
+  while (data.next_cursor) {
+    data = await fetchPage(url, config, data.next_cursor);
+    items.push(...(data[key] || []));
+  }
+  return { items, first };
+}
@@ -8,6 +8,7 @@ import { Textarea } from '../components/ui/textarea';
 import { Tabs, TabsContent, TabsList, TabsTrigger } from '../components/ui/tabs';
 import { LogOut, Save, RefreshCw, Mail } from 'lucide-react';
 import axios from 'axios';
+import { fetchAllPages } from '../lib/pagination';
 import { toast } from '../hooks/use-toast';
 import InquiriesManager from '../components/InquiriesManager';
 import GuardianManager from '../components/GuardianManager';
@@ -99,10 +100,8 @@ const AdminDashboard = () => {
 
   const loadInquiries = async () => {
     try {
-      const response = await axios.get(`${API}/admin/inquiries`, getAuthHeaders());
-      if (response.data) {
-        setInquiries(response.data.inquiries || []);
-      }
+      const { items } = await fetchAllPages(`${API}/admin/inquiries`, 'inquiries', getAuthHeaders());
+      setInquiries(items);
     } catch (error) {
       console.error('Error loading inquiries:', error);
     }
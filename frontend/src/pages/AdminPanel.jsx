@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { useNavigate, useLocation } from 'react-router-dom';
 import axios from 'axios';
+import { fetchAllPages } from '../lib/pagination';
 import { 
   LayoutDashboard, Users, GraduationCap, UserCog, BarChart3,
   Ticket, Settings, CreditCard, Brain, Mail, FileText,
@@ -371,11 +372,11 @@ function StudentEnrollment() {
   const fetchData = async () => {
     try {
       const [studentsRes, principalsRes, observersRes] = await Promise.all([
-        axios.get(`${API_URL}/api/admin/students`, getAuthHeaders()),
+        fetchAllPages(`${API_URL}/api/admin/students`, 'students', getAuthHeaders()),
         axios.get(`${API_URL}/api/admin/users/principals`, getAuthHeaders()),
         axios.get(`${API_URL}/api/admin/users/observers`, getAuthHeaders())
       ]);
-      setStudents(studentsRes.data.students || []);
+      setStudents(studentsRes.items);
       setPrincipals(principalsRes.data.principals || []);
       setObservers(observersRes.data.observers || []);
     } catch (error) {
@@ -740,9 +741,9 @@ function SupportManagement() {
 
   const fetchTickets = async () => {
     try {
-      const res = await axios.get(`${API_URL}/api/admin/support/tickets`, getAuthHeaders());
-      setTickets(res.data.tickets || []);
-      setStatusCounts(res.data.status_counts || {});
+      const { items, first } = await fetchAllPages(`${API_URL}/api/admin/support/tickets`, 'tickets', getAuthHeaders());
+      setTickets(items);
+      setStatusCounts(first.status_counts || {});
     } catch (error) {
       console.error('Error:', error);
     } finally {
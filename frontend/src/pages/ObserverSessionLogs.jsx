@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { useNavigate, useParams } from 'react-router-dom';
 import axios from 'axios';
+import { formatDateOnly } from '../lib/dates';
 import { Button } from '../components/ui/button';
 import { Card, CardContent } from '../components/ui/card';
 import { ArrowLeft, Plus, Calendar, Clock, Brain, Tag, TrendingUp, FileText, Loader2, CheckCircle, AlertCircle, ChevronDown, ChevronUp, Sparkles } from 'lucide-react';
@@ -392,7 +393,7 @@ const ObserverSessionLogs = () => {
                       <div className="text-3xl">{getMoodEmoji(log.mood_observed)}</div>
                       <div>
                         <div className="flex items-center gap-2">
-                          <span className="font-semibold text-gray-900">{log.session_date}</span>
+                          <span className="font-semibold text-gray-900">{formatDateOnly(log.session_date)}</span>
                           <span className="text-sm text-gray-500">• {log.duration_minutes} min</span>
                           {log.ai_processed && (
                             <span className="text-xs bg-green-100 text-green-700 px-2 py-0.5 rounded-full flex items-center gap-1">
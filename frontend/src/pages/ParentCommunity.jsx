@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
 import axios from 'axios';
+import { fetchAllPages, fetchPage } from '../lib/pagination';
 import { Button } from '../components/ui/button';
 import { Card, CardContent } from '../components/ui/card';
 import { Textarea } from '../components/ui/textarea';
@@ -21,6 +22,8 @@ const CATEGORIES = [
 const ParentCommunity = () => {
   const navigate = useNavigate();
   const [posts, setPosts] = useState([]);
+  const [postsCursor, setPostsCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
   const [category, setCategory] = useState('all');
   const [showNewPost, setShowNewPost] = useState(false);
@@ -46,14 +49,17 @@ const ParentCommunity = () => {
     loadPosts();
   }, [navigate, category]);
 
+  const postsUrl = () => (
+    category === 'all'
+      ? `${BACKEND_URL}/api/forum/posts`
+      : `${BACKEND_URL}/api/forum/posts?category=${category}`
+  );
+
   const loadPosts = async () => {
     try {
-      const url = category === 'all' 
-        ? `${BACKEND_URL}/api/forum/posts`
-        : `${BACKEND_URL}/api/forum/posts?category=${category}`;
-      
-      const response = await axios.get(url, getAuthHeaders());
-      setPosts(response.data.posts);
+      const data = await fetchPage(postsUrl(), getAuthHeaders());
+      setPosts(data.posts || []);
+      setPostsCursor(data.next_cursor || null);
     } catch (error) {
       console.error('Error loading posts:', error);
     } finally {
@@ -61,6 +67,20 @@ const ParentCommunity = () => {
     }
   };
 
+  const loadMorePosts = async () => {
+    if (!postsCursor) return;
+    setLoadingMore(true);
+    try {
+      const data = await fetchPage(postsUrl(), getAuthHeaders(), postsCursor);
+      setPosts((current) => [...current, ...(data.posts || [])]);
+      setPostsCursor(data.next_cursor || null);
+    } catch (error) {
+      console.error('Error loading more posts:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const createPost = async () => {
     if (!newPostTitle.trim() || !newPostContent.trim()) return;
 
@@ -91,11 +111,12 @@ const ParentCommunity = () => {
 
   const loadComments = async (postId) => {
     try {
-      const response = await axios.get(
+      const { items } = await fetchAllPages(
         `${BACKEND_URL}/api/forum/posts/${postId}/comments`,
+        'comments',
         getAuthHeaders()
       );
-      setComments(response.data.comments);
+      setComments(items);
     } catch (error) {
       console.error('Error loading comments:', error);
     }
@@ -371,6 +392,13 @@ const ParentCommunity = () => {
                   </CardContent>
                 </Card>
               ))}
+              {postsCursor && (
+                <div className="text-center">
+                  <Button onClick={loadMorePosts} variant="outline" disabled={loadingMore}>
+                    {loadingMore ? 'Loading...' : 'Load more posts'}
+                  </Button>
+                </div>
+              )}
             </div>
           )}
         </div>
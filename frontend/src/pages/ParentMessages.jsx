@@ -15,6 +15,8 @@ const ParentMessages = () => {
   const [conversations, setConversations] = useState([]);
   const [selectedConversation, setSelectedConversation] = useState(null);
   const [messages, setMessages] = useState([]);
+  const [olderCursor, setOlderCursor] = useState(null);
+  const [loadingOlder, setLoadingOlder] = useState(false);
   const [newMessage, setNewMessage] = useState('');
   const [loading, setLoading] = useState(true);
   const [sending, setSending] = useState(false);
@@ -53,7 +55,9 @@ const ParentMessages = () => {
         `${BACKEND_URL}/api/parent/messages/${conversationId}`,
         getAuthHeaders()
       );
+      // Newest page first; older pages are loaded on demand
       setMessages(response.data.messages || []);
+      setOlderCursor(response.data.next_cursor || null);
       setSelectedConversation(response.data.conversation);
       
       // Auto-scroll to bottom
@@ -65,6 +69,23 @@ const ParentMessages = () => {
     }
   };
 
+  const loadOlderMessages = async () => {
+    if (!olderCursor || !selectedConversation) return;
+    setLoadingOlder(true);
+    try {
+      const response = await axios.get(
+        `${BACKEND_URL}/api/parent/messages/${selectedConversation.id}`,
+        { ...getAuthHeaders(), params: { cursor: olderCursor } }
+      );
+      setMessages((current) => [...(response.data.messages || []), ...current]);
+      setOlderCursor(response.data.next_cursor || null);
+    } catch (error) {
+      console.error('Error loading older messages:', error);
+    } finally {
+      setLoadingOlder(false);
+    }
+  };
+
   const sendMessage = async () => {
     if (!newMessage.trim() || !selectedConversation) return;
 
@@ -171,6 +192,13 @@ const ParentMessages = () => {
                         </div>
                       ) : (
                         <>
+                          {olderCursor && (
+                            <div className="text-center">
+                              <Button variant="outline" size="sm" onClick={loadOlderMessages} disabled={loadingOlder}>
+                                {loadingOlder ? 'Loading...' : 'Load earlier messages'}
+                              </Button>
+                            </div>
+                          )}
                           {messages.map((msg) => (
                             <div
                               key={msg.id}
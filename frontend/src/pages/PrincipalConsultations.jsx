@@ -1,6 +1,8 @@
 import React, { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
 import axios from 'axios';
+import { formatDateOnly } from '../lib/dates';
+import { fetchAllPages } from '../lib/pagination';
 import { Button } from '../components/ui/button';
 import { Card, CardContent, CardHeader, CardTitle, CardDescription } from '../components/ui/card';
 import { Input } from '../components/ui/input';
@@ -55,13 +57,13 @@ const PrincipalConsultations = () => {
       const [consultationsRes, requestsRes, studentsRes] = await Promise.all([
         axios.get(`${BACKEND_URL}/api/principal/consultations?token=${token}`),
         axios.get(`${BACKEND_URL}/api/principal/consultation-requests?token=${token}`),
-        axios.get(`${BACKEND_URL}/api/principal/students?token=${token}`)
+        fetchAllPages(`${BACKEND_URL}/api/principal/students?token=${token}`, 'students')
       ]);
       
       setConsultations(consultationsRes.data.consultations || []);
       setStatusCounts(consultationsRes.data.status_counts || {});
       setRequests(requestsRes.data.requests || []);
-      setStudents(studentsRes.data.students || []);
+      setStudents(studentsRes.items);
     } catch (error) {
       console.error('Error fetching data:', error);
     } finally {
@@ -404,7 +406,7 @@ const PrincipalConsultations = () => {
                         <div className="mt-3 flex items-center gap-4 text-sm text-gray-600">
                           <span className="flex items-center gap-1">
                             <Calendar className="w-4 h-4" />
-                            {consultation.scheduled_date}
+                            {formatDateOnly(consultation.scheduled_date)}
                           </span>
                           <span className="flex items-center gap-1">
                             <Clock className="w-4 h-4" />
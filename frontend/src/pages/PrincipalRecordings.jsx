@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
 import axios from 'axios';
+import { fetchAllPages } from '../lib/pagination';
 import { Button } from '../components/ui/button';
 import { Card, CardContent, CardHeader, CardTitle, CardDescription } from '../components/ui/card';
 import { 
@@ -39,9 +40,9 @@ const PrincipalRecordings = () => {
       if (filterStatus !== 'all') {
         url += `&status=${filterStatus}`;
       }
-      const response = await axios.get(url);
-      setRecordings(response.data.recordings || []);
-      setStatusCounts(response.data.status_counts || {});
+      const { items, first } = await fetchAllPages(url, 'recordings');
+      setRecordings(items);
+      setStatusCounts(first.status_counts || {});
     } catch (error) {
       console.error('Error fetching recordings:', error);
       toast({ title: "Error", description: "Failed to load recordings", variant: "destructive" });
@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
 import axios from 'axios';
+import { fetchAllPages } from '../lib/pagination';
 import { Button } from '../components/ui/button';
 import { Card, CardContent, CardHeader, CardTitle, CardDescription } from '../components/ui/card';
 import { Input } from '../components/ui/input';
@@ -39,12 +40,12 @@ const PrincipalStudentAssignment = () => {
     try {
       const token = localStorage.getItem('principal_token');
       const [studentsRes, unassignedRes, observersRes] = await Promise.all([
-        axios.get(`${BACKEND_URL}/api/principal/students?token=${token}`),
+        fetchAllPages(`${BACKEND_URL}/api/principal/students?token=${token}`, 'students'),
         axios.get(`${BACKEND_URL}/api/principal/students/unassigned?token=${token}`),
         axios.get(`${BACKEND_URL}/api/principal/available-observers?token=${token}`)
       ]);
       
-      setStudents(studentsRes.data.students || []);
+      setStudents(studentsRes.items);
       setUnassignedStudents(unassignedRes.data.unassigned_students || []);
       setObservers(observersRes.data.observers || []);
     } catch (error) {
@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
-import axios from 'axios';
+import { fetchAllPages } from '../lib/pagination';
 import { Button } from '../components/ui/button';
 import { Card, CardContent } from '../components/ui/card';
 import { ArrowLeft, Users, Search } from 'lucide-react';
@@ -28,11 +28,11 @@ const PrincipalStudents = () => {
   const loadStudents = async () => {
     try {
       const token = localStorage.getItem('principal_token');
-      const response = await axios.get(
-        `${BACKEND_URL}/api/principal/students?token=${token}`
+      const { items, first } = await fetchAllPages(
+        `${BACKEND_URL}/api/principal/students?token=${token}`, 'students'
       );
-      setStudents(response.data.students);
-      setSchool(response.data.school);
+      setStudents(items);
+      setSchool(first.school);
     } catch (error) {
       console.error('Error loading students:', error);
       if (error.response?.status === 401) {
@@ -99,7 +99,25 @@ class TestStudentEnrollment:
         assert "students" in data, "Missing students in response"
         assert isinstance(data["students"], list), "Students should be a list"
         print(f"SUCCESS: Get students - {len(data['students'])} students found")
-    
+
+    def test_get_students_paginated(self, auth_headers):
+        """Test students are paged with a stable cursor"""
+        response = requests.get(f"{BASE_URL}/api/admin/students", params={"limit": 1}, headers=auth_headers)
+        assert response.status_code == 200, f"Failed: {response.text}"
+        data = response.json()
+        assert len(data["students"]) <= 1, "Page exceeds limit"
+        assert "next_cursor" in data, "Missing next_cursor in response"
+        if data["next_cursor"]:
+            next_page = requests.get(
+                f"{BASE_URL}/api/admin/students",
+                params={"limit": 1, "cursor": data["next_cursor"]},
+                headers=auth_headers
+            ).json()
+            assert next_page["students"][0]["id"] != data["students"][0]["id"], "Cursor returned the same row"
+        bad = requests.get(f"{BASE_URL}/api/admin/students", params={"cursor": "not-a-cursor"}, headers=auth_headers)
+        assert bad.status_code == 400, "Invalid cursor should be rejected"
+        print(f"SUCCESS: Students pagination - total {data['total']}")
+
     def test_enroll_student(self, auth_headers):
         """Test student enrollment"""
         params = {
@@ -230,6 +248,16 @@ class TestSystemHealth:
         assert "uptime_percent" in data, "Missing uptime_percent"
         print(f"SUCCESS: System uptime - {data['uptime_percent']}%")
 
+    def test_get_index_report(self, auth_headers):
+        """Test index report endpoint - canonical route queries should not COLLSCAN"""
+        response = requests.get(f"{BASE_URL}/api/admin/system/index-report", headers=auth_headers)
+        assert response.status_code == 200, f"Failed: {response.text}"
+        data = response.json()
+        assert "queries" in data, "Missing queries"
+        assert "collscans" in data, "Missing collscans"
+        assert data["collscan_count"] == 0, f"Routes still scanning: {data['collscans']}"
+        print(f"SUCCESS: Index report - {data['total']} queries checked, no COLLSCAN")
+
 
 class TestAIGuardrails:
     """AI Guardrails API tests"""
@@ -437,6 +465,41 @@ class TestAISystem:
         assert data.get("success") == True, "Update should succeed"
         print("SUCCESS: AI settings updated")
 
+    def test_get_ai_job_stats(self, auth_headers):
+        """Test background AI job queue stats"""
+        response = requests.get(f"{BASE_URL}/api/admin/ai/jobs", headers=auth_headers)
+        assert response.status_code == 200, f"Failed: {response.text}"
+        data = response.json()
+        for status in ("queued", "running", "done", "failed"):
+            assert status in data["status_counts"], f"Missing {status} count"
+        print(f"SUCCESS: AI jobs - {data['status_counts']}")
+
+    def test_rebuild_behavioral_profile(self, auth_headers):
+        """Test queueing a behavioral profile rebuild for one child"""
+        response = requests.post(
+            f"{BASE_URL}/api/admin/ai/behavioral-profiles/rebuild?child_id=TEST_nonexistent_child",
+            headers=auth_headers
+        )
+        assert response.status_code == 200, f"Failed: {response.text}"
+        assert response.json()["queued"] == 1
+        print(f"SUCCESS: Behavioral profile rebuild queued")
+
+    def test_get_email_outbox_stats(self, auth_headers):
+        """Test outbound email queue stats"""
+        response = requests.get(f"{BASE_URL}/api/admin/email-outbox", headers=auth_headers)
+        assert response.status_code == 200, f"Failed: {response.text}"
+        data = response.json()
+        for status in ("queued", "sending", "sent", "dead"):
+            assert status in data["status_counts"], f"Missing {status} count"
+        assert isinstance(data["dead_letters"], list)
+        print(f"SUCCESS: Email outbox - {data['status_counts']}")
+
+    def test_retry_unknown_email(self, auth_headers):
+        """Test retrying an email that is not dead-lettered"""
+        response = requests.post(f"{BASE_URL}/api/admin/email-outbox/TEST_nonexistent_email/retry", headers=auth_headers)
+        assert response.status_code == 404, f"Expected 404: {response.text}"
+        print("SUCCESS: Unknown email retry rejected")
+
 
 class TestAnalytics:
     """Analytics API tests"""
@@ -450,6 +513,16 @@ class TestAnalytics:
         assert "enrollments" in data, "Missing enrollments in response"
         print(f"SUCCESS: Analytics overview retrieved")
 
+    def test_get_analytics_overview_honours_days(self, auth_headers):
+        """Test that the overview only counts the requested window"""
+        response = requests.get(f"{BASE_URL}/api/admin/analytics/overview?days=7", headers=auth_headers)
+        assert response.status_code == 200, f"Failed: {response.text}"
+        data = response.json()
+        assert data["period_days"] == 7
+        assert len(data["sessions"]["by_date"]) <= 7, "by_date should not exceed the window"
+        assert data["sessions"]["total"] == sum(data["sessions"]["by_date"].values())
+        print(f"SUCCESS: Analytics overview - {data['sessions']['total']} sessions in 7 days")
+
 
 class TestHelpFAQs:
     """Help & FAQs API tests"""
@@ -428,6 +428,62 @@ class TestPrincipalAnalytics:
         print(f"  Students: {data['demographics'].get('total_students')}")
         print(f"  Attendance rate: {data['engagement'].get('attendance_rate')}%")
 
+    def test_get_trends(self):
+        """Test school-wide trend series"""
+        response = requests.get(
+            f"{BASE_URL}/api/principal/trends",
+            params={"token": self.token, "days": 14, "window": 7}
+        )
+        assert response.status_code == 200, f"Trends failed: {response.text}"
+
+        data = response.json()
+        assert len(data["dates"]) == 14
+        assert len(data["cohort"]["series"]["mood"]) == 14
+        assert len(data["tag_matrix"]["counts"]) == len(data["children"])
+        for child in data["children"].values():
+            assert len(child["rolling"]["engagement"]) == 14
+
+        print(f"✓ Got trends for {len(data['children'])} students, {data['cohort']['total_sessions']} sessions")
+
+
+class TestPrincipalSearch:
+    """Principal full-text search API tests"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        """Get auth token before each test"""
+        response = requests.post(
+            f"{BASE_URL}/api/principal/login",
+            params={"email": "principal@greenwood.edu", "password": "principal123"}
+        )
+        self.token = response.json().get("access_token")
+
+    def test_search(self):
+        """Test searching session notes and reports across the school"""
+        response = requests.get(
+            f"{BASE_URL}/api/principal/search",
+            params={"token": self.token, "q": "session"}
+        )
+        assert response.status_code == 200, f"Search failed: {response.text}"
+
+        data = response.json()
+        assert "results" in data
+        assert "next_cursor" in data
+        for result in data["results"]:
+            assert result["kind"] in ("session_log", "daily_report")
+            assert "highlights" in result
+
+        print(f"✓ Search returned {len(data['results'])} results")
+
+    def test_search_requires_query(self):
+        """Test that an empty query is rejected"""
+        response = requests.get(
+            f"{BASE_URL}/api/principal/search",
+            params={"token": self.token, "q": " "}
+        )
+        assert response.status_code == 400
+        print("✓ Empty search query rejected")
+
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v", "--tb=short"])